@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import registry
+
+ADMISSION_REJECTIONS = registry.counter(
+    'moodtunes_admission_rejected_total',
+    'Analysis requests refused by admission control, by reason and client type',
+    ('reason', 'client')
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status, retry_after, reason):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBuckets:
+    """One token bucket per key: burst tokens, refilled at rate tokens per second.
+
+    Only the max_keys most recently seen keys are kept; a forgotten key starts
+    again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost=1):
+        """Take cost tokens; returns 0 if they were available, else seconds until they will be"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate if self.rate > 0 else float('inf')
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def give_back(self, key, cost=1):
+        """Return tokens taken for a request that was refused later on"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + cost), updated_at)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class AdmissionController:
+    """Rate limits and a concurrency cap in front of mood analysis.
+
+    Authenticated requests draw from a bucket per user, anonymous ones from a
+    bucket per client IP, usually with a lower rate. At most max_in_flight
+    analyses run at once; reserved_for_users of those slots are only given
+    to authenticated requests, so anonymous traffic cannot take all of them.
+    Refusals are immediate: 429 when a bucket is empty, 503 at capacity,
+    both with a Retry-After.
+    """
+
+    def __init__(self, user_rate=1.0, user_burst=20, ip_rate=0.2, ip_burst=5,
+                 max_in_flight=32, reserved_for_users=8):
+        self.user_buckets = TokenBuckets(user_rate, user_burst)
+        self.ip_buckets = TokenBuckets(ip_rate, ip_burst)
+        self.max_in_flight = max_in_flight
+        self.reserved_for_users = min(reserved_for_users, max_in_flight)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def _reject(self, message, status, retry_after, reason, client):
+        ADMISSION_REJECTIONS.inc(reason, client)
+        raise AdmissionRejected(message, status, max(1, math.ceil(retry_after)), reason)
+
+    @contextmanager
+    def admit(self, user_id=None, ip=None):
+        """Hold an analysis slot for the duration of the block, or raise AdmissionRejected"""
+        if user_id:
+            client, buckets, key = 'user', self.user_buckets, user_id
+            limit = self.max_in_flight
+        else:
+            client, buckets, key = 'anonymous', self.ip_buckets, ip or 'unknown'
+            limit = self.max_in_flight - self.reserved_for_users
+
+        wait = buckets.take(key)
+        if wait:
+            self._reject('Too many analysis requests', 429, min(wait, 3600), 'rate_limited', client)
+
+        with self._lock:
+            admitted = self._in_flight < limit
+            if admitted:
+                self._in_flight += 1
+        if not admitted:
+            buckets.give_back(key)
+            self._reject('Mood analysis is at capacity', 503, 1, 'at_capacity', client)
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight(),
+            'max_in_flight': self.max_in_flight,
+            'reserved_for_users': self.reserved_for_users,
+            'tracked_users': len(self.user_buckets),
+            'tracked_ips': len(self.ip_buckets)
+        }
@@ -0,0 +1,223 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+from models import JournalEntry, MoodRollup, User
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def bucket_start(created_at, granularity):
+    """Start of the day, ISO week (Monday) or month containing created_at"""
+    day = created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def encode_key(name):
+    """Make a mood or emotion name usable as a MongoDB field name"""
+    name = name.replace('.', '．')
+    return '＄' + name[1:] if name.startswith('$') else name
+
+
+def decode_key(key):
+    key = key.replace('．', '.')
+    return '$' + key[1:] if key.startswith('＄') else key
+
+
+def rollup_increments(docs):
+    """Fold raw journal documents into one $inc per (user, granularity, bucket)"""
+    increments = defaultdict(lambda: defaultdict(float))
+    for doc in docs:
+        mood_data = doc.get('mood_data') or {}
+        for granularity in GRANULARITIES:
+            inc = increments[(doc['user_id'], granularity, bucket_start(doc['created_at'], granularity))]
+            inc['entries'] += 1
+            if mood_data.get('primary_mood'):
+                inc['mood_entries'] += 1
+                inc['confidence_sum'] += float(mood_data.get('confidence') or 0)
+                inc[f"moods.{encode_key(mood_data['primary_mood'])}"] += 1
+                for emotion in mood_data.get('emotions') or []:
+                    inc[f'emotions.{encode_key(emotion)}'] += 1
+    return increments
+
+
+def rollup_operations(docs, removed_docs=()):
+    """Upserted $inc updates adding journal documents to their users' rollups.
+
+    removed_docs are subtracted, so a document whose mood changed can be
+    moved between moods by passing its old and new versions.
+    """
+    increments = rollup_increments(docs)
+    for key, inc in rollup_increments(removed_docs).items():
+        for field, value in inc.items():
+            increments[key][field] -= value
+    now = datetime.utcnow()
+    operations = []
+    for (user_id, granularity, bucket), inc in increments.items():
+        # Counters are integral; only the confidence sum is a float
+        inc = {field: value if field == 'confidence_sum' else int(value) for field, value in inc.items() if value}
+        if inc:
+            operations.append(UpdateOne(
+                {'user_id': user_id, 'granularity': granularity, 'bucket': bucket},
+                {'$inc': inc, '$set': {'updated_at': now}},
+                upsert=True
+            ))
+    return operations
+
+
+def record_entries(docs):
+    """Add newly inserted journal documents to their users' rollups"""
+    operations = rollup_operations(docs)
+    if operations:
+        MoodRollup._get_collection().bulk_write(operations, ordered=False)
+
+
+def record_entries_safely(docs):
+    """record_entries for write paths: the entries are already saved, so a failed
+    rollup update is logged (and fixed by rebuild_rollups) rather than raised"""
+    try:
+        record_entries(docs)
+    except Exception as e:
+        logger.error("Error updating mood rollups: %s", e)
+
+
+def record_rescored_entries(old_docs, new_docs):
+    """Move re-scored journal documents from their old moods to their new ones.
+
+    Only $inc deltas are written, so entries the app records meanwhile are
+    neither lost nor counted twice.
+    """
+    operations = rollup_operations(new_docs, removed_docs=old_docs)
+    if operations:
+        MoodRollup._get_collection().bulk_write(operations, ordered=False)
+
+
+def mood_summary(user_id, granularity='day', start_at=None, end_at=None):
+    """Rollup buckets for a user between start_at (inclusive) and end_at (exclusive), oldest first.
+
+    Reads one document per bucket, however many entries the range holds.
+    """
+    rollups = (
+        MoodRollup.objects(__raw__=summary_filter(user_id, granularity, start_at, end_at))
+        .order_by('bucket')
+        .exclude('id', 'user_id', 'granularity')
+        .as_pymongo()
+    )
+    return [summarize_rollup(rollup) for rollup in rollups]
+
+
+def summary_filter(user_id, granularity='day', start_at=None, end_at=None):
+    """Raw query for a user's rollup buckets in a date range; raises ValueError"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    filters = {'user_id': user_id, 'granularity': granularity}
+    bucket_range = {}
+    if start_at is not None:
+        # The bucket containing start_at starts before it
+        bucket_range['$gte'] = bucket_start(start_at, granularity)
+    if end_at is not None:
+        bucket_range['$lt'] = end_at
+    if bucket_range:
+        filters['bucket'] = bucket_range
+    return filters
+
+
+def summarize_rollup(rollup):
+    """API representation of a raw rollup document"""
+    # Moods moved away by a re-score stay behind with a count of 0
+    moods = {decode_key(key): int(count) for key, count in (rollup.get('moods') or {}).items() if count}
+    emotions = {decode_key(key): int(count) for key, count in (rollup.get('emotions') or {}).items() if count}
+    mood_entries = int(rollup.get('mood_entries', 0))
+    return {
+        'start': rollup['bucket'].isoformat(),
+        'entries': int(rollup.get('entries', 0)),
+        'mood_entries': mood_entries,
+        'primary_mood': max(moods, key=moods.get) if moods else None,
+        'average_confidence': round(rollup.get('confidence_sum', 0) / mood_entries, 2) if mood_entries else None,
+        'moods': dict(sorted(moods.items(), key=lambda item: item[1], reverse=True)),
+        'emotions': dict(sorted(emotions.items(), key=lambda item: item[1], reverse=True))
+    }
+
+
+def rollup_documents(docs):
+    """Complete rollup documents for raw journal documents, one per (user, granularity, bucket)"""
+    now = datetime.utcnow()
+    rollups = []
+    for (user_id, granularity, bucket), inc in rollup_increments(docs).items():
+        rollup = {
+            'user_id': user_id, 'granularity': granularity, 'bucket': bucket,
+            'entries': 0, 'mood_entries': 0, 'confidence_sum': 0.0, 'moods': {}, 'emotions': {},
+            'updated_at': now
+        }
+        for field, value in inc.items():
+            group, _, key = field.partition('.')
+            if key:
+                rollup[group][key] = int(value)
+            else:
+                rollup[field] = value if field == 'confidence_sum' else int(value)
+        rollups.append(rollup)
+    return rollups
+
+
+def rebuild_user_rollups(user_id, batch_size=1000):
+    """Recompute one user's rollups in place; returns the number of entries read.
+
+    Each bucket is replaced by its recomputed document and buckets without
+    entries are deleted, so the user's summary is never empty or partial.
+    """
+    count = 0
+
+    def counted(entries):
+        nonlocal count
+        for doc in entries:
+            count += 1
+            yield doc
+
+    entries = (
+        JournalEntry.objects(user_id=user_id)
+        .only('user_id', 'created_at', 'mood_data')
+        .batch_size(batch_size)
+        .as_pymongo()
+    )
+    rollups = rollup_documents(counted(entries))
+    operations = [
+        ReplaceOne(
+            {'user_id': user_id, 'granularity': rollup['granularity'], 'bucket': rollup['bucket']},
+            rollup,
+            upsert=True
+        )
+        for rollup in rollups
+    ]
+    for granularity in GRANULARITIES:
+        buckets = [rollup['bucket'] for rollup in rollups if rollup['granularity'] == granularity]
+        operations.append(DeleteMany({'user_id': user_id, 'granularity': granularity, 'bucket': {'$nin': buckets}}))
+    MoodRollup._get_collection().bulk_write(operations, ordered=False)
+    return count
+
+
+def rebuild_rollups(user_id=None, batch_size=1000):
+    """Recompute rollups from the journal (all users, or one); returns the number of entries read.
+
+    Users are rebuilt one at a time and in place, so summaries keep being
+    served throughout. An entry saved for a user while that user's rollups are
+    rewritten (one journal read and one bulk write) can still be missed.
+    """
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = (user['_id'] for user in User.objects.only('id').batch_size(batch_size).as_pymongo())
+    count = 0
+    for uid in user_ids:
+        count += rebuild_user_rollups(uid, batch_size)
+    logger.info("Rebuilt mood rollups from %s journal entries", count)
+    return count
@@ -2,23 +2,48 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, url_for, has_request_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import ExecutionTimeout
+from mongoengine.queryset.visitor import Q
 from config import Config
-from models import db, User, JournalEntry, MusicFeedback
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-import os
+from models import db, User, JournalEntry, MusicFeedback, ExportJob, mongo_now
+from password_hashing import PasswordHasherBusyError, password_hasher
+from batching import BatchTimeoutError
+from mood_analyzer import EmotionModel, ModelNotReadyError
+from model_setup import MOOD_RULESET_VERSION, create_emotion_model
+from inference_pool import InferenceQueueFullError
+from mood_cache import MoodResultCache, CACHE_BACKENDS, normalize_text, make_cache_key
+from emotions import build_mood_response, group_emotions_batch
+from indexes import ensure_indexes
+from journal_import import import_journal_entries, iter_ndjson_records, ImportAnalysisError
+from journal_requests import (
+    JOURNAL_RESPONSE_FIELDS, JournalRequestError, encode_journal_cursor, journal_content,
+    parse_journal_query, parse_page_size, serialize_journal_doc
+)
 from dotenv import load_dotenv
 import json
 import logging
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from dateutil import parser
+import re
+import threading
+from contextlib import nullcontext
+from pdf_export import parse_date_range
+from export_jobs import ArtifactStore, ExportJobManager, ExportQueueFullError
+from analytics import mood_summary, record_entries_safely
+from journal_search import parse_search_query, search_pipeline, search_results, snippet
+from embedding_index import EmbeddingIndex, EmbeddingQueue, decode_embedding, encode_embedding
+from admission import AdmissionController, AdmissionRejected
+import metrics
+from metrics import span
+from logging_setup import configure_logging, logging_stats, payload_logger, sample_payloads
 
 # Load environment variables
 load_dotenv()
@@ -27,388 +52,121 @@ app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app)
 jwt = JWTManager(app)
+if Config.PROXY_FIX_X_FOR:
+    # Client IPs (for per-IP rate limits) come from X-Forwarded-For set by this many proxies
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR)
+# Registered before db.init_app so the Mongo client reports its commands
+metrics.install_mongo_listener()
 db.init_app(app)
+metrics.init_app(app)
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Log records are formatted and written by a background thread
+configure_logging(
+    level=Config.LOG_LEVEL,
+    fmt=Config.LOG_FORMAT,
+    queue_size=Config.LOG_QUEUE_SIZE,
+    payload_sample_rate=Config.LOG_PAYLOAD_SAMPLE_RATE
+)
 logger = logging.getLogger(__name__)
 
-# Updated Emotion categories mapping with emojis
-EMOTION_CATEGORIES = {
-    'Happy 😊': ['joy', 'happiness', 'delight', 'pleasure', 'cheerfulness'],
-    'Sad 😢': ['sadness', 'grief', 'sorrow', 'disappointment', 'loneliness'],
-    'Angry 😠': ['anger', 'annoyance', 'irritation', 'frustration', 'rage'],
-    'Fearful 😰': ['fear', 'anxiety', 'worry', 'nervousness', 'stress'],
-    'Surprised 😲': ['surprise', 'amazement', 'awe', 'wonder', 'shock'],
-    'Disgusted 🤢': ['disgust', 'revulsion', 'aversion', 'contempt'],
-    'Calm 😌': ['calm', 'relaxed', 'peaceful', 'serene', 'tranquil'],
-    'Excited ⚡': ['excitement', 'enthusiasm', 'eager', 'thrill', 'anticipation'],
-    'Loving 💝': ['love', 'affection', 'caring', 'tenderness', 'fondness', 'adoration'],
-    'Heartbroken 💔': ['heartbreak', 'heartbroken', 'broken heart', 'heart ache', 'emotional pain'],
-    'Motivated 💪': [
-        'determination', 'motivation', 'drive', 'ambition', 'passion', 'inspiration',
-        'purpose', 'focus', 'dedication', 'commitment', 'perseverance', 'resilience',
-        'achievement', 'success', 'progress', 'growth', 'improvement', 'development',
-        'goals', 'aspirations', 'dreams', 'vision', 'mission', 'purpose',
-        'empowerment', 'strength', 'courage', 'confidence', 'belief', 'hope',
-        'optimism', 'positivity', 'enthusiasm', 'energy', 'vitality', 'vigor',
-        'determined', 'motivated', 'driven', 'ambitious', 'passionate', 'inspired',
-        'focused', 'dedicated', 'committed', 'persevering', 'resilient',
-        'achieving', 'succeeding', 'progressing', 'growing', 'improving', 'developing',
-        'empowered', 'strong', 'courageous', 'confident', 'hopeful',
-        'optimistic', 'positive', 'energetic', 'vital', 'vigorous'
-    ],
-    'Neutral 😐': ['neutral', 'indifferent', 'unemotional'],
-    'Nostalgic 🎭': [
-        'nostalgia', 'reminiscence', 'memories', 'recollection', 'remembrance',
-        'sentimental', 'yearning', 'longing', 'homesick', 'melancholy',
-        'wistful', 'reflective', 'contemplative', 'reminiscent', 'retrospective',
-        'old times', 'good old days', 'childhood memories', 'past times',
-        'throwback', 'blast from the past', 'memory lane', 'flashback',
-        'vintage', 'classic', 'traditional', 'old school', 'retro'
-    ]
-}
-
-# Emotion emoji mapping for individual emotions
-EMOTION_EMOJIS = {
-    'joy': '😊',
-    'happiness': '😄',
-    'delight': '🥰',
-    'pleasure': '😋',
-    'cheerfulness': '😃',
-    'sadness': '😢',
-    'grief': '😭',
-    'sorrow': '💔',
-    'disappointment': '😔',
-    'loneliness': '😞',
-    'anger': '😠',
-    'annoyance': '😤',
-    'irritation': '😒',
-    'frustration': '😫',
-    'rage': '😡',
-    'fear': '😰',
-    'anxiety': '😨',
-    'worry': '😟',
-    'nervousness': '😬',
-    'stress': '😓',
-    'surprise': '😲',
-    'amazement': '😮',
-    'awe': '🤩',
-    'wonder': '✨',
-    'shock': '😱',
-    'disgust': '🤢',
-    'revulsion': '🤮',
-    'aversion': '😖',
-    'contempt': '😏',
-    'calm': '😌',
-    'relaxed': '😌',
-    'peaceful': '🕊️',
-    'serene': '🌊',
-    'tranquil': '🌿',
-    'excitement': '⚡',
-    'enthusiasm': '🎉',
-    'eager': '✨',
-    'thrill': '🎢',
-    'anticipation': '🎯',
-    'love': '💝',
-    'affection': '💖',
-    'caring': '💗',
-    'tenderness': '💓',
-    'fondness': '💕',
-    'adoration': '💘',
-    'determination': '💪',
-    'motivation': '🔥',
-    'drive': '🚀',
-    'ambition': '⭐',
-    'passion': '❤️',
-    'inspiration': '💫',
-    'purpose': '🎯',
-    'focus': '🎯',
-    'dedication': '🎯',
-    'commitment': '🎯',
-    'perseverance': '💪',
-    'resilience': '💪',
-    'achievement': '🏆',
-    'success': '🏆',
-    'progress': '📈',
-    'growth': '🌱',
-    'improvement': '📈',
-    'development': '🌱',
-    'goals': '🎯',
-    'aspirations': '✨',
-    'dreams': '✨',
-    'vision': '👁️',
-    'mission': '🎯',
-    'empowerment': '💪',
-    'strength': '🦁',
-    'courage': '🦁',
-    'confidence': '💪',
-    'belief': '🙏',
-    'hope': '✨',
-    'optimism': '😊',
-    'positivity': '😊',
-    'energy': '⚡',
-    'vitality': '💫',
-    'vigor': '💪',
-    'neutral': '😐',
-    'indifferent': '😶',
-    'unemotional': '😑',
-    'heartbreak': '💔',
-    'heartbroken': '💔',
-    'broken heart': '💔',
-    'heart ache': '💔',
-    'emotional pain': '💔',
-    'nostalgia': '🎭',
-    'reminiscence': '🎭',
-    'memories': '🎭',
-    'recollection': '🎭',
-    'remembrance': '🎭',
-    'sentimental': '🎭',
-    'yearning': '🎭',
-    'longing': '🎭',
-    'homesick': '🎭',
-    'melancholy': '🎭',
-    'wistful': '🎭',
-    'reflective': '🎭',
-    'contemplative': '🎭',
-    'reminiscent': '🎭',
-    'retrospective': '🎭',
-    'old times': '🎭',
-    'good old days': '🎭',
-    'childhood memories': '🎭',
-    'past times': '🎭',
-    'throwback': '🎭',
-    'blast from the past': '🎭',
-    'memory lane': '🎭',
-    'flashback': '🎭',
-    'vintage': '🎭',
-    'classic': '🎭',
-    'traditional': '🎭',
-    'old school': '🎭',
-    'retro': '🎭'
-}
-
-# Initialize the sentiment analysis pipeline with SamLowe model
-logger.info("Initializing emotion analyzer...")
-model_name = "SamLowe/roberta-base-go_emotions"
-
-try:
-    # Initialize tokenizer and model separately for better error handling
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-    
-    emotion_analyzer = pipeline(
-        "text-classification",
-        model=model,
-        tokenizer=tokenizer,
-        return_all_scores=True,
-        device=-1  # Use CPU by default
+# Payload logging is sampled per request, not per record
+app.before_request(sample_payloads)
+
+# The emotion model loads in the background so that auth, journal and
+# health routes can serve requests immediately after startup
+emotion_model = create_emotion_model()
+
+@app.before_first_request
+def start_model_loading():
+    emotion_model.start_loading()
+
+def build_indexes():
+    try:
+        ensure_indexes()
+    except Exception as e:
+        logger.error("Error ensuring indexes: %s", e)
+
+@app.before_first_request
+def start_index_build():
+    # Development convenience; production builds indexes with init_db.py. The
+    # build runs beside requests, since a text index on a populated collection
+    # (or an unreachable server) can take far longer than a request may wait
+    if Config.AUTO_ENSURE_INDEXES:
+        threading.Thread(target=build_indexes, name='index-builder', daemon=True).start()
+
+# Rate limits and a concurrency cap for analysis requests; per web process
+if Config.ADMISSION_ENABLED:
+    analysis_admission = AdmissionController(
+        user_rate=Config.ADMISSION_USER_RATE,
+        user_burst=Config.ADMISSION_USER_BURST,
+        ip_rate=Config.ADMISSION_IP_RATE,
+        ip_burst=Config.ADMISSION_IP_BURST,
+        max_in_flight=Config.ADMISSION_MAX_IN_FLIGHT,
+        reserved_for_users=Config.ADMISSION_RESERVED_FOR_USERS
     )
-    logger.info("Emotion analyzer initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing emotion analyzer: {str(e)}")
-    raise
-
-def map_emotion_to_category(emotion):
-    """Map the model's output emotions to our desired categories"""
-    emotion_mapping = {
-        'joy': 'Happy 😊',
-        'happiness': 'Happy 😊',
-        'delight': 'Happy 😊',
-        'pleasure': 'Happy 😊',
-        'cheerfulness': 'Happy 😊',
-        'sadness': 'Sad 😢',
-        'grief': 'Sad 😢',
-        'sorrow': 'Sad 😢',
-        'disappointment': 'Sad 😢',
-        'loneliness': 'Sad 😢',
-        'heartbreak': 'Heartbroken 💔',
-        'heartbroken': 'Heartbroken 💔',
-        'broken heart': 'Heartbroken 💔',
-        'heart ache': 'Heartbroken 💔',
-        'emotional pain': 'Heartbroken 💔',
-        'anger': 'Angry 😠',
-        'annoyance': 'Angry 😠',
-        'irritation': 'Angry 😠',
-        'frustration': 'Angry 😠',
-        'rage': 'Angry 😠',
-        'fear': 'Fearful 😰',
-        'anxiety': 'Fearful 😰',
-        'worry': 'Fearful 😰',
-        'nervousness': 'Fearful 😰',
-        'stress': 'Fearful 😰',
-        'surprise': 'Surprised 😲',
-        'amazement': 'Surprised 😲',
-        'awe': 'Surprised 😲',
-        'wonder': 'Surprised 😲',
-        'shock': 'Surprised 😲',
-        'disgust': 'Disgusted 🤢',
-        'revulsion': 'Disgusted 🤢',
-        'aversion': 'Disgusted 🤢',
-        'contempt': 'Disgusted 🤢',
-        'calm': 'Calm 😌',
-        'relaxed': 'Calm 😌',
-        'peaceful': 'Calm 😌',
-        'serene': 'Calm 😌',
-        'tranquil': 'Calm 😌',
-        'excitement': 'Excited ⚡',
-        'enthusiasm': 'Excited ⚡',
-        'eager': 'Excited ⚡',
-        'thrill': 'Excited ⚡',
-        'anticipation': 'Excited ⚡',
-        'love': 'Loving 💝',
-        'affection': 'Loving 💝',
-        'caring': 'Loving 💝',
-        'tenderness': 'Loving 💝',
-        'fondness': 'Loving 💝',
-        'adoration': 'Loving 💝',
-        'determination': 'Motivated 💪',
-        'motivation': 'Motivated 💪',
-        'drive': 'Motivated 💪',
-        'ambition': 'Motivated 💪',
-        'passion': 'Motivated 💪',
-        'inspiration': 'Motivated 💪',
-        'purpose': 'Motivated 💪',
-        'focus': 'Motivated 💪',
-        'dedication': 'Motivated 💪',
-        'commitment': 'Motivated 💪',
-        'perseverance': 'Motivated 💪',
-        'resilience': 'Motivated 💪',
-        'achievement': 'Motivated 💪',
-        'success': 'Motivated 💪',
-        'progress': 'Motivated 💪',
-        'growth': 'Motivated 💪',
-        'improvement': 'Motivated 💪',
-        'development': 'Motivated 💪',
-        'goals': 'Motivated 💪',
-        'aspirations': 'Motivated 💪',
-        'dreams': 'Motivated 💪',
-        'vision': 'Motivated 💪',
-        'mission': 'Motivated 💪',
-        'empowerment': 'Motivated 💪',
-        'strength': 'Motivated 💪',
-        'courage': 'Motivated 💪',
-        'confidence': 'Motivated 💪',
-        'belief': 'Motivated 💪',
-        'hope': 'Motivated 💪',
-        'optimism': 'Motivated 💪',
-        'positivity': 'Motivated 💪',
-        'energy': 'Motivated 💪',
-        'vitality': 'Motivated 💪',
-        'vigor': 'Motivated 💪',
-        'neutral': 'Neutral 😐',
-        'indifferent': 'Neutral 😐',
-        'unemotional': 'Neutral 😐',
-        'nostalgia': 'Nostalgic 🎭',
-        'reminiscence': 'Nostalgic 🎭',
-        'memories': 'Nostalgic 🎭',
-        'recollection': 'Nostalgic 🎭',
-        'remembrance': 'Nostalgic 🎭',
-        'sentimental': 'Nostalgic 🎭',
-        'yearning': 'Nostalgic 🎭',
-        'longing': 'Nostalgic 🎭',
-        'homesick': 'Nostalgic 🎭',
-        'melancholy': 'Nostalgic 🎭',
-        'wistful': 'Nostalgic 🎭',
-        'reflective': 'Nostalgic 🎭',
-        'contemplative': 'Nostalgic 🎭',
-        'reminiscent': 'Nostalgic 🎭',
-        'retrospective': 'Nostalgic 🎭'
-    }
-    return emotion_mapping.get(emotion, 'Neutral 😐')
-
-def preprocess_text(text):
-    """Preprocess text to better detect motivation-related phrases"""
-    motivation_phrases = {
-        'determined to': 'determination',
-        'motivated to': 'motivation',
-        'driven to': 'drive',
-        'committed to': 'commitment',
-        'focused on': 'focus',
-        'passionate about': 'passion',
-        'dedicated to': 'dedication',
-        'inspired to': 'inspiration',
-        'eager to': 'eagerness',
-        'excited to': 'excitement',
-        'looking forward to': 'anticipation',
-        'can\'t wait to': 'anticipation',
-        'ready to': 'determination',
-        'willing to': 'determination',
-        'going to': 'determination',
-        'plan to': 'determination',
-        'aim to': 'determination',
-        'striving to': 'determination',
-        'working to': 'determination',
-        'trying to': 'determination'
-    }
-    
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Check for motivation phrases
-    for phrase, emotion in motivation_phrases.items():
-        if phrase in text_lower:
-            # Add the emotion explicitly to the text
-            text = f"{text} {emotion}"
-    
-    return text
+else:
+    analysis_admission = None
 
-def group_emotions(emotions_with_scores):
-    """Group emotions into categories and calculate category scores"""
-    category_scores = {category: 0.0 for category in EMOTION_CATEGORIES.keys()}
-    category_emotions = {category: [] for category in EMOTION_CATEGORIES.keys()}
-    
-    # First pass: collect all emotions and their scores
-    for emotion in emotions_with_scores:
-        label = emotion['label']
-        score = emotion['score']
-        
-        # Map the emotion to our category
-        category = map_emotion_to_category(label)
-        
-        # Boost motivation-related emotions
-        if category == 'Motivated 💪':
-            score *= 1.5  # Increase the weight of motivation-related emotions
-        
-        # Add to category scores and emotions
-        category_scores[category] += score
-        category_emotions[category].append({
-            'emotion': label,
-            'emoji': EMOTION_EMOJIS.get(label, ''),
-            'score': round(score * 100, 2)
-        })
-    
-    # Second pass: normalize scores and filter low confidence emotions
-    min_confidence = 0.1  # Minimum confidence threshold
-    filtered_categories = {}
-    
-    for category, score in category_scores.items():
-        if score > min_confidence:
-            # Normalize the score
-            normalized_score = score / len(category_emotions[category]) if category_emotions[category] else score
-            filtered_categories[category] = normalized_score
-    
-    # Sort categories by score
-    sorted_categories = sorted(
-        [(category, score) for category, score in filtered_categories.items()],
-        key=lambda x: x[1],
-        reverse=True
+if Config.MOOD_CACHE_ENABLED:
+    mood_cache = MoodResultCache(
+        max_size=Config.MOOD_CACHE_SIZE,
+        ttl=Config.MOOD_CACHE_TTL,
+        backend=CACHE_BACKENDS[Config.MOOD_CACHE_BACKEND]() if Config.MOOD_CACHE_BACKEND else None
     )
-    
-    # Format the response
-    grouped_emotions = {
-        'primary_category': sorted_categories[0][0] if sorted_categories else 'Neutral 😐',
-        'categories': [
-            {
-                'name': category,
-                'score': round(score * 100, 2),
-                'emotions': sorted(category_emotions[category], key=lambda x: x['score'], reverse=True)
-            }
-            for category, score in sorted_categories
-        ]
-    }
-    
-    return grouped_emotions
+else:
+    mood_cache = None
+
+# Nearest-neighbour search over the journal entry embeddings of each user
+if Config.EMBEDDINGS_ENABLED:
+    embedding_index = EmbeddingIndex(
+        emotion_model.embedding_version,
+        max_vectors=Config.EMBEDDING_INDEX_MAX_VECTORS,
+        ttl=Config.EMBEDDING_INDEX_TTL
+    )
+else:
+    embedding_index = None
+
+# PDF exports render on a background pool into a size-capped artifact store;
+# an unchanged journal is served from the store without re-rendering
+export_jobs = ExportJobManager(
+    ArtifactStore(Config.EXPORT_ARTIFACT_DIR, Config.EXPORT_ARTIFACT_MAX_BYTES),
+    max_workers=Config.EXPORT_WORKERS,
+    batch_size=Config.EXPORT_BATCH_SIZE,
+    job_timeout=Config.EXPORT_JOB_TIMEOUT,
+    queue_size=Config.EXPORT_QUEUE_SIZE
+)
+
+metrics.registry.gauge('moodtunes_model_ready', 'Whether the emotion model is loaded', lambda: int(emotion_model.is_ready()))
+if analysis_admission is not None:
+    metrics.registry.gauge('moodtunes_admission_in_flight', 'Analyses holding an admission slot', analysis_admission.in_flight)
+metrics.registry.gauge('moodtunes_inference_queue_depth', 'Inference requests waiting for the emotion model', emotion_model.queue_depth)
+if mood_cache is not None:
+    metrics.registry.callback_counter(
+        'moodtunes_mood_cache_hits_total', 'Mood analysis cache hits (local and shared)',
+        lambda: mood_cache.stats()['hits'] + mood_cache.stats()['shared_hits']
+    )
+    metrics.registry.callback_counter(
+        'moodtunes_mood_cache_misses_total', 'Mood analysis cache misses', lambda: mood_cache.stats()['misses']
+    )
+metrics.registry.callback_counter(
+    'moodtunes_password_hash_rejected_total', 'Logins and registrations refused because the password hasher was busy',
+    lambda: password_hasher.stats()['rejected'] + password_hasher.stats()['timed_out']
+)
+
+def password_hasher_busy():
+    response = jsonify({'error': 'Too many sign-ins at the moment, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def duplicate_key_field(error):
+    """The field whose unique index a NotUniqueError was raised for, if known"""
+    details = getattr(error.__context__, 'details', None) or {}
+    key_pattern = details.get('keyPattern') or {}
+    if len(key_pattern) == 1:
+        return next(iter(key_pattern))
+    # Servers that omit keyPattern name the index in the message: "index: email_1 dup key"
+    match = re.search(r'index: (\w+?)_1 ', str(error))
+    return match.group(1) if match else None
 
 @app.route('/api/auth/register', methods=['POST'])
 def register():
@@ -416,15 +174,24 @@ def register():
     if not all(k in data for k in ['username', 'email', 'password']):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    if User.objects(username=data['username']).first():
-        return jsonify({'error': 'Username already exists'}), 400
-    
-    if User.objects(email=data['email']).first():
-        return jsonify({'error': 'Email already exists'}), 400
-    
     user = User(username=data['username'], email=data['email'])
-    user.set_password(data['password'])
-    user.save()
+    try:
+        user.set_password(data['password'])
+    except PasswordHasherBusyError:
+        return password_hasher_busy()
+
+    # One insert; the unique username/email indexes reject duplicates, also
+    # between concurrent sign-ups
+    try:
+        user.save(force_insert=True)
+    except NotUniqueError as e:
+        field = duplicate_key_field(e)
+        if field is None:
+            # Only when the server didn't say which index rejected the insert
+            field = 'username' if User.objects(username=data['username']).only('id').first() else 'email'
+        if field == 'username':
+            return jsonify({'error': 'Username already exists'}), 400
+        return jsonify({'error': 'Email already exists'}), 400
     
     access_token = create_access_token(identity=str(user.id))
     return jsonify({'token': access_token, 'user': {'username': user.username, 'email': user.email}}), 201
@@ -436,7 +203,12 @@ def login():
         return jsonify({'error': 'Missing username or password'}), 400
     
     user = User.objects(username=data['username']).first()
-    if user and user.check_password(data['password']):
+    try:
+        valid = user is not None and user.check_password(data['password'])
+    except PasswordHasherBusyError:
+        return password_hasher_busy()
+    if valid:
+        user.upgrade_password_hash(data['password'])
         access_token = create_access_token(identity=str(user.id))
         return jsonify({'token': access_token, 'user': {'username': user.username, 'email': user.email}}), 200
     
@@ -445,40 +217,33 @@ def login():
 @app.route('/api/journal', methods=['POST'])
 @jwt_required()
 def create_journal_entry():    
-    print("\n=== Starting journal entry creation ===")
-    print("\nRequest Details:")
-    print(f"Method: {request.method}")
-    print(f"URL: {request.url}")
-    print(f"Headers: {dict(request.headers)}")
-    print(f"Content-Type: {request.content_type}")
-    
     try:
         current_user_id = get_jwt_identity()
-        print(f"\nUser ID from token: {current_user_id}")
         
         if not current_user_id:
-            print("Error: Invalid or expired token")
+            logger.info("Journal entry rejected: invalid or expired token")
             return jsonify({
                 'success': False, 
                 'error': 'Invalid or expired token',
                 'validation_stage': 'authentication'
             }), 401
         
-        # Verify user exists in database
-        user = User.objects(id=current_user_id).first()
-        if not user:
-            print(f"Error: User {current_user_id} not found in database")
+        # Reference the user by the id in the token instead of loading the User document
+        try:
+            user_ref = ObjectId(current_user_id)
+        except (InvalidId, TypeError):
+            logger.info("Journal entry rejected: invalid user id in token %r", current_user_id)
             return jsonify({
                 'success': False,
-                'error': 'User not found',
-                'validation_stage': 'user_verification'
-            }), 404
+                'error': 'Invalid or expired token',
+                'validation_stage': 'authentication'
+            }), 401
         
         try:
             data = request.get_json()
-            print("\nReceived data:", data)
+            payload_logger.debug("Journal entry request from %s: %s", current_user_id, data)
         except Exception as e:
-            print(f"\nError parsing JSON: {str(e)}")
+            logger.info("Journal entry rejected: invalid JSON: %s", e)
             return jsonify({
                 'success': False,
                 'error': 'Invalid JSON data',
@@ -486,89 +251,84 @@ def create_journal_entry():
                 'details': str(e)
             }), 400
         
-        if not data:
-            print("Error: Empty request data")
-            return jsonify({
-                'success': False,
-                'error': 'Empty request data',
-                'validation_stage': 'data_validation'
-            }), 400
-        
-        if 'content' not in data:
-            print("Error: Missing content field")
-            return jsonify({
-                'success': False, 
-                'error': 'Content is required',
-                'received_fields': list(data.keys()),
-                'validation_stage': 'content_validation'
-            }), 422
-            
-        content = str(data.get('content', '')).strip()
-        print(f"\nContent length: {len(content)}")
-        print(f"Content: {content}")
-        
-        if not content:
-            print("Error: Empty content")
-            return jsonify({
-                'success': False, 
-                'error': 'Content cannot be empty',
-                'validation_stage': 'content_validation'
-            }), 422
+        try:
+            content = journal_content(data)
+        except JournalRequestError as rejected:
+            logger.info("Journal entry rejected: %s", rejected)
+            return jsonify(rejected.to_dict()), rejected.status
         
         try:
-            # Create journal entry
+            # MongoDB stores datetimes with millisecond precision; truncate now so
+            # the response matches what later reads return
             entry = JournalEntry(
                 content=content,
-                user_id=user
+                user_id=user_ref,
+                created_at=mongo_now()
             )
             
-            # Handle mood data if provided
+            # Handle mood data if provided, or analyze the content in this request
             mood_data = data.get('mood')
+            analysis = None
+            if not mood_data and data.get('analyze'):
+                try:
+                    with admit_analysis(current_user_id):
+                        analysis = analyze_text_cached(content)
+                except AdmissionRejected as rejected:
+                    return admission_rejected(rejected, validation_stage='mood_analysis')
+                except (ModelNotReadyError, BatchTimeoutError, InferenceQueueFullError) as unavailable:
+                    logger.warning("Mood analysis unavailable: %s", unavailable)
+                    response = jsonify({
+                        'success': False,
+                        'error': 'Mood analysis is temporarily unavailable',
+                        'details': str(unavailable),
+                        'validation_stage': 'mood_analysis'
+                    })
+                    response.headers['Retry-After'] = str(Config.MODEL_RETRY_AFTER)
+                    return response, 503
+                mood_data = analysis
+
             if mood_data:
-                print("\nProcessing mood data:", mood_data)
                 try:
                     entry.set_mood(mood_data)
                 except ValueError as ve:
-                    print(f"Mood validation error: {str(ve)}")
+                    logger.info("Journal entry rejected: invalid mood data: %s", ve)
                     return jsonify({
                         'success': False,
                         'error': str(ve),
                         'validation_stage': 'mood_validation'
                     }), 422
+
+            if embedding_index is not None:
+                # Usually cached by the analysis of the same text, in this request
+                # or an earlier /api/analyze-mood call, and saved with the entry
+                embedding = cached_text_embedding(content)
+                if embedding is not None:
+                    entry.set_embedding(embedding, emotion_model.embedding_version)
             
-            # Save the entry
-            print("\nSaving entry to database...")
-            entry.save()
-            print("Entry saved successfully")
-            
-            # Verify the save was successful
-            saved_entry = JournalEntry.objects(id=entry.id).first()
-            if not saved_entry:
-                raise Exception("Entry was not saved properly")
-            
-            saved_mood = saved_entry.get_mood()
-            print("\nSaved entry details:")
-            print(f"ID: {saved_entry.id}")
-            print(f"Content: {saved_entry.content}")
-            print(f"Mood: {saved_mood}")
+            # A single acknowledged insert; the response is built from the in-memory entry
+            entry.save(force_insert=True, write_concern=Config.JOURNAL_WRITE_CONCERN)
+            logger.debug("Journal entry %s saved", entry.id)
+            record_entries_safely([entry.to_mongo()])
+            if entry.embedding:
+                embedding_index.add(current_user_id, entry.id, entry.embedding)
+            elif embedding_queue is not None and not embedding_queue.submit(entry, current_user_id):
+                logger.info("Journal entry %s saved without embedding: embedding queue is full", entry.id)
             
-            return jsonify({
+            response = {
                 'success': True,
                 'entry': {
-                    'id': str(saved_entry.id),
-                    'content': saved_entry.content,
-                    'mood': saved_mood,
-                    'created_at': saved_entry.created_at.isoformat()
+                    'id': str(entry.id),
+                    'content': entry.content,
+                    'mood': entry.get_mood(),
+                    'created_at': entry.created_at.isoformat()
                 }
-            }), 201
+            }
+            if analysis is not None:
+                response['analysis'] = analysis
+            return jsonify(response), 201
             
         except Exception as e:
-            print("\nError saving entry:")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            import traceback
-            print("Traceback:")
-            traceback.print_exc()
+            logger.exception("Error saving journal entry")
             return jsonify({
                 'success': False,
                 'error': 'Failed to save journal entry',
@@ -578,12 +338,7 @@ def create_journal_entry():
             }), 500
             
     except Exception as e:
-        print("\nUnexpected error:")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        print("Traceback:")
-        traceback.print_exc()
+        logger.exception("Unexpected error creating journal entry")
         return jsonify({
             'success': False,
             'error': 'An unexpected error occurred',
@@ -592,9 +347,96 @@ def create_journal_entry():
             'validation_stage': 'unexpected'
         }), 500
 
+@app.route('/api/journal/import', methods=['POST'])
+@jwt_required()
+def import_journal():
+    """Bulk-import journal entries from a JSON array or NDJSON upload.
+
+    Each record is {"content": ..., "created_at": optional ISO date, "mood": optional}.
+    With ?analyze=true, records without a mood are analyzed in batches.
+    """
+    current_user_id = get_jwt_identity()
+    try:
+        user_ref = ObjectId(current_user_id)
+    except (InvalidId, TypeError):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token'
+        }), 401
+
+    if 'file' in request.files:
+        records = iter_ndjson_records(request.files['file'].stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records = iter_ndjson_records(request.stream)
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({
+                'success': False,
+                'error': 'Expected a JSON array of entries or an NDJSON upload'
+            }), 400
+
+    analyze_fn = None
+    if request.args.get('analyze', 'false').lower() == 'true':
+        # Fail fast rather than importing everything without moods
+        if not emotion_model.wait_until_ready(Config.MODEL_WARMUP_TIMEOUT):
+            warming_up = emotion_model.state == EmotionModel.LOADING
+            response = jsonify({
+                'success': False,
+                'error': 'Mood analysis model is warming up' if warming_up else 'Mood analysis model is unavailable',
+                'status': 'warming_up' if warming_up else 'unavailable'
+            })
+            response.headers['Retry-After'] = str(Config.MODEL_RETRY_AFTER)
+            return response, 503
+
+        def analyze_fn(texts):
+            try:
+                # Each chunk sent to the model takes one admission token and slot
+                return analyze_texts_cached(texts, admit_analysis(current_user_id))
+            except (AdmissionRejected, ModelNotReadyError, BatchTimeoutError, InferenceQueueFullError) as e:
+                raise ImportAnalysisError(str(e))
+
+    try:
+        summary = import_journal_entries(
+            records,
+            user_ref,
+            analyze_fn=analyze_fn,
+            chunk_size=Config.IMPORT_CHUNK_SIZE,
+            max_records=Config.IMPORT_MAX_RECORDS,
+            write_concern=Config.JOURNAL_WRITE_CONCERN,
+            on_insert=record_entries_safely,
+            embed_fn=embed_imported_entries if embedding_index is not None else None
+        )
+    except Exception as e:
+        logger.exception("Error importing journal entries")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to import journal entries',
+            'details': str(e)
+        }), 500
+
+    if 'failed_chunk' in summary:
+        # The earlier chunks are stored; tell the client where the import stopped
+        return jsonify({
+            'success': False,
+            'error': 'Import stopped: writing entries to the database failed',
+            **summary
+        }), 503
+
+    return jsonify({'success': True, **summary}), 200
+
 @app.route('/api/journal', methods=['GET'])
 @jwt_required()
 def get_journal_entries():
+    """List journal entries, newest first.
+
+    Query parameters:
+        limit: page size (max JOURNAL_MAX_PAGE_SIZE). Without limit or cursor
+            every entry is returned, as before.
+        cursor: next_cursor from the previous page.
+        fields: comma-separated subset of id, content, created_at, mood.
+        stream: 'ndjson' to stream one entry per line as the cursor yields them.
+    """
     try:
         current_user_id = get_jwt_identity()
         if not current_user_id:
@@ -604,53 +446,240 @@ def get_journal_entries():
                 'details': 'Authentication required'
             }), 401
 
-        print(f"Fetching entries for user {current_user_id}")
-        
         try:
-            entries = JournalEntry.objects(user_id=current_user_id).order_by('-created_at')
-            print(f"Found {len(entries)} entries")
-            
-            response_entries = []
-            for entry in entries:
-                try:
-                    mood_data = entry.get_mood()
-                    entry_data = {
-                        'id': str(entry.id),
-                        'content': entry.content,
-                        'created_at': entry.created_at.isoformat(),
-                        'mood': mood_data
-                    }
-                    response_entries.append(entry_data)
-                except Exception as entry_error:
-                    print(f"Error processing entry {entry.id}: {str(entry_error)}")
-                    # Skip problematic entries but continue processing others
-                    continue
-            
+            fields, limit, cursor = parse_journal_query(
+                request.args, Config.JOURNAL_DEFAULT_PAGE_SIZE, Config.JOURNAL_MAX_PAGE_SIZE
+            )
+            paginated = limit is not None
+            query = Q(user_id=current_user_id)
+            if cursor:
+                cursor_created_at, cursor_id = cursor
+                query &= Q(created_at__lt=cursor_created_at) | Q(created_at=cursor_created_at, id__lt=cursor_id)
+        except ValueError as ve:
             return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
+
+        # created_at is always loaded since the cursor is built from it
+        projection = {JOURNAL_RESPONSE_FIELDS[field] for field in fields} | {'created_at'}
+        entries = (
+            JournalEntry.objects(query)
+            .order_by('-created_at', '-id')
+            .only(*projection)
+            .batch_size(Config.JOURNAL_STREAM_BATCH_SIZE)
+            .as_pymongo()
+        )
+        if paginated:
+            # Fetch one extra entry to know whether another page exists
+            entries = entries.limit(limit + 1)
+
+        if request.args.get('stream') == 'ndjson':
+            def generate():
+                last_doc = None
+                for count, doc in enumerate(entries):
+                    if paginated and count == limit:
+                        yield json.dumps({'next_cursor': encode_journal_cursor(last_doc)}) + '\n'
+                        break
+                    last_doc = doc
+                    yield json.dumps(serialize_journal_doc(doc, fields)) + '\n'
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        try:
+            docs = list(entries)
+            next_cursor = None
+            if paginated and len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = encode_journal_cursor(docs[-1])
+
+            response = {
                 'success': True,
-                'entries': response_entries
-            }), 200
-            
+                'entries': [serialize_journal_doc(doc, fields) for doc in docs]
+            }
+            if paginated:
+                response['next_cursor'] = next_cursor
+            return jsonify(response), 200
+
         except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
+            logger.exception("Database error reading journal entries")
             return jsonify({
                 'success': False,
                 'error': 'Failed to fetch entries from database',
                 'details': str(db_error)
             }), 500
-            
+
     except Exception as e:
-        print(f"Unexpected error in get_journal_entries: {str(e)}")
+        logger.exception("Unexpected error in get_journal_entries")
         return jsonify({
             'success': False,
             'error': 'An unexpected error occurred',
             'details': str(e)
         }), 500
 
+@app.route('/api/journal/search', methods=['GET'])
+@jwt_required()
+def search_journal_entries():
+    """Full-text search over the user's journal, best matches first.
+
+    Query parameters:
+        q: search text; words, "quoted phrases" and -excluded words.
+        mood: comma-separated primary moods, any of which must match.
+        emotions: comma-separated emotions, all of which must match.
+        start, end: ISO date range on created_at.
+        limit: page size (max JOURNAL_MAX_PAGE_SIZE).
+        cursor: next_cursor from the previous page.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        try:
+            search = parse_search_query(
+                request.args, Config.JOURNAL_DEFAULT_PAGE_SIZE, Config.JOURNAL_MAX_PAGE_SIZE
+            )
+            pipeline = search_pipeline(current_user_id, search)
+        except (ValueError, InvalidId) as ve:
+            return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
+
+        try:
+            docs = list(JournalEntry._get_collection().aggregate(pipeline, maxTimeMS=Config.SEARCH_MAX_TIME_MS))
+        except ExecutionTimeout:
+            logger.warning("Journal search timed out for user %s", current_user_id)
+            return jsonify({
+                'success': False,
+                'error': 'Search took too long; narrow it down with more words or filters'
+            }), 503
+
+        hits, next_cursor = search_results(docs, search, Config.SEARCH_SNIPPET_CHARS)
+        return jsonify({
+            'success': True,
+            'results': hits,
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        logger.exception("Error searching journal entries")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to search journal entries',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/journal/<entry_id>/similar', methods=['GET'])
+@jwt_required()
+def similar_journal_entries(entry_id):
+    """The user's entries that felt most like this one, by embedding similarity: ?limit="""
+    try:
+        if embedding_index is None:
+            return jsonify({
+                'success': False,
+                'error': 'Similar entries are not enabled on this server'
+            }), 404
+
+        current_user_id = get_jwt_identity()
+        try:
+            limit = parse_page_size(
+                request.args.get('limit'), Config.SIMILAR_ENTRIES_DEFAULT, Config.JOURNAL_MAX_PAGE_SIZE
+            )
+        except ValueError as ve:
+            return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
+
+        try:
+            entry_ref = ObjectId(entry_id)
+        except InvalidId:
+            entry_ref = None
+        doc = None
+        if entry_ref is not None:
+            doc = (
+                JournalEntry.objects(id=entry_ref, user_id=current_user_id)
+                .only('embedding', 'embedding_version')
+                .as_pymongo()
+                .first()
+            )
+        if doc is None:
+            return jsonify({
+                'success': False,
+                'error': 'Journal entry not found'
+            }), 404
+        if not doc.get('embedding') or doc.get('embedding_version') != embedding_index.version:
+            return jsonify({
+                'success': False,
+                'error': 'This entry has no embedding yet',
+                'status': 'not_embedded'
+            }), 409
+
+        neighbours = embedding_index.nearest(
+            current_user_id, decode_embedding(doc['embedding']), limit, exclude=entry_ref
+        )
+        # Only the entries returned are read
+        docs = {
+            doc['_id']: doc
+            for doc in JournalEntry.objects(id__in=[entry_ref for entry_ref, _ in neighbours])
+            .only('id', 'content', 'created_at', 'mood_data')
+            .as_pymongo()
+        }
+        results = []
+        for neighbour_ref, similarity in neighbours:
+            neighbour = docs.get(neighbour_ref)
+            if neighbour is None:
+                # Deleted since the user's vectors were loaded
+                continue
+            results.append({
+                **serialize_journal_doc(neighbour, ['id', 'created_at', 'mood']),
+                'similarity': round(similarity, 4),
+                'snippet': snippet(neighbour.get('content') or '', [], Config.SEARCH_SNIPPET_CHARS)
+            })
+        return jsonify({
+            'success': True,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        logger.exception("Error finding similar journal entries")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to find similar entries',
+            'details': str(e)
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    # Liveness: the process is up and serving requests. It never asks the model,
+    # which in pool mode is a call to the inference service; see /api/health/ready
     return jsonify({"status": "healthy", "message": "API is running"})
 
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    # Readiness: mood analysis can be served
+    status = emotion_model.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/analyze-mood/stats', methods=['GET'])
+def analyze_mood_stats():
+    return jsonify({
+        'model': emotion_model.status(),
+        'batching': emotion_model.inference_stats(),
+        'cache': mood_cache.stats() if mood_cache is not None else None,
+        'admission': analysis_admission.stats() if analysis_admission is not None else None,
+        'embedding_index': embedding_index.stats() if embedding_index is not None else None,
+        'embedding_queue': embedding_queue.stats() if embedding_queue is not None else None,
+        'logging': logging_stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request, analysis and MongoDB metrics in the Prometheus text format"""
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Not found'}), 404
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {Config.METRICS_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/', methods=['GET'])
 def root():
     return jsonify({"message": "Welcome to the Flask API!"})
@@ -668,8 +697,9 @@ def get_mood_history(user_id):
         if current_user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
             
-        entries = JournalEntry.objects(user_id=user_id).order_by('-created_at')
-        history = [{'created_at': entry.created_at.isoformat()} for entry in entries]
+        # Covered by the (user_id, -created_at, -_id) index: no documents are fetched
+        entries = JournalEntry.objects(user_id=user_id).order_by('-created_at').only('created_at').as_pymongo()
+        history = [{'created_at': entry['created_at'].isoformat()} for entry in entries]
         return jsonify(history)
     except Exception as e:
         return jsonify({
@@ -677,181 +707,208 @@ def get_mood_history(user_id):
             'error': str(e)
         }), 500
 
-def detect_motivation(text):
-    """Directly detect motivation using pattern matching"""
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Define motivation patterns with weighted scores
-    motivation_patterns = [
-        # Direct motivation words (weight: 0.4)
-        (r'\b(motivated|motivation|inspire|inspired|inspiration|determined|determination)\b', 0.4),
-        (r'\b(driven|ambitious|passionate|focused|dedicated|committed)\b', 0.4),
-        
-        # Action-oriented phrases (weight: 0.3)
-        (r'\b(going to|plan to|aim to|striving to|working to|trying to)\b', 0.3),
-        (r'\b(achieve|accomplish|reach|attain|succeed|succeeding)\b', 0.3),
-        
-        # Goal-related terms (weight: 0.3)
-        (r'\b(goal|target|objective|mission|purpose|vision)\b', 0.3),
-        (r'\b(dream|aspiration|ambition|drive|push|progress)\b', 0.3),
-        
-        # Growth and improvement (weight: 0.2)
-        (r'\b(improve|grow|develop|progress|advance|better)\b', 0.2),
-        (r'\b(learning|growing|developing|improving|advancing)\b', 0.2),
-        
-        # Positive mindset (weight: 0.2)
-        (r'\b(never give up|keep going|push through|stay strong)\b', 0.2),
-        (r'\b(believe|confidence|strength|courage|power)\b', 0.2)
-    ]
-    
-    import re
-    
-    # Check each pattern and calculate motivation score with weighted matches
-    motivation_score = 0
-    for pattern, weight in motivation_patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            motivation_score += len(matches) * weight
-    
-    # Boost the score if multiple motivation indicators are present
-    if motivation_score > 0:
-        motivation_score *= 1.5
-    
-    return motivation_score
+@app.route('/api/mood-history/<user_id>/summary', methods=['GET'])
+@jwt_required()
+def get_mood_summary(user_id):
+    """Mood trend from the pre-aggregated rollups: ?granularity=day|week|month&start=&end="""
+    try:
+        current_user_id = get_jwt_identity()
+        if current_user_id != user_id:
+            return jsonify({'error': 'Unauthorized'}), 403
 
-def detect_love(text):
-    """Directly detect love and relationship-related emotions"""
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Define love and relationship patterns
-    love_patterns = [
-        # Relationship words
-        r'\b(relationship|love|romance|dating|partner|boyfriend|girlfriend|spouse|husband|wife)\b',
-        r'\b(couple|marriage|wedding|engagement|proposal|anniversary)\b',
-        r'\b(crush|infatuation|attraction|chemistry|connection|bond)\b',
-        
-        # Love feelings
-        r'\b(love|adore|cherish|care|date|affection|fondness|tenderness)\b',
-        r'\b(passion|desire|longing|yearning|devotion|commitment)\b',
-        r'\b(heart|soul|feelings|emotions|sentiment|attachment)\b',
-        
-        # Relationship actions
-        r'\b(together|dating|seeing|meeting|talking|chatting|connecting)\b',
-        r'\b(share|care|support|trust|understand|respect|appreciate)\b',
-        r'\b(kiss|hug|hold|touch|embrace|caress|comfort)\b',
-        
-        # Relationship states
-        r'\b(single|taken|committed|exclusive|serious|casual|complicated)\b',
-        r'\b(breakup|divorce|separation|reconciliation|reunion)\b',
-        
-        # Love expressions
-        r'\b(miss you|love you|care about|think about|dream about)\b',
-        r'\b(special|important|meaningful|precious|valuable)\b',
-        r'\b(forever|always|never|forever|eternal|endless)\b'
-    ]
-    
-    import re
-    
-    # Check each pattern and calculate love score
-    love_score = 0
-    for pattern in love_patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            love_score += len(matches) * 0.2
-    
-    return love_score
+        granularity = request.args.get('granularity', 'day')
+        try:
+            start_at, end_at = parse_date_range(request.args.get('start'), request.args.get('end'))
+            buckets = mood_summary(ObjectId(user_id), granularity, start_at, end_at)
+        except ValueError as ve:
+            return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
 
-def detect_heartbreak(text):
-    """Directly detect heartbreak and emotional pain related emotions"""
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Define heartbreak patterns with increased weight for direct heartbreak terms
-    heartbreak_patterns = [
-        # Direct heartbreak words (weight: 0.4)
-        (r'\b(heartbreak|heartbroken|heartbreaking|broken heart|heart ache|emotional pain)\b', 0.4),
-        (r'\b(heart hurts|heart aching|heart pain|heart sore)\b', 0.4),
-        
-        # Breakup related (weight: 0.3)
-        (r'\b(breakup|break up|broke up|breaking up|broken up)\b', 0.3),
-        (r'\b(separated|divorced|split|parted|ended)\b', 0.3),
-        
-        # Emotional pain (weight: 0.2)
-        (r'\b(hurt|pain|ache|suffer|cry|tears|weep)\b', 0.2),
-        (r'\b(miss|longing|yearning|empty|void|alone)\b', 0.2),
-        
-        # Rejection (weight: 0.3)
-        (r'\b(rejected|dumped|left|abandoned|betrayed)\b', 0.3),
-        (r'\b(unwanted|unloved|unappreciated|taken for granted)\b', 0.3),
-        
-        # Healing (weight: 0.2)
-        (r'\b(moving on|getting over|healing|recovering|letting go)\b', 0.2),
-        (r'\b(accept|forgive|forget|move forward|start over)\b', 0.2)
-    ]
-    
-    import re
-    
-    # Check each pattern and calculate heartbreak score with weighted matches
-    heartbreak_score = 0
-    for pattern, weight in heartbreak_patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            heartbreak_score += len(matches) * weight
-    
-    # Boost the score if multiple heartbreak indicators are present
-    if heartbreak_score > 0:
-        heartbreak_score *= 1.5
-    
-    return heartbreak_score
+        return jsonify({
+            'success': True,
+            'granularity': granularity,
+            'buckets': buckets
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-def detect_calm(text):
-    """Directly detect calm and relaxed states"""
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Define calm patterns with weighted scores
-    calm_patterns = [
-        # Direct calm words (weight: 0.4)
-        (r'\b(calm|relaxed|peaceful|serene|tranquil|zen)\b', 0.4),
-        (r'\b(peace|quiet|still|gentle|soft|mellow)\b', 0.4),
-        
-        # Relaxation activities (weight: 0.3)
-        (r'\b(meditate|meditation|yoga|breathing|breath|mindful)\b', 0.3),
-        (r'\b(rest|resting|relax|relaxing|unwind|unwinding)\b', 0.3),
-        
-        # Nature-related calm (weight: 0.3)
-        (r'\b(nature|forest|ocean|waves|breeze|wind)\b', 0.3),
-        (r'\b(sunset|sunrise|stars|moon|night|dawn)\b', 0.3),
-        
-        # Physical relaxation (weight: 0.2)
-        (r'\b(sleep|sleeping|nap|napping|rest|resting)\b', 0.2),
-        (r'\b(comfort|comfortable|cozy|warm|soft|gentle)\b', 0.2),
-        
-        # Mental state (weight: 0.3)
-        (r'\b(clear|clear mind|focused|centered|balanced)\b', 0.3),
-        (r'\b(relief|relieved|ease|eased|soothe|soothed)\b', 0.3),
-        
-        # Time-related calm (weight: 0.2)
-        (r'\b(morning|evening|night|dawn|dusk|twilight)\b', 0.2),
-        (r'\b(weekend|holiday|vacation|break|pause|moment)\b', 0.2)
+def analyze_text(text):
+    """Run the lexicon detectors and the emotion model over text and build the mood response"""
+    with span('inference'):
+        results = emotion_model.analyze(text, wait_timeout=Config.MODEL_WARMUP_TIMEOUT)
+    return build_mood_response(text, results)
+
+def analyze_text_with_embedding(text, wait_timeout=None):
+    """analyze_text plus the text's embedding; needs EMBEDDINGS_ENABLED"""
+    if wait_timeout is None:
+        wait_timeout = Config.MODEL_WARMUP_TIMEOUT
+    with span('inference'):
+        (results, embedding), = emotion_model.analyze_many_with_embeddings([text], wait_timeout=wait_timeout)
+    return build_mood_response(text, results), embedding
+
+def analyze_texts(texts):
+    """Analyze several texts, sending them to the model together"""
+    with span('inference'):
+        results = emotion_model.analyze_many(texts, wait_timeout=Config.MODEL_WARMUP_TIMEOUT)
+    return build_mood_responses(texts, results)
+
+def analyze_texts_with_embeddings(texts):
+    """analyze_texts plus each text's embedding; needs EMBEDDINGS_ENABLED"""
+    with span('inference'):
+        pairs = emotion_model.analyze_many_with_embeddings(texts, wait_timeout=Config.MODEL_WARMUP_TIMEOUT)
+    return build_mood_responses(texts, [results for results, _ in pairs]), [embedding for _, embedding in pairs]
+
+def build_mood_responses(texts, results):
+    with span('grouping'):
+        grouped = group_emotions_batch(results)
+    return [
+        build_mood_response(text, result, grouped_emotions)
+        for text, result, grouped_emotions in zip(texts, results, grouped)
     ]
-    
-    import re
-    
-    # Check each pattern and calculate calm score with weighted matches
-    calm_score = 0
-    for pattern, weight in calm_patterns:
-        matches = re.findall(pattern, text_lower)
-        if matches:
-            calm_score += len(matches) * weight
-    
-    # Boost the score if multiple calm indicators are present
-    if calm_score > 0:
-        calm_score *= 1.5
-    
-    return calm_score
+
+def analyze_text_cached(text):
+    """Analyze text, reusing a cached response for identical normalized text.
+
+    The normalized text is only the cache key; the model and the lexicon
+    always see the original text, line breaks included.
+    """
+    if mood_cache is None:
+        return analyze_text(text)
+
+    with span('cache_lookup'):
+        normalized = normalize_text(text)
+        key = make_cache_key(normalized, emotion_model.version, MOOD_RULESET_VERSION)
+        response = mood_cache.get(key)
+    if response is not None:
+        logger.debug("Mood analysis cache hit")
+        return response
+
+    if emotion_model.embeddings:
+        # The embedding comes from the same forward pass; keep it for saving the entry
+        response, embedding = analyze_text_with_embedding(text)
+        mood_cache.set(embedding_cache_key(normalized), {'embedding': encode_embedding(embedding)})
+    else:
+        response = analyze_text(text)
+    mood_cache.set(key, response)
+    return response
+
+def embedding_cache_key(normalized_text):
+    return make_cache_key(normalized_text, emotion_model.embedding_version, 'embedding')
+
+def cached_text_embedding(text):
+    """Stored embedding bytes cached by an earlier analysis of text, or None"""
+    if mood_cache is None:
+        return None
+    cached = mood_cache.get(embedding_cache_key(normalize_text(text)))
+    return cached['embedding'] if cached is not None else None
+
+def text_embedding_cached(text, admission=None):
+    """Stored embedding bytes for text, reusing the one cached by an earlier analysis.
+
+    Does not wait for the model to load; raises ModelNotReadyError instead.
+    admission, e.g. admit_analysis(), is only entered around a forward pass.
+    """
+    cached = cached_text_embedding(text)
+    if cached is not None:
+        return cached
+    normalized = normalize_text(text)
+
+    with admission or nullcontext():
+        response, embedding = analyze_text_with_embedding(text, wait_timeout=0)
+    data = encode_embedding(embedding)
+    if mood_cache is not None:
+        mood_cache.set(make_cache_key(normalized, emotion_model.version, MOOD_RULESET_VERSION), response)
+        mood_cache.set(embedding_cache_key(normalized), {'embedding': data})
+    return data
+
+def store_entry_embedding(entry, user_id):
+    """Compute and store the embedding of a saved entry; runs on embedding_queue.
+
+    Failures only leave the entry without one, for rescore_entries.py
+    --embeddings-only to fill in.
+    """
+    try:
+        data = text_embedding_cached(entry.content, admit_analysis(user_id))
+        JournalEntry.objects(id=entry.id).update_one(
+            set__embedding=data,
+            set__embedding_version=emotion_model.embedding_version
+        )
+        embedding_index.add(user_id, entry.id, data)
+    except (AdmissionRejected, ModelNotReadyError, BatchTimeoutError, InferenceQueueFullError) as e:
+        logger.warning("Journal entry %s saved without embedding: %s", entry.id, e)
+    except Exception:
+        logger.exception("Failed to store the embedding of journal entry %s", entry.id)
+
+# Entries saved without a cached embedding are embedded off the request thread
+if embedding_index is not None:
+    embedding_queue = EmbeddingQueue(store_entry_embedding, max_pending=Config.EMBEDDING_QUEUE_SIZE)
+else:
+    embedding_queue = None
+
+def embed_imported_entries(entries):
+    """Set the embeddings cached by the import's own analysis; the rest are backfilled"""
+    for entry in entries:
+        embedding = cached_text_embedding(entry.content)
+        if embedding is not None:
+            entry.set_embedding(embedding, emotion_model.embedding_version)
+
+def analyze_texts_cached(texts, admission=None):
+    """Batched analyze_text_cached: only cache misses are sent to the model.
+
+    admission, e.g. admit_analysis(), is only entered around a forward pass.
+    """
+    if mood_cache is None:
+        with admission or nullcontext():
+            return analyze_texts(texts)
+
+    normalized = [normalize_text(text) for text in texts]
+    keys = [make_cache_key(text, emotion_model.version, MOOD_RULESET_VERSION) for text in normalized]
+    responses = [mood_cache.get(key) for key in keys]
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if missing:
+        with admission or nullcontext():
+            if emotion_model.embeddings:
+                # Kept for saving the entries, as in analyze_text_cached
+                analyzed, embeddings = analyze_texts_with_embeddings([texts[i] for i in missing])
+                for i, embedding in zip(missing, embeddings):
+                    mood_cache.set(embedding_cache_key(normalized[i]), {'embedding': encode_embedding(embedding)})
+            else:
+                analyzed = analyze_texts([texts[i] for i in missing])
+        for i, response in zip(missing, analyzed):
+            mood_cache.set(keys[i], response)
+            responses[i] = response
+    return responses
+
+def optional_user_id():
+    """Identity of a valid access token on the request; anonymous (None) otherwise"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        return None
+
+def admit_analysis(user_id=None):
+    """Admission control around one analysis; raises AdmissionRejected"""
+    if analysis_admission is None:
+        return nullcontext()
+    # Background embeddings run outside any request and are always for a user
+    return analysis_admission.admit(user_id, request.remote_addr if has_request_context() else None)
+
+def admission_rejected(rejected, **extra):
+    """429/503 response for a request refused by admission control"""
+    response = jsonify({
+        'success': False,
+        'error': str(rejected),
+        'status': rejected.reason,
+        **extra
+    })
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response, rejected.status
 
 @app.route('/api/analyze-mood', methods=['POST'])
 def analyze_mood():
@@ -861,135 +918,56 @@ def analyze_mood():
             return jsonify({'error': 'No text provided'}), 400
 
         text = data.get('text')
-        logger.info(f"Analyzing text: {text}")
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({'error': 'text must be a non-empty string'}), 400
+        payload_logger.debug("Analyzing text: %s", text)
         
         try:
-            # Check for motivation using pattern matching
-            motivation_score = detect_motivation(text)
-            logger.info(f"Motivation score: {motivation_score}")
-            
-            # Check for love using pattern matching
-            love_score = detect_love(text)
-            logger.info(f"Love score: {love_score}")
-            
-            # Check for heartbreak using pattern matching
-            heartbreak_score = detect_heartbreak(text)
-            logger.info(f"Heartbreak score: {heartbreak_score}")
-            
-            # Check for calm using pattern matching
-            calm_score = detect_calm(text)
-            logger.info(f"Calm score: {calm_score}")
-            
-            # Get emotion analysis from the model
-            results = emotion_analyzer(text)[0]
-            logger.info(f"Model emotion results: {results}")
-            
-            # Group emotions into categories
-            grouped_emotions = group_emotions(results)
-            
-            # If calm score is high enough, override the primary emotion
-            if calm_score > 0.2:  # Threshold for calm detection
-                grouped_emotions['primary_category'] = 'Calm 😌'
-                # Add calm to the categories if not present
-                if not any(cat['name'] == 'Calm 😌' for cat in grouped_emotions['categories']):
-                    grouped_emotions['categories'].append({
-                        'name': 'Calm 😌',
-                        'score': round(calm_score * 100, 2),
-                        'emotions': [{
-                            'emotion': 'calm',
-                            'emoji': '😌',
-                            'score': round(calm_score * 100, 2)
-                        }]
-                    })
-            
-            # If motivation score is high enough, override the primary emotion
-            if motivation_score > 0.2:
-                grouped_emotions['primary_category'] = 'Motivated 💪'
-                # Add motivation to the categories if not present
-                if not any(cat['name'] == 'Motivated 💪' for cat in grouped_emotions['categories']):
-                    grouped_emotions['categories'].append({
-                        'name': 'Motivated 💪',
-                        'score': round(motivation_score * 100, 2),
-                        'emotions': [{
-                            'emotion': 'motivation',
-                            'emoji': '💪',
-                            'score': round(motivation_score * 100, 2)
-                        }]
-                    })
-            
-            # If heartbreak score is high enough, override the primary emotion
-            if heartbreak_score > 0.2:
-                grouped_emotions['primary_category'] = 'Heartbroken 💔'
-                # Add heartbreak to the categories if not present
-                if not any(cat['name'] == 'Heartbroken 💔' for cat in grouped_emotions['categories']):
-                    grouped_emotions['categories'].append({
-                        'name': 'Heartbroken 💔',
-                        'score': round(heartbreak_score * 100, 2),
-                        'emotions': [{
-                            'emotion': 'heartbreak',
-                            'emoji': '💔',
-                            'score': round(heartbreak_score * 100, 2)
-                        }]
-                    })
-            
-            # If love score is high enough, override the primary emotion
-            if love_score > 0.3:
-                grouped_emotions['primary_category'] = 'Loving 💝'
-                # Add love to the categories if not present
-                if not any(cat['name'] == 'Loving 💝' for cat in grouped_emotions['categories']):
-                    grouped_emotions['categories'].append({
-                        'name': 'Loving 💝',
-                        'score': round(love_score * 100, 2),
-                        'emotions': [{
-                            'emotion': 'love',
-                            'emoji': '💝',
-                            'score': round(love_score * 100, 2)
-                        }]
-                    })
-            
-            # Get the primary emotion (highest score)
-            primary_emotion = max(results, key=lambda x: x['score'])
-            
-            # Format the response with emojis
-            response = {
-                'primary_mood': grouped_emotions['primary_category'],
-                'confidence': round(primary_emotion['score'] * 100, 2),
-                'emotions': [
-                    f"{map_emotion_to_category(emotion['label']).split(' ')[0]} {EMOTION_EMOJIS.get(emotion['label'], '')}"
-                    for emotion in results
-                    if emotion['score'] > 0.1
-                ],
-                'emotion_groups': grouped_emotions
-            }
-            
-            # If calm was detected, add it to the emotions list
-            if calm_score > 0.2:
-                response['emotions'].append(f"calm 😌")
-            
-            # If motivation was detected, add it to the emotions list
-            if motivation_score > 0.2:
-                response['emotions'].append(f"motivation 💪")
-            
-            # If love was detected, add it to the emotions list
-            if love_score > 0.3:
-                response['emotions'].append(f"love 💝")
-            
-            # If heartbreak was detected, add it to the emotions list
-            if heartbreak_score > 0.2:
-                response['emotions'].append(f"heartbreak 💔")
-            
-            logger.info(f"Analysis response: {json.dumps(response, indent=2)}")
-            return jsonify(response)
+            with admit_analysis(optional_user_id()):
+                response = analyze_text_cached(text)
+            with span('serialization'):
+                return jsonify(response)
+
+        except AdmissionRejected as rejected:
+            return admission_rejected(rejected)
+
+        except ModelNotReadyError as not_ready:
+            logger.warning("Mood analysis unavailable: %s", not_ready)
+            warming_up = not_ready.state == EmotionModel.LOADING
+            response = jsonify({
+                'error': 'Mood analysis model is warming up' if warming_up else 'Mood analysis model is unavailable',
+                'status': 'warming_up' if warming_up else 'unavailable',
+                'details': str(not_ready)
+            })
+            response.headers['Retry-After'] = str(Config.MODEL_RETRY_AFTER)
+            return response, 503
+
+        except BatchTimeoutError as timeout_error:
+            logger.error("Emotion analysis timed out: %s", timeout_error)
+            return jsonify({
+                'error': 'Mood analysis timed out',
+                'details': str(timeout_error)
+            }), 503
+
+        except InferenceQueueFullError as saturated:
+            logger.warning("Mood analysis rejected: %s", saturated)
+            response = jsonify({
+                'error': 'Mood analysis is busy',
+                'status': 'saturated',
+                'details': str(saturated)
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 503
 
         except Exception as analysis_error:
-            logger.error(f"Error during analysis: {str(analysis_error)}")
+            logger.exception("Error during analysis")
             return jsonify({
                 'error': 'Failed to analyze text',
                 'details': str(analysis_error)
             }), 500
 
     except Exception as e:
-        logger.error(f"Error in analyze_mood endpoint: {str(e)}")
+        logger.exception("Error in analyze_mood endpoint")
         return jsonify({
             'error': 'Failed to process request',
             'details': str(e)
@@ -1090,9 +1068,14 @@ def get_music_feedback():
             'error': str(e)
         }), 500
 
+def export_filename():
+    # Generate filename with current date
+    return f"mood-journal-{datetime.now().strftime('%Y-%m-%d')}.pdf"
+
 @app.route('/api/journal/export', methods=['GET'])
 @jwt_required()
 def export_journal_pdf():
+    """Export the journal as a PDF; optional ?start=&end= ISO date filters"""
     try:
         current_user_id = get_jwt_identity()
         if not current_user_id:
@@ -1101,101 +1084,169 @@ def export_journal_pdf():
                 'error': 'Invalid or expired token'
             }), 401
 
-        # Get user's journal entries
-        entries = JournalEntry.objects(user_id=current_user_id).order_by('-created_at')
-        
-        # Create a BytesIO buffer to store the PDF
-        buffer = BytesIO()
-        
-        # Create the PDF document
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        
-        # Create custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.purple
-        )
-        
-        date_style = ParagraphStyle(
-            'CustomDate',
-            parent=styles['Normal'],
-            fontSize=12,
-            textColor=colors.gray
-        )
-        
-        content_style = ParagraphStyle(
-            'CustomContent',
-            parent=styles['Normal'],
-            fontSize=12,
-            spaceAfter=20
-        )
-        
-        mood_style = ParagraphStyle(
-            'CustomMood',
-            parent=styles['Normal'],
-            fontSize=12,
-            textColor=colors.purple,
-            spaceAfter=10
-        )
-        
-        # Build the PDF content
-        story = []
-        
-        # Add title
-        story.append(Paragraph("Mood Journal Report", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Add entries
-        for entry in entries:
-            # Add date
-            date_str = entry.created_at.strftime("%B %d, %Y at %I:%M %p")
-            story.append(Paragraph(date_str, date_style))
-            story.append(Spacer(1, 10))
-            
-            # Add content
-            story.append(Paragraph(entry.content, content_style))
-            
-            # Add mood information if available
-            mood_data = entry.get_mood()
-            if mood_data:
-                mood_text = f"Mood: {mood_data['primary_mood']} (Confidence: {mood_data['confidence']}%)"
-                story.append(Paragraph(mood_text, mood_style))
-                
-                if mood_data.get('emotions'):
-                    emotions_text = "Detected Emotions: " + ", ".join(mood_data['emotions'])
-                    story.append(Paragraph(emotions_text, mood_style))
-            
-            story.append(Spacer(1, 30))
-        
-        # Build the PDF
-        doc.build(story)
-        
-        # Reset buffer position
-        buffer.seek(0)
-        
-        # Generate filename with current date
-        filename = f"mood-journal-{datetime.now().strftime('%Y-%m-%d')}.pdf"
-        
-        # Return the PDF file
+        try:
+            start_at, end_at = parse_date_range(request.args.get('start'), request.args.get('end'))
+        except ValueError as ve:
+            return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
+
+        # Served from the artifact store when the journal has not changed since
+        # the last export; otherwise rendered by a background job to poll
+        try:
+            artifact, job = export_jobs.open_export(ObjectId(current_user_id), start_at, end_at)
+        except ExportQueueFullError:
+            return export_queue_full()
+        if job is not None:
+            response = jsonify({
+                'success': True,
+                'job': job.to_dict()
+            })
+            response.headers['Location'] = url_for('get_export_job', job_id=str(job.id))
+            return response, 202
+
+        # Return the PDF file; send_file closes it once the response is sent
         return send_file(
-            buffer,
+            artifact,
             as_attachment=True,
-            download_name=filename,
+            download_name=export_filename(),
             mimetype='application/pdf'
         )
         
     except Exception as e:
-        print(f"Error generating PDF: {str(e)}")
+        logger.exception("Error generating PDF")
         return jsonify({
             'success': False,
             'error': 'Failed to generate PDF report',
             'details': str(e)
         }), 500
 
+def export_queue_full():
+    """503 response for an export refused because the worker pool is saturated"""
+    response = jsonify({
+        'success': False,
+        'error': 'Too many exports are in progress; try again later'
+    })
+    response.headers['Retry-After'] = str(Config.EXPORT_RETRY_AFTER)
+    return response, 503
+
+@app.route('/api/journal/export/jobs', methods=['POST'])
+@jwt_required()
+def create_export_job():
+    """Queue a PDF export; optional start/end filters in the JSON body or query string"""
+    try:
+        current_user_id = get_jwt_identity()
+        if not current_user_id:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid or expired token'
+            }), 401
+
+        data = request.get_json(silent=True) or {}
+        try:
+            start_at, end_at = parse_date_range(
+                data.get('start') or request.args.get('start'),
+                data.get('end') or request.args.get('end')
+            )
+        except ValueError as ve:
+            return jsonify({
+                'success': False,
+                'error': str(ve)
+            }), 400
+
+        try:
+            job = export_jobs.submit(ObjectId(current_user_id), start_at, end_at)
+        except ExportQueueFullError:
+            return export_queue_full()
+        # A cached artifact completes the job immediately
+        status_code = 200 if job.status == ExportJob.DONE else 202
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        }), status_code
+
+    except Exception as e:
+        logger.exception("Error creating export job")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to create export job',
+            'details': str(e)
+        }), 500
+
+def get_user_export_job(job_id, user_id):
+    """The user's export job, or None if the id is invalid or belongs to someone else"""
+    try:
+        return ExportJob.objects(id=ObjectId(job_id), user_id=ObjectId(user_id)).first()
+    except InvalidId:
+        return None
+
+@app.route('/api/journal/export/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_export_job(job_id):
+    """Poll the status of an export job"""
+    try:
+        job = get_user_export_job(job_id, get_jwt_identity())
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Export job not found'
+            }), 404
+
+        # A job whose worker went away never finishes on its own
+        job = export_jobs.expire_stale(job)
+
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/journal/export/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_export_job(job_id):
+    """Download the PDF of a finished export job"""
+    try:
+        job = get_user_export_job(job_id, get_jwt_identity())
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Export job not found'
+            }), 404
+
+        job = export_jobs.expire_stale(job)
+        if job.status != ExportJob.DONE:
+            return jsonify({
+                'success': False,
+                'error': f'Export job is {job.status}',
+                'job': job.to_dict()
+            }), 409
+
+        artifact = export_jobs.open_artifact(job)
+        if artifact is None:
+            return jsonify({
+                'success': False,
+                'error': 'Export has expired; submit the job again'
+            }), 410
+
+        return send_file(
+            artifact,
+            as_attachment=True,
+            download_name=export_filename(),
+            mimetype='application/pdf'
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Error handling middleware
 @app.errorhandler(500)
 def handle_500_error(e):
@@ -1223,7 +1274,7 @@ def handle_401_error(e):
 
 @app.errorhandler(Exception)
 def handle_generic_error(e):
-    print(f"Unhandled error: {str(e)}")
+    logger.exception("Unhandled error")
     return jsonify({
         'success': False,
         'error': 'An unexpected error occurred',
@@ -1231,5 +1282,8 @@ def handle_generic_error(e):
     }), 500
 
 if __name__ == '__main__':
+    # Skip the reloader's watcher process, which never serves requests
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        emotion_model.start_loading()
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,448 @@
+"""ASGI app for the I/O-bound journal, mood-history and music-feedback routes.
+
+Requests are served on one event loop with MongoDB accessed through Motor,
+so a request waiting on the database holds no thread, and all requests of a
+process share one connection pool. Tokens issued by app.py are accepted, and
+documents are validated by the same JournalEntry/MusicFeedback models before
+they are inserted. Mood analysis, imports and exports stay on app.py.
+
+Usage:
+    hypercorn async_app:app --bind 0.0.0.0:5001
+"""
+import json
+import logging
+from functools import wraps
+
+import jwt
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DESCENDING, WriteConcern
+from pymongo.errors import ExecutionTimeout
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+
+from analytics import rollup_operations, summarize_rollup, summary_filter
+from config import Config
+from journal_requests import (
+    JOURNAL_RESPONSE_FIELDS, JournalRequestError, encode_journal_cursor, journal_content,
+    parse_journal_query, serialize_feedback_doc, serialize_journal_doc
+)
+from journal_search import parse_search_query, search_pipeline, search_results
+from logging_setup import configure_logging, payload_logger, sample_payloads
+from models import JournalEntry, MusicFeedback, mongo_now
+from pdf_export import parse_date_range
+
+app = cors(Quart(__name__))
+app.config.from_object(Config)
+
+configure_logging(
+    level=Config.LOG_LEVEL,
+    fmt=Config.LOG_FORMAT,
+    queue_size=Config.LOG_QUEUE_SIZE,
+    payload_sample_rate=Config.LOG_PAYLOAD_SAMPLE_RATE
+)
+logger = logging.getLogger(__name__)
+
+mongo = None
+
+
+@app.before_request
+async def sample_request_payloads():
+    # Payload logging is sampled per request, not per record
+    sample_payloads()
+
+
+@app.before_serving
+async def connect_mongo():
+    # Created inside the event loop that serves requests
+    global mongo
+    mongo = AsyncIOMotorClient(
+        Config.MONGODB_SETTINGS['host'],
+        maxPoolSize=Config.ASYNC_MONGO_MAX_POOL_SIZE
+    )
+
+
+@app.after_serving
+async def close_mongo():
+    mongo.close()
+
+
+def collection(name, **options):
+    return mongo[Config.MONGODB_DB].get_collection(name, **options)
+
+
+def jwt_required(view):
+    """Decode the access token like flask_jwt_extended and set g.user_id to its identity"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return jsonify({'msg': 'Missing Authorization Header'}), 401
+        try:
+            claims = jwt.decode(header[len('Bearer '):], Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'msg': 'Token has expired'}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({'msg': str(e)}), 422
+        if claims.get('type') != 'access':
+            return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+        g.user_id = claims.get('sub')
+        return await view(*args, **kwargs)
+    return wrapper
+
+
+def user_object_id(user_id):
+    """ObjectId of a token identity, or None if it is not one"""
+    try:
+        return ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+@app.route('/api/journal', methods=['POST'])
+@jwt_required
+async def create_journal_entry():
+    """Insert a journal entry. There is no model here, so the entry has no
+    embedding until rescore_entries.py --embeddings-only fills it in."""
+    user_ref = user_object_id(g.user_id)
+    if user_ref is None:
+        logger.info("Journal entry rejected: invalid user id in token %r", g.user_id)
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token',
+            'validation_stage': 'authentication'
+        }), 401
+
+    try:
+        data = await request.get_json()
+        payload_logger.debug("Journal entry request from %s: %s", g.user_id, data)
+    except Exception as e:
+        logger.info("Journal entry rejected: invalid JSON: %s", e)
+        return jsonify({
+            'success': False,
+            'error': 'Invalid JSON data',
+            'validation_stage': 'json_parsing',
+            'details': str(e)
+        }), 400
+
+    try:
+        content = journal_content(data)
+    except JournalRequestError as rejected:
+        logger.info("Journal entry rejected: %s", rejected)
+        return jsonify(rejected.to_dict()), rejected.status
+
+    mood_data = data.get('mood')
+    if not mood_data and data.get('analyze'):
+        return jsonify({
+            'success': False,
+            'error': 'Mood analysis is not available on this server; POST /api/analyze-mood first',
+            'validation_stage': 'mood_analysis'
+        }), 400
+
+    entry = JournalEntry(content=content, user_id=user_ref, created_at=mongo_now())
+    if mood_data:
+        try:
+            entry.set_mood(mood_data)
+        except ValueError as ve:
+            logger.info("Journal entry rejected: invalid mood data: %s", ve)
+            return jsonify({
+                'success': False,
+                'error': str(ve),
+                'validation_stage': 'mood_validation'
+            }), 422
+
+    try:
+        # The same field validation Document.save() runs
+        entry.validate()
+        doc = entry.to_mongo().to_dict()
+        journal = collection('journal_entries', write_concern=WriteConcern(**Config.JOURNAL_WRITE_CONCERN))
+        result = await journal.insert_one(doc)
+    except Exception as e:
+        logger.exception("Error saving journal entry")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save journal entry',
+            'details': str(e),
+            'error_type': type(e).__name__,
+            'validation_stage': 'database_save'
+        }), 500
+
+    try:
+        await collection('mood_rollups').bulk_write(rollup_operations([doc]), ordered=False)
+    except Exception as e:
+        # The entry is saved; rebuild_rollups repairs the rollups
+        logger.error("Error updating mood rollups: %s", e)
+
+    return jsonify({
+        'success': True,
+        'entry': {
+            'id': str(result.inserted_id),
+            'content': entry.content,
+            'mood': entry.get_mood(),
+            'created_at': entry.created_at.isoformat()
+        }
+    }), 201
+
+
+@app.route('/api/journal', methods=['GET'])
+@jwt_required
+async def get_journal_entries():
+    """List journal entries, newest first; same query parameters as app.py"""
+    user_ref = user_object_id(g.user_id)
+    if user_ref is None:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token',
+            'details': 'Authentication required'
+        }), 401
+
+    try:
+        fields, limit, cursor = parse_journal_query(
+            request.args, Config.JOURNAL_DEFAULT_PAGE_SIZE, Config.JOURNAL_MAX_PAGE_SIZE
+        )
+    except ValueError as ve:
+        return jsonify({
+            'success': False,
+            'error': str(ve)
+        }), 400
+
+    query = {'user_id': user_ref}
+    if cursor:
+        cursor_created_at, cursor_id = cursor
+        query['$or'] = [
+            {'created_at': {'$lt': cursor_created_at}},
+            {'created_at': cursor_created_at, '_id': {'$lt': cursor_id}}
+        ]
+    # created_at is always loaded since the cursor is built from it
+    projection = {JOURNAL_RESPONSE_FIELDS[field]: True for field in fields if field != 'id'}
+    projection['created_at'] = True
+    entries = (
+        collection('journal_entries')
+        .find(query, projection)
+        .sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+        .batch_size(Config.JOURNAL_STREAM_BATCH_SIZE)
+    )
+    if limit is not None:
+        # Fetch one extra entry to know whether another page exists
+        entries = entries.limit(limit + 1)
+
+    if request.args.get('stream') == 'ndjson':
+        async def generate():
+            last_doc = None
+            count = 0
+            async for doc in entries:
+                if limit is not None and count == limit:
+                    yield json.dumps({'next_cursor': encode_journal_cursor(last_doc)}) + '\n'
+                    break
+                last_doc = doc
+                count += 1
+                yield json.dumps(serialize_journal_doc(doc, fields)) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    try:
+        docs = await entries.to_list(length=None)
+    except Exception as db_error:
+        logger.exception("Database error reading journal entries")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to fetch entries from database',
+            'details': str(db_error)
+        }), 500
+
+    next_cursor = None
+    if limit is not None and len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_journal_cursor(docs[-1])
+    response = {
+        'success': True,
+        'entries': [serialize_journal_doc(doc, fields) for doc in docs]
+    }
+    if limit is not None:
+        response['next_cursor'] = next_cursor
+    return jsonify(response), 200
+
+
+@app.route('/api/journal/search', methods=['GET'])
+@jwt_required
+async def search_journal_entries():
+    """Full-text search over the user's journal; same query parameters as app.py"""
+    if user_object_id(g.user_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token',
+            'details': 'Authentication required'
+        }), 401
+
+    try:
+        search = parse_search_query(request.args, Config.JOURNAL_DEFAULT_PAGE_SIZE, Config.JOURNAL_MAX_PAGE_SIZE)
+    except ValueError as ve:
+        return jsonify({
+            'success': False,
+            'error': str(ve)
+        }), 400
+
+    try:
+        docs = await (
+            collection('journal_entries')
+            .aggregate(search_pipeline(g.user_id, search), maxTimeMS=Config.SEARCH_MAX_TIME_MS)
+            .to_list(length=None)
+        )
+    except ExecutionTimeout:
+        logger.warning("Journal search timed out for user %s", g.user_id)
+        return jsonify({
+            'success': False,
+            'error': 'Search took too long; narrow it down with more words or filters'
+        }), 503
+    except Exception as e:
+        logger.exception("Error searching journal entries")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to search journal entries',
+            'details': str(e)
+        }), 500
+
+    hits, next_cursor = search_results(docs, search, Config.SEARCH_SNIPPET_CHARS)
+    return jsonify({
+        'success': True,
+        'results': hits,
+        'next_cursor': next_cursor
+    }), 200
+
+
+@app.route('/api/mood-history/<user_id>', methods=['GET'])
+@jwt_required
+async def get_mood_history(user_id):
+    if g.user_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    user_ref = user_object_id(user_id)
+    if user_ref is None:
+        return jsonify({'success': False, 'error': f"'{user_id}' is not a valid ObjectId"}), 500
+
+    entries = (
+        collection('journal_entries')
+        .find({'user_id': user_ref}, {'_id': False, 'created_at': True})
+        .sort([('created_at', DESCENDING)])
+    )
+    return jsonify([{'created_at': entry['created_at'].isoformat()} async for entry in entries])
+
+
+@app.route('/api/mood-history/<user_id>/summary', methods=['GET'])
+@jwt_required
+async def get_mood_summary(user_id):
+    """Mood trend from the pre-aggregated rollups: ?granularity=day|week|month&start=&end="""
+    if g.user_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    granularity = request.args.get('granularity', 'day')
+    try:
+        start_at, end_at = parse_date_range(request.args.get('start'), request.args.get('end'))
+        query = summary_filter(ObjectId(user_id), granularity, start_at, end_at)
+    except (ValueError, InvalidId) as ve:
+        return jsonify({
+            'success': False,
+            'error': str(ve)
+        }), 400
+
+    rollups = (
+        collection('mood_rollups')
+        .find(query, {'_id': False, 'user_id': False, 'granularity': False})
+        .sort('bucket')
+    )
+    return jsonify({
+        'success': True,
+        'granularity': granularity,
+        'buckets': [summarize_rollup(rollup) async for rollup in rollups]
+    }), 200
+
+
+@app.route('/api/music-feedback', methods=['POST'])
+@jwt_required
+async def submit_music_feedback():
+    user_ref = user_object_id(g.user_id)
+    if user_ref is None:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token'
+        }), 401
+
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            'success': False,
+            'error': 'No data provided'
+        }), 400
+
+    # Validate required fields
+    required_fields = ['playlist_id', 'mood_score']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({
+            'success': False,
+            'error': f'Missing required fields: {", ".join(missing_fields)}'
+        }), 400
+
+    mood_score = data.get('mood_score')
+    if not isinstance(mood_score, int) or mood_score < 1 or mood_score > 10:
+        return jsonify({
+            'success': False,
+            'error': 'Mood score must be an integer between 1 and 10'
+        }), 400
+
+    feedback = MusicFeedback(
+        user_id=user_ref,
+        playlist_id=data['playlist_id'],
+        mood_score=mood_score,
+        feedback_text=data.get('feedback_text', '')
+    )
+    try:
+        feedback.validate()
+        doc = feedback.to_mongo().to_dict()
+        result = await collection('music_feedback').insert_one(doc)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+    doc['_id'] = result.inserted_id
+    return jsonify({
+        'success': True,
+        'feedback': serialize_feedback_doc(doc)
+    }), 201
+
+
+@app.route('/api/music-feedback', methods=['GET'])
+@jwt_required
+async def get_music_feedback():
+    user_ref = user_object_id(g.user_id)
+    if user_ref is None:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid or expired token'
+        }), 401
+
+    feedback_entries = collection('music_feedback').find({'user_id': user_ref}).sort([('created_at', DESCENDING)])
+    return jsonify({
+        'success': True,
+        'feedback': [serialize_feedback_doc(doc) async for doc in feedback_entries]
+    }), 200
+
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "message": "API is running"})
+
+
+@app.errorhandler(Exception)
+async def handle_generic_error(e):
+    if isinstance(e, HTTPException):
+        return e
+    logger.exception("Unhandled error")
+    return jsonify({
+        'success': False,
+        'error': 'An unexpected error occurred',
+        'details': str(e)
+    }), 500
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class BatchTimeoutError(Exception):
+    """Raised when a request is not answered within its timeout"""
+
+
+def check_texts(texts):
+    """Raise TypeError unless every text is a string, before it can join a batch"""
+    for text in texts:
+        if not isinstance(text, str):
+            raise TypeError(f'Texts to analyze must be strings, got {type(text).__name__}')
+
+
+class _PendingRequest:
+    __slots__ = ('text', 'event', 'result', 'error', 'enqueued_at')
+
+    def __init__(self, text):
+        self.text = text
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collect concurrent inference requests and run them as one padded batch.
+
+    ``infer_fn`` receives a list of texts and must return one result per text,
+    in order. For a ``text-classification`` pipeline created with
+    ``return_all_scores=True`` that is the list of label/score dicts per text.
+    When a batch fails, its texts are re-run one at a time, so an error only
+    reaches the request whose text caused it.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=16, window_ms=10.0, timeout=30.0):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.timeout = timeout
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen_batch = 0
+        self._max_seen_depth = 0
+        self._batch_size_histogram = {}
+        self._total_wait = 0.0
+        self._total_inference = 0.0
+        self._isolated_batches = 0
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so restart it in children
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._cond:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='mood-batcher', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def analyze(self, text, timeout=None):
+        """Run a single text through the model and return its scores"""
+        return self.analyze_many([text], timeout=timeout)[0]
+
+    def analyze_many(self, texts, timeout=None):
+        """Queue several texts at once and wait for all of their results"""
+        check_texts(texts)
+        self._ensure_worker()
+        pending = [_PendingRequest(text) for text in texts]
+        with self._cond:
+            self._queue.extend(pending)
+            depth = len(self._queue)
+            self._cond.notify()
+        with self._stats_lock:
+            self._max_seen_depth = max(self._max_seen_depth, depth)
+
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        results = []
+        for item in pending:
+            if not item.event.wait(max(0.0, deadline - time.monotonic())):
+                raise BatchTimeoutError('Timed out waiting for emotion analysis')
+            if item.error is not None:
+                raise item.error
+            results.append(item.result)
+        return results
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Give concurrent callers a short window to join this batch
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                self._infer(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    # Isolate the failing text from the requests it was batched with
+                    self._isolate(batch)
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen_batch = max(self._max_seen_batch, len(batch))
+                self._batch_size_histogram[len(batch)] = self._batch_size_histogram.get(len(batch), 0) + 1
+                self._total_wait += sum(started - item.enqueued_at for item in batch)
+                self._total_inference += finished - started
+
+            for item in batch:
+                item.event.set()
+
+    def _infer(self, batch):
+        outputs = self.infer_fn([item.text for item in batch])
+        if len(outputs) != len(batch):
+            raise RuntimeError(f'Expected {len(batch)} results, got {len(outputs)}')
+        for item, output in zip(batch, outputs):
+            item.result = output
+
+    def _isolate(self, batch):
+        with self._stats_lock:
+            self._isolated_batches += 1
+        for item in batch:
+            try:
+                self._infer([item])
+            except Exception as e:
+                item.error = e
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self):
+        """Snapshot of queue and batch metrics for tuning the window/batch size"""
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self._max_seen_depth,
+                'batches': batches,
+                'items': items,
+                'avg_batch_size': round(items / batches, 2) if batches else 0.0,
+                'max_batch_size_seen': self._max_seen_batch,
+                'batch_size_histogram': dict(sorted(self._batch_size_histogram.items())),
+                'avg_queue_wait_ms': round(self._total_wait / items * 1000, 2) if items else 0.0,
+                'avg_batch_inference_ms': round(self._total_inference / batches * 1000, 2) if batches else 0.0,
+                'isolated_batches': self._isolated_batches,
+                'config': {
+                    'max_batch_size': self.max_batch_size,
+                    'window_ms': self.window * 1000.0
+                }
+            }
@@ -0,0 +1,163 @@
+"""Parity, latency and memory check for the emotion model inference backends.
+
+Each backend is loaded in its own subprocess so peak RSS is measured in
+isolation. Scores are compared against the PyTorch FP32 backend over a fixed
+corpus and the maximum absolute deviation across the go_emotions labels is
+reported, along with per-text latency and batched throughput.
+
+Usage:
+    python benchmarks/bench_backends.py [--backends pytorch pytorch-int8 onnx] [--repeat 5]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from mood_analyzer import EmotionModel, INFERENCE_BACKENDS
+
+CORPUS = [
+    "Today was a wonderful day, I finally finished the project and everyone loved it.",
+    "I can't stop crying, she left and the apartment feels so empty without her.",
+    "Honestly I'm furious that they cancelled the meeting again without telling anyone.",
+    "I'm nervous about tomorrow's exam, I keep thinking I'll forget everything.",
+    "Wow, I did not expect the surprise party at all!",
+    "The food at that place was disgusting and the staff were rude.",
+    "Sat by the ocean this evening and just listened to the waves. Very peaceful.",
+    "I'm so excited for the concert next week, I've been counting down the days.",
+    "Grateful for my friends who showed up when I needed them most.",
+    "I'm determined to run the marathon this year, training starts Monday.",
+    "It was an ordinary day. Went to work, came home, made dinner.",
+    "Looking through old photos from college made me miss those times.",
+    "I'm confused about what he meant by that message.",
+    "I feel guilty for snapping at my sister earlier.",
+    "Thank you so much for the thoughtful gift, it made my week!",
+    "I'm disappointed the trip got cancelled, I was really looking forward to it.",
+    "Not sure how I feel about the new job yet, curious to see how it goes.",
+    "That joke was hilarious, I couldn't stop laughing.",
+    "I'm worried about my dad's health, the tests come back on Friday.",
+    "Relieved that the interview is over and it went better than expected.",
+    "I love you more than words can say.",
+    "Everything is annoying today, even the sound of the fridge.",
+    "Proud of myself for finally setting boundaries at work.",
+    "I keep replaying the argument and feeling embarrassed about what I said."
+]
+
+
+def _rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _run_backend(backend, repeat, queue):
+    try:
+        rss_before = _rss_mb()
+        model = EmotionModel(
+            Config.EMOTION_MODEL_NAME,
+            backend=backend,
+            backend_options={'onnx_model_dir': Config.ONNX_MODEL_DIR}
+        )
+        started = time.perf_counter()
+        model.load()
+        load_seconds = time.perf_counter() - started
+
+        # Warm up kernels and allocator before timing
+        model.pipeline(CORPUS[:2], batch_size=2, truncation=True)
+
+        latencies = []
+        for _ in range(repeat):
+            for text in CORPUS:
+                started = time.perf_counter()
+                model.pipeline(text, truncation=True)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            batch_results = model.pipeline(CORPUS, batch_size=len(CORPUS), truncation=True)
+        batch_seconds = (time.perf_counter() - started) / repeat
+
+        scores = [{item['label']: item['score'] for item in result} for result in batch_results]
+        latencies.sort()
+        queue.put({
+            'backend': backend,
+            'scores': scores,
+            'load_seconds': load_seconds,
+            'latency_p50_ms': statistics.median(latencies),
+            'latency_p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+            'batch_texts_per_second': len(CORPUS) / batch_seconds,
+            'rss_model_mb': _rss_mb() - rss_before,
+            'rss_peak_mb': _rss_mb()
+        })
+    except Exception as e:
+        queue.put({'backend': backend, 'error': f'{type(e).__name__}: {e}'})
+
+
+def run_backend(backend, repeat):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_backend, args=(backend, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def max_deviation(baseline, candidate):
+    """Largest absolute score difference over every text and label, and where it occurs"""
+    worst = (0.0, None)
+    per_label = {}
+    for base_scores, scores in zip(baseline, candidate):
+        for label, base_score in base_scores.items():
+            deviation = abs(base_score - scores.get(label, 0.0))
+            per_label[label] = max(per_label.get(label, 0.0), deviation)
+            if deviation > worst[0]:
+                worst = (deviation, label)
+    return worst, per_label
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=list(INFERENCE_BACKENDS), choices=list(INFERENCE_BACKENDS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--per-label', action='store_true', help='print the max deviation of every label')
+    args = parser.parse_args()
+
+    backends = list(args.backends)
+    if 'pytorch' not in backends:
+        backends.insert(0, 'pytorch')
+
+    results = {}
+    for backend in backends:
+        print(f'Running {backend}...', flush=True)
+        results[backend] = run_backend(backend, args.repeat)
+
+    baseline = results['pytorch']
+    if 'error' in baseline:
+        sys.exit(f"PyTorch FP32 baseline failed: {baseline['error']}")
+
+    print()
+    print(f"{'backend':<14}{'max dev':>10}  {'worst label':<16}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'batch txt/s':>13}{'model MB':>10}{'peak MB':>9}")
+    for backend in backends:
+        result = results[backend]
+        if 'error' in result:
+            print(f"{backend:<14}failed: {result['error']}")
+            continue
+        (deviation, label), per_label = max_deviation(baseline['scores'], result['scores'])
+        print(
+            f"{backend:<14}{deviation:>10.5f}  {label or '-':<16}{result['load_seconds']:>8.1f}"
+            f"{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}"
+            f"{result['batch_texts_per_second']:>13.1f}{result['rss_model_mb']:>10.0f}{result['rss_peak_mb']:>9.0f}"
+        )
+        if args.per_label and backend != 'pytorch':
+            for name, value in sorted(per_label.items(), key=lambda item: item[1], reverse=True):
+                print(f"    {name:<16}{value:.5f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Micro-benchmark: vectorized group_emotions_batch vs. per-item group_emotions.
+
+Scores are synthetic pipeline outputs over the 28 go_emotions labels. The
+parity check compares the full response of both paths, including ties.
+
+Usage:
+    python benchmarks/bench_group_emotions.py [--texts 1 16 256 4096]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotions import group_emotions, group_emotions_batch
+
+# Label order of SamLowe/roberta-base-go_emotions
+GO_EMOTIONS_LABELS = [
+    'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring', 'confusion',
+    'curiosity', 'desire', 'disappointment', 'disapproval', 'disgust', 'embarrassment',
+    'excitement', 'fear', 'gratitude', 'grief', 'joy', 'love', 'nervousness', 'optimism',
+    'pride', 'realization', 'relief', 'remorse', 'sadness', 'surprise', 'neutral'
+]
+
+
+def make_results(rng):
+    """One text's pipeline output: a few strong labels over a low background"""
+    strong = set(rng.sample(range(len(GO_EMOTIONS_LABELS)), rng.randint(0, 4)))
+    results = []
+    for j, label in enumerate(GO_EMOTIONS_LABELS):
+        if j in strong:
+            score = rng.uniform(0.05, 0.99)
+        else:
+            score = rng.choice([rng.uniform(0.0005, 0.02), 0.01, 0.05])
+        results.append({'label': label, 'score': score})
+    return results
+
+
+def check_parity(rng, count=5000):
+    batch = [make_results(rng) for _ in range(count)]
+    # Exact thresholds and repeated values exercise the filter and tie ordering
+    batch.append([{'label': label, 'score': 0.1} for label in GO_EMOTIONS_LABELS])
+    batch.append([{'label': label, 'score': 0.0} for label in GO_EMOTIONS_LABELS])
+    batch.append([])
+    batch.append(list(reversed(batch[0])))
+    for i, (expected, actual) in enumerate(zip([group_emotions(r) for r in batch], group_emotions_batch(batch))):
+        if expected != actual:
+            raise AssertionError(f'Mismatch for item {i}:\n{expected}\n{actual}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', nargs='+', type=int, default=[1, 16, 256, 4096])
+    args = parser.parse_args()
+
+    rng = random.Random(1528)
+    check_parity(rng)
+    print('Parity: batched output matches group_emotions on 5004 score sets')
+
+    for count in args.texts:
+        batch = [make_results(rng) for _ in range(count)]
+        number = max(1, 4096 // count)
+        per_item = min(timeit.repeat(lambda: [group_emotions(r) for r in batch], number=number, repeat=5)) / number
+        batched = min(timeit.repeat(lambda: group_emotions_batch(batch), number=number, repeat=5)) / number
+        print(
+            f'{count:>5} texts: per-item {per_item / count * 1e6:8.1f} us/text  '
+            f'batched {batched / count * 1e6:8.1f} us/text  speedup {per_item / batched:5.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Micro-benchmark: single-pass lexicon engine vs. per-pattern re.findall.
+
+Timings are the best of 5 repeats. The speedup varies with the CPU and the
+Python build. Five runs of `python benchmarks/bench_lexicon.py` (default
+--repeat 200) from the backend directory, CPython 3.11.7 on a single-core
+x86-64 Xeon VM, measured:
+
+    100 words:   legacy 891-969 us,      single-pass 96-108 us,    8.3x-9.7x
+    5000 words:  legacy 43.1-48.5 ms,    single-pass 5.2-5.7 ms,   8.1x-8.9x
+
+Compare runs on the same machine.
+
+Usage:
+    python benchmarks/bench_lexicon.py [--repeat 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexicon import LEXICON_CATEGORIES, score_lexicon
+
+FILLER_WORDS = [
+    'today', 'I', 'went', 'to', 'the', 'store', 'and', 'then', 'we', 'talked', 'about', 'work',
+    'it', 'was', 'a', 'long', 'day', 'but', 'also', 'kind', 'of', 'okay', 'after', 'lunch',
+    'my', 'friend', 'said', 'that', 'she', 'would', 'call', 'later', 'in', 'evening'
+]
+LEXICON_PHRASES = [
+    'going to', 'heart ache', 'broken heart', 'clear mind', 'taken for granted', 'miss you',
+    'never give up', 'break up', 'moving on', 'love', 'calm', 'goal', 'rest', 'progress',
+    'heartbreaking', 'Motivated', 'PEACEFUL', 'night', 'forever', 'care'
+]
+
+
+def legacy_score(text):
+    """The previous implementation: lowercase and re.findall once per pattern, per detector"""
+    scores = {}
+    for name, (rules, boost) in LEXICON_CATEGORIES.items():
+        text_lower = text.lower()
+        score = 0
+        for pattern, weight in rules:
+            matches = re.findall(pattern, text_lower)
+            if matches:
+                score += len(matches) * weight
+        if boost and score > 0:
+            score *= 1.5
+        scores[name] = score
+    return scores
+
+
+def make_entry(word_count, rng):
+    words = []
+    while len(words) < word_count:
+        if rng.random() < 0.15:
+            words.extend(rng.choice(LEXICON_PHRASES).split(' '))
+        else:
+            words.append(rng.choice(FILLER_WORDS))
+        if rng.random() < 0.08:
+            words[-1] += rng.choice(['.', ',', '!', "'s"])
+    return ' '.join(words[:word_count])
+
+
+def check_parity(rng, samples=2000):
+    for _ in range(samples):
+        text = make_entry(rng.randint(1, 60), rng)
+        if rng.random() < 0.3:
+            text = text.replace(' ', rng.choice(['  ', '\n', ' ', '_']), 1)
+        expected = legacy_score(text)
+        actual = score_lexicon(text)
+        if expected != actual:
+            raise AssertionError(f'Score mismatch for {text!r}: {expected} != {actual}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1528)
+    check_parity(rng)
+    print('Parity: single-pass scores match per-pattern re.findall on 2000 random entries')
+
+    for word_count in (100, 5000):
+        text = make_entry(word_count, rng)
+        repeat = max(1, args.repeat * 100 // word_count)
+        legacy = min(timeit.repeat(lambda: legacy_score(text), number=repeat, repeat=5)) / repeat
+        single = min(timeit.repeat(lambda: score_lexicon(text), number=repeat, repeat=5)) / repeat
+        print(
+            f'{word_count:>5} words: legacy {legacy * 1e6:9.1f} us  '
+            f'single-pass {single * 1e6:9.1f} us  speedup {legacy / single:5.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Micro-benchmark: per-request logging overhead before and after the async logging setup.
+
+The legacy path replays what one POST /api/journal plus its mood analysis used
+to emit: print() calls for the headers and body, f-string INFO logs of the
+text and lexicon/model scores, and the response dumped with json.dumps(indent=2),
+all written synchronously. The current path logs the same events through
+configure_logging: lazy %-formatting, payloads sampled per request (at DEBUG
+level when --sample-rate is above 0), and output written by the listener thread. Both write to a temporary file.
+
+Usage:
+    python benchmarks/bench_logging.py [--requests 2000] [--threads 1 8] [--sample-rate 0]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import configure_logging, logging_stats, payload_logger, sample_payloads
+
+logger = logging.getLogger('bench')
+
+HEADERS = {
+    'Host': 'localhost:5000',
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+    'Accept': 'application/json',
+    'Content-Type': 'application/json',
+    'Authorization': 'Bearer ' + 'x' * 180,
+    'Origin': 'http://localhost:3000'
+}
+DATA = {
+    'title': 'Tuesday',
+    'content': 'Long day at work, but the walk home cleared my head. ' * 12
+}
+LEXICON_SCORES = {'joy': 0.41, 'sadness': 0.12, 'anger': 0.03, 'fear': 0.05, 'Calm': 0.37}
+MODEL_RESULTS = [{'label': f'label_{i}', 'score': 1 / (i + 2)} for i in range(28)]
+RESPONSE = {
+    'success': True,
+    'mood': 'Calm',
+    'confidence': 0.62,
+    'emoji': '😌',
+    'emotions': {category: {'score': 20.0, 'emoji': '🙂'} for category in ('Joy', 'Calm', 'Sad', 'Angry', 'Anxious')},
+    'text': DATA['content']
+}
+
+
+def legacy_request(user_id):
+    print('Received journal entry request')
+    print('Request headers:', dict(HEADERS))
+    print(f'Current user ID: {user_id}')
+    print('Request data:', DATA)
+    logger.info(f"Analyzing text: {DATA['content']}")
+    logger.info(f"Lexicon scores: {LEXICON_SCORES}")
+    logger.info(f"Model emotion results: {MODEL_RESULTS}")
+    logger.info(f"Analysis response: {json.dumps(RESPONSE, indent=2)}")
+    print(f'Journal entry created for {user_id}')
+
+
+def current_request(user_id):
+    sample_payloads()
+    logger.info("Journal entry request from %s", user_id)
+    payload_logger.debug("Journal entry request from %s: %s", user_id, DATA)
+    payload_logger.debug("Analyzing text: %s", DATA['content'])
+    payload_logger.debug("Lexicon scores: %s", LEXICON_SCORES)
+    payload_logger.debug("Model emotion results: %s", MODEL_RESULTS)
+    payload_logger.debug("Analysis response: %s", RESPONSE)
+    logger.debug("Journal entry %s saved", user_id)
+
+
+def run(handle_request, requests, threads):
+    """Microseconds per request, measured in the request threads"""
+    per_thread = requests // threads
+
+    def worker(index):
+        for i in range(per_thread):
+            handle_request(f'user-{index}-{i}')
+
+    pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--sample-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile('w') as out:
+        # Legacy: stdout and a synchronous handler on the same file
+        handler = logging.StreamHandler(out)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        legacy = {}
+        with contextlib.redirect_stdout(out):
+            for threads in args.threads:
+                legacy[threads] = run(legacy_request, args.requests, threads)
+        root.removeHandler(handler)
+
+        async_logging = configure_logging('DEBUG' if args.sample_rate > 0 else 'INFO', queue_size=10000, payload_sample_rate=args.sample_rate, stream=out)
+        current = {}
+        for threads in args.threads:
+            current[threads] = run(current_request, args.requests, threads)
+        # Include the time to drain the queue so nothing is left unwritten
+        async_logging.stop()
+
+        print(f"{args.requests} requests, payload sample rate {args.sample_rate}")
+        for threads in args.threads:
+            print(f"  {threads:>2} thread(s): legacy {legacy[threads]:8.1f} us/request, "
+                  f"async {current[threads]:8.1f} us/request ({legacy[threads] / current[threads]:.1f}x)")
+        print(f"  queue: {logging_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Peak RSS and time of the journal PDF export vs. number of entries.
+
+Compares the previous export (every entry materialized into one story list
+and rendered into an in-memory BytesIO) with the streamed export (entries
+consumed lazily, rendered 100 at a time into separate temporary PDFs and
+concatenated into one file). Synthetic
+entries stand in for the Mongo cursor; each run happens in a fresh process
+so peak RSS is not shared between runs.
+
+Usage:
+    python benchmarks/bench_pdf_export.py [--entries 100 1000 5000 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate
+
+from pdf_export import iter_journal_flowables, journal_pdf_styles, render_journal_pdf
+
+WORDS = (
+    'today I felt calm after a long walk by the ocean and then talked with my friend about '
+    'work goals and the trip we are planning next month which made me excited and a bit nervous'
+).split()
+MOODS = ['Happy 😊', 'Calm 😌', 'Sad 😢', 'Motivated 💪', 'Fearful 😰']
+
+
+def synthetic_entries(count, seed=1528):
+    """Yield journal documents shaped like the export query's raw documents"""
+    rng = random.Random(seed)
+    created_at = datetime(2020, 1, 1)
+    for _ in range(count):
+        created_at += timedelta(hours=rng.randint(6, 30))
+        doc = {
+            'created_at': created_at,
+            'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 250)))
+        }
+        if rng.random() < 0.8:
+            doc['mood_data'] = {
+                'primary_mood': rng.choice(MOODS),
+                'confidence': round(rng.uniform(20, 99), 2),
+                'emotions': rng.sample(MOODS, 2)
+            }
+        yield doc
+
+
+def _rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _legacy_export(count):
+    entries = list(synthetic_entries(count))
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    story = list(iter_journal_flowables(entries, journal_pdf_styles()))
+    doc.build(story)
+    return len(buffer.getvalue())
+
+
+def _streamed_export(count):
+    with tempfile.TemporaryFile(suffix='.pdf') as spool:
+        render_journal_pdf(synthetic_entries(count), spool)
+        return spool.tell()
+
+
+def _run(mode, count, queue):
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    size = _legacy_export(count) if mode == 'legacy' else _streamed_export(count)
+    queue.put({
+        'seconds': time.perf_counter() - started,
+        'rss_growth_mb': _rss_mb() - baseline,
+        'pdf_mb': size / (1024.0 * 1024.0)
+    })
+
+
+def run(mode, count):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(mode, count, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', nargs='+', type=int, default=[100, 1000, 5000, 20000])
+    args = parser.parse_args()
+
+    print(f"{'entries':>8}  {'mode':<9}{'seconds':>9}{'peak RSS growth MB':>20}{'PDF MB':>9}")
+    for count in args.entries:
+        for mode in ('legacy', 'streamed'):
+            result = run(mode, count)
+            print(
+                f"{count:>8}  {mode:<9}{result['seconds']:>9.2f}"
+                f"{result['rss_growth_mb']:>20.1f}{result['pdf_mb']:>9.1f}",
+                flush=True
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Load test: sign-up throughput and duplicate handling under concurrency.
+
+Runs against a live server (python app.py or gunicorn) with the unique user
+indexes built by init_db.py. Every run uses fresh usernames; the race phase
+then sends the same username from every thread at once and checks that
+exactly one sign-up succeeds and every other one gets "Username already exists".
+Password hashing dominates each request, so compare runs at the same
+PASSWORD_HASH_* settings.
+
+Usage:
+    python benchmarks/bench_registration.py [--url http://localhost:5000] [--users 500]
+                                            [--concurrency 1 8 32] [--race 32]
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def register(url, username, email):
+    """(status, response body, seconds) of one POST /api/auth/register"""
+    body = json.dumps({'username': username, 'email': email, 'password': 'load-test-password'}).encode('utf-8')
+    request = urllib.request.Request(
+        f'{url}/api/auth/register', data=body, headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    return status, json.loads(payload or b'{}'), time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_signups(url, users, concurrency, prefix):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(
+            lambda i: register(url, f'{prefix}-{i}', f'{prefix}-{i}@example.com'),
+            range(users)
+        ))
+        elapsed = time.perf_counter() - started
+    latencies = [seconds for _, _, seconds in results]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"  concurrency {concurrency:>3}: {users / elapsed:8.1f} sign-ups/s, "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms, p99 {percentile(latencies, 0.99) * 1000:7.1f} ms, "
+          f"statuses {dict(sorted(statuses.items()))}")
+
+
+def run_race(url, threads, prefix):
+    username = f'{prefix}-race'
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(
+            lambda i: register(url, username, f'{prefix}-race-{i}@example.com'),
+            range(threads)
+        ))
+    created = sum(1 for status, _, _ in results if status == 201)
+    duplicates = sum(1 for status, body, _ in results if status == 400 and body.get('error') == 'Username already exists')
+    other = len(results) - created - duplicates
+    verdict = 'ok' if created == 1 and other == 0 else 'FAILED'
+    print(f"  race with {threads} threads: {created} created, {duplicates} 'Username already exists', "
+          f"{other} other responses: {verdict}")
+    return verdict == 'ok'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--users', type=int, default=500, help='sign-ups per concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--race', type=int, default=32, help='threads registering the same username (0 to skip)')
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    print(f"Sign-ups against {args.url} (run {run_id})")
+    for concurrency in args.concurrency:
+        run_signups(args.url, args.users, concurrency, f'load-{run_id}-c{concurrency}')
+    if args.race and not run_race(args.url, args.race, f'load-{run_id}'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
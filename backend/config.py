@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -16,10 +17,160 @@ class Config:
     # MongoDB connection settings
     MONGODB_SETTINGS = {
         'host': f'mongodb://{MONGODB_USERNAME}:{MONGODB_PASSWORD}@{MONGODB_HOST}:{MONGODB_PORT}/{MONGODB_DB}' if MONGODB_USERNAME and MONGODB_PASSWORD else f'mongodb://{MONGODB_HOST}:{MONGODB_PORT}/{MONGODB_DB}',
-        'db': MONGODB_DB
+        'db': MONGODB_DB,
+        # Connect on first use, so a client created before gunicorn forks is
+        # never shared with the workers
+        'connect': False
     }
     
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
-    DEBUG = True
\ No newline at end of file
+
+    # Password hashing: 'pbkdf2' (werkzeug format) or 'bcrypt'. Hashes run on a
+    # pool of PASSWORD_HASH_WORKERS threads with at most PASSWORD_HASH_QUEUE_SIZE
+    # waiting; login and registration answer 503 beyond that. Stored hashes made
+    # with other settings are upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2')
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000))
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    DEBUG = True
+
+    # Emotion model; loaded in the background, /api/analyze-mood waits up to
+    # MODEL_WARMUP_TIMEOUT seconds for it before answering 503 "warming up"
+    EMOTION_MODEL_NAME = os.environ.get('EMOTION_MODEL_NAME', 'SamLowe/roberta-base-go_emotions')
+    MODEL_WARMUP_TIMEOUT = float(os.environ.get('MODEL_WARMUP_TIMEOUT', 5))
+    MODEL_RETRY_AFTER = int(os.environ.get('MODEL_RETRY_AFTER', 10))
+
+    # Inference backend: 'pytorch' (FP32), 'pytorch-int8' (dynamic quantization)
+    # or 'onnx' (ONNX Runtime, exported once into ONNX_MODEL_DIR)
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'pytorch')
+    ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx_model'))
+
+    # Entries longer than one model window: 'windows' scores sentence-aligned
+    # windows (at most LONG_TEXT_MAX_WINDOWS) and pools them with max, mean or
+    # length (token-weighted mean); 'truncate' only scores the first window.
+    # LONG_TEXT_WINDOW_TOKENS=0 uses the model's maximum.
+    LONG_TEXT_MODE = os.environ.get('LONG_TEXT_MODE', 'windows')
+    LONG_TEXT_WINDOW_TOKENS = int(os.environ.get('LONG_TEXT_WINDOW_TOKENS', 0))
+    LONG_TEXT_MAX_WINDOWS = int(os.environ.get('LONG_TEXT_MAX_WINDOWS', 8))
+    LONG_TEXT_POOLING = os.environ.get('LONG_TEXT_POOLING', 'length')
+
+    # Sentence embeddings for GET /api/journal/<id>/similar. They come out of
+    # the analysis forward pass (pytorch backends only), are stored on each
+    # entry as float16 and searched in a per-user in-memory index holding at
+    # most EMBEDDING_INDEX_MAX_VECTORS vectors per process; a user's vectors
+    # are reloaded after EMBEDDING_INDEX_TTL seconds
+    EMBEDDINGS_ENABLED = os.environ.get('EMBEDDINGS_ENABLED', 'false').lower() == 'true'
+    EMBEDDING_INDEX_MAX_VECTORS = int(os.environ.get('EMBEDDING_INDEX_MAX_VECTORS', 20000))
+    EMBEDDING_INDEX_TTL = int(os.environ.get('EMBEDDING_INDEX_TTL', 300))
+    # Entries saved without a cached embedding are embedded in the background;
+    # beyond this many waiting, they are left for rescore_entries.py --embeddings-only
+    EMBEDDING_QUEUE_SIZE = int(os.environ.get('EMBEDDING_QUEUE_SIZE', 100))
+    SIMILAR_ENTRIES_DEFAULT = int(os.environ.get('SIMILAR_ENTRIES_DEFAULT', 5))
+
+    # Emotion model micro-batching
+    INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 16))
+    INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 10))
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+
+    # INFERENCE_MODE=pool runs the model in INFERENCE_PROCESSES worker processes
+    # (one model each, INFERENCE_THREADS torch threads each, 0: cores / processes)
+    # instead of in the web process. They belong to one inference service per
+    # host, which keeps at most INFERENCE_QUEUE_SIZE requests in flight for all
+    # web processes together (503 beyond that). The web processes reach it at
+    # INFERENCE_SERVICE_ADDRESS (a Unix socket path or host:port); it is started
+    # by the gunicorn master, or the dev server, unless INFERENCE_SERVICE_START
+    # is false, in which case run `python inference_service.py` yourself.
+    # Connections are authenticated with INFERENCE_SERVICE_AUTHKEY, which must
+    # be set for a TCP address (a Unix socket falls back to SECRET_KEY); state
+    # and status calls give up after INFERENCE_SERVICE_STATUS_TIMEOUT seconds
+    INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'inline')
+    INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 2))
+    INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 0))
+    INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 64))
+    INFERENCE_SERVICE_ADDRESS = os.environ.get('INFERENCE_SERVICE_ADDRESS', os.path.join(tempfile.gettempdir(), 'moodtunes-inference.sock'))
+    INFERENCE_SERVICE_AUTHKEY = os.environ.get('INFERENCE_SERVICE_AUTHKEY')
+    INFERENCE_SERVICE_STATUS_TIMEOUT = float(os.environ.get('INFERENCE_SERVICE_STATUS_TIMEOUT', 2))
+    INFERENCE_SERVICE_START = os.environ.get('INFERENCE_SERVICE_START', 'true').lower() == 'true'
+
+    # Admission control for mood analysis: token buckets per user (valid access
+    # token) and per client IP (anonymous), RATE tokens per second up to BURST,
+    # and at most ADMISSION_MAX_IN_FLIGHT analyses at once per web process, of
+    # which ADMISSION_RESERVED_FOR_USERS only serve authenticated requests
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_USER_RATE = float(os.environ.get('ADMISSION_USER_RATE', 1.0))
+    ADMISSION_USER_BURST = int(os.environ.get('ADMISSION_USER_BURST', 20))
+    ADMISSION_IP_RATE = float(os.environ.get('ADMISSION_IP_RATE', 0.2))
+    ADMISSION_IP_BURST = int(os.environ.get('ADMISSION_IP_BURST', 5))
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 32))
+    ADMISSION_RESERVED_FOR_USERS = int(os.environ.get('ADMISSION_RESERVED_FOR_USERS', 8))
+    # Number of reverse proxies setting X-Forwarded-For in front of the app
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # Mood analysis result cache; set MOOD_CACHE_BACKEND=mongo to share hits across workers
+    MOOD_CACHE_ENABLED = os.environ.get('MOOD_CACHE_ENABLED', 'true').lower() == 'true'
+    MOOD_CACHE_SIZE = int(os.environ.get('MOOD_CACHE_SIZE', 1024))
+    MOOD_CACHE_TTL = int(os.environ.get('MOOD_CACHE_TTL', 3600))
+    MOOD_CACHE_BACKEND = os.environ.get('MOOD_CACHE_BACKEND', '')
+
+    # Write concern for journal inserts; w may be a number or 'majority'
+    JOURNAL_WRITE_CONCERN_W = os.environ.get('JOURNAL_WRITE_CONCERN_W', '1')
+    JOURNAL_WRITE_CONCERN = {
+        'w': int(JOURNAL_WRITE_CONCERN_W) if JOURNAL_WRITE_CONCERN_W.isdigit() else JOURNAL_WRITE_CONCERN_W,
+        'j': os.environ.get('JOURNAL_WRITE_CONCERN_J', 'true').lower() == 'true'
+    }
+
+    # GET /api/journal pagination
+    JOURNAL_DEFAULT_PAGE_SIZE = int(os.environ.get('JOURNAL_DEFAULT_PAGE_SIZE', 20))
+    JOURNAL_MAX_PAGE_SIZE = int(os.environ.get('JOURNAL_MAX_PAGE_SIZE', 100))
+    JOURNAL_STREAM_BATCH_SIZE = int(os.environ.get('JOURNAL_STREAM_BATCH_SIZE', 200))
+
+    # GET /api/journal/search: server-side time limit per search and snippet length
+    SEARCH_MAX_TIME_MS = int(os.environ.get('SEARCH_MAX_TIME_MS', 2000))
+    SEARCH_SNIPPET_CHARS = int(os.environ.get('SEARCH_SNIPPET_CHARS', 160))
+
+    # async_app.py: connections in the Motor pool each ASGI process shares
+    ASYNC_MONGO_MAX_POOL_SIZE = int(os.environ.get('ASYNC_MONGO_MAX_POOL_SIZE', 100))
+
+    # Build declared MongoDB indexes in the background after the first request;
+    # off by default, run init_db.py before deploying instead
+    AUTO_ENSURE_INDEXES = os.environ.get('AUTO_ENSURE_INDEXES', 'false').lower() == 'true'
+
+    # POST /api/journal/import
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+    IMPORT_MAX_RECORDS = int(os.environ.get('IMPORT_MAX_RECORDS', 50000))
+
+    # GET /metrics; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # PDF export: entries fetched per Mongo batch, the background worker pool
+    # (plus up to EXPORT_QUEUE_SIZE waiting jobs), and the artifact store finished PDFs are cached in (evicted past the size cap)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 200))
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_QUEUE_SIZE = int(os.environ.get('EXPORT_QUEUE_SIZE', 20))
+    EXPORT_RETRY_AFTER = int(os.environ.get('EXPORT_RETRY_AFTER', 30))
+    EXPORT_JOB_TIMEOUT = int(os.environ.get('EXPORT_JOB_TIMEOUT', 600))
+    EXPORT_ARTIFACT_DIR = os.environ.get('EXPORT_ARTIFACT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_artifacts'))
+    EXPORT_ARTIFACT_MAX_BYTES = int(os.environ.get('EXPORT_ARTIFACT_MAX_BYTES', 500 * 1024 * 1024))
+
+    # Logging goes through a background thread; LOG_FORMAT is 'text' or 'json'.
+    # Full request/response payloads are logged at DEBUG for a sample of
+    # requests, and only when LOG_LEVEL is DEBUG; off by default.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0))
+
+    # Production server (gunicorn.conf.py). The model is loaded once in the
+    # master and shared copy-on-write by the workers; each worker runs
+    # TORCH_THREADS intra-op threads (0: cores / WEB_WORKERS).
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 2))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 120))
+    PRELOAD_MODEL = os.environ.get('PRELOAD_MODEL', 'true').lower() == 'true'
+    TORCH_THREADS = int(os.environ.get('TORCH_THREADS', 0))
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models import JournalEntry
+
+logger = logging.getLogger(__name__)
+
+# Embeddings are L2-normalized and stored as float16: 2 bytes per dimension
+EMBEDDING_DTYPE = np.float16
+
+
+def encode_embedding(vector):
+    """Stored form of an embedding: normalized float16 bytes"""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector = vector / norm
+    return vector.astype(EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data):
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+class _UserVectors:
+    __slots__ = ('ids', 'matrix', 'loaded_at')
+
+    def __init__(self, ids, matrix):
+        self.ids = ids
+        self.matrix = matrix
+        self.loaded_at = time.monotonic()
+
+
+class EmbeddingIndex:
+    """Per-user in-memory nearest-neighbour index over journal entry embeddings.
+
+    A user's vectors are loaded from MongoDB on their first query and kept as
+    one float32 matrix (twice the stored size, but BLAS-speed queries), so a
+    query is a single matrix-vector product (cosine similarity, since vectors
+    are normalized) and a partial sort. Only vectors of the given embedding
+    version are loaded. Users are evicted least recently used beyond
+    max_vectors vectors in total, and reloaded after ttl seconds so entries
+    saved by other processes show up.
+    """
+
+    def __init__(self, version, max_vectors=20000, ttl=300):
+        self.version = version
+        self.max_vectors = max_vectors
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._vectors = 0
+        self._lock = threading.Lock()
+        self._stats = {'queries': 0, 'loads': 0, 'evictions': 0}
+
+    def _load(self, user_id):
+        docs = (
+            JournalEntry.objects(user_id=user_id, embedding_version=self.version)
+            .only('id', 'embedding')
+            .as_pymongo()
+        )
+        ids, rows = [], []
+        for doc in docs:
+            if doc.get('embedding'):
+                ids.append(doc['_id'])
+                rows.append(decode_embedding(doc['embedding']))
+        matrix = np.vstack(rows).astype(np.float32) if rows else np.empty((0, 0), dtype=np.float32)
+        return _UserVectors(ids, matrix)
+
+    def _store(self, user_id, vectors):
+        # Called with the lock held
+        previous = self._users.pop(user_id, None)
+        if previous is not None:
+            self._vectors -= len(previous.ids)
+        self._users[user_id] = vectors
+        self._vectors += len(vectors.ids)
+        while self._vectors > self.max_vectors and len(self._users) > 1:
+            _, evicted = self._users.popitem(last=False)
+            self._vectors -= len(evicted.ids)
+            self._stats['evictions'] += 1
+
+    def _user_vectors(self, user_id):
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is not None and time.monotonic() - vectors.loaded_at < self.ttl:
+                self._users.move_to_end(user_id)
+                return vectors
+        vectors = self._load(user_id)
+        with self._lock:
+            self._stats['loads'] += 1
+            self._store(user_id, vectors)
+        return vectors
+
+    def nearest(self, user_id, vector, k=5, exclude=None):
+        """[(entry_id, similarity)] of the user's k entries most similar to vector, best first"""
+        user_id = str(user_id)
+        vectors = self._user_vectors(user_id)
+        with self._lock:
+            self._stats['queries'] += 1
+        if not vectors.ids:
+            return []
+        similarities = vectors.matrix @ np.asarray(vector, dtype=np.float32)
+        if exclude is not None and exclude in vectors.ids:
+            similarities[vectors.ids.index(exclude)] = -np.inf
+        k = min(k, len(vectors.ids) - (exclude in vectors.ids))
+        if k <= 0:
+            return []
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        return [(vectors.ids[i], float(similarities[i])) for i in best]
+
+    def add(self, user_id, entry_id, data):
+        """Add a newly saved entry's stored embedding to the user's vectors, if they are loaded"""
+        user_id = str(user_id)
+        vector = decode_embedding(data).astype(np.float32)
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is None:
+                return
+            if vectors.ids and vectors.matrix.shape[1] != len(vector):
+                return
+            updated = _UserVectors(
+                vectors.ids + [entry_id],
+                np.vstack([vectors.matrix, vector]) if vectors.ids else vector.reshape(1, -1)
+            )
+            updated.loaded_at = vectors.loaded_at
+            self._store(user_id, updated)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'users': len(self._users),
+                'vectors': self._vectors,
+                'max_vectors': self.max_vectors,
+                'ttl_seconds': self.ttl,
+                **self._stats
+            }
+
+
+class EmbeddingQueue:
+    """Computes the embeddings of saved entries on a background thread.
+
+    embed(*args) does the forward pass and the write. At most max_pending
+    entries wait; submit() refuses the rest, which keep no embedding until
+    rescore_entries.py --embeddings-only fills them in.
+    """
+
+    def __init__(self, embed, max_pending=100):
+        self.embed = embed
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embedding-worker')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'dropped': 0}
+
+    def submit(self, *args):
+        """Queue embed(*args); False if the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['dropped'] += 1
+                return False
+            self._pending += 1
+            self._stats['queued'] += 1
+        self._executor.submit(self._run, args)
+        return True
+
+    def _run(self, args):
+        try:
+            self.embed(*args)
+        except Exception:
+            logger.exception("Background embedding failed")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self._pending, 'max_pending': self.max_pending, **self._stats}
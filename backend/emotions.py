@@ -0,0 +1,559 @@
+import logging
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+from lexicon import score_lexicon
+from logging_setup import payload_logger
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Updated Emotion categories mapping with emojis
+EMOTION_CATEGORIES = {
+    'Happy 😊': ['joy', 'happiness', 'delight', 'pleasure', 'cheerfulness'],
+    'Sad 😢': ['sadness', 'grief', 'sorrow', 'disappointment', 'loneliness'],
+    'Angry 😠': ['anger', 'annoyance', 'irritation', 'frustration', 'rage'],
+    'Fearful 😰': ['fear', 'anxiety', 'worry', 'nervousness', 'stress'],
+    'Surprised 😲': ['surprise', 'amazement', 'awe', 'wonder', 'shock'],
+    'Disgusted 🤢': ['disgust', 'revulsion', 'aversion', 'contempt'],
+    'Calm 😌': ['calm', 'relaxed', 'peaceful', 'serene', 'tranquil'],
+    'Excited ⚡': ['excitement', 'enthusiasm', 'eager', 'thrill', 'anticipation'],
+    'Loving 💝': ['love', 'affection', 'caring', 'tenderness', 'fondness', 'adoration'],
+    'Heartbroken 💔': ['heartbreak', 'heartbroken', 'broken heart', 'heart ache', 'emotional pain'],
+    'Motivated 💪': [
+        'determination', 'motivation', 'drive', 'ambition', 'passion', 'inspiration',
+        'purpose', 'focus', 'dedication', 'commitment', 'perseverance', 'resilience',
+        'achievement', 'success', 'progress', 'growth', 'improvement', 'development',
+        'goals', 'aspirations', 'dreams', 'vision', 'mission', 'purpose',
+        'empowerment', 'strength', 'courage', 'confidence', 'belief', 'hope',
+        'optimism', 'positivity', 'enthusiasm', 'energy', 'vitality', 'vigor',
+        'determined', 'motivated', 'driven', 'ambitious', 'passionate', 'inspired',
+        'focused', 'dedicated', 'committed', 'persevering', 'resilient',
+        'achieving', 'succeeding', 'progressing', 'growing', 'improving', 'developing',
+        'empowered', 'strong', 'courageous', 'confident', 'hopeful',
+        'optimistic', 'positive', 'energetic', 'vital', 'vigorous'
+    ],
+    'Neutral 😐': ['neutral', 'indifferent', 'unemotional'],
+    'Nostalgic 🎭': [
+        'nostalgia', 'reminiscence', 'memories', 'recollection', 'remembrance',
+        'sentimental', 'yearning', 'longing', 'homesick', 'melancholy',
+        'wistful', 'reflective', 'contemplative', 'reminiscent', 'retrospective',
+        'old times', 'good old days', 'childhood memories', 'past times',
+        'throwback', 'blast from the past', 'memory lane', 'flashback',
+        'vintage', 'classic', 'traditional', 'old school', 'retro'
+    ]
+}
+
+# Emotion emoji mapping for individual emotions
+EMOTION_EMOJIS = {
+    'joy': '😊',
+    'happiness': '😄',
+    'delight': '🥰',
+    'pleasure': '😋',
+    'cheerfulness': '😃',
+    'sadness': '😢',
+    'grief': '😭',
+    'sorrow': '💔',
+    'disappointment': '😔',
+    'loneliness': '😞',
+    'anger': '😠',
+    'annoyance': '😤',
+    'irritation': '😒',
+    'frustration': '😫',
+    'rage': '😡',
+    'fear': '😰',
+    'anxiety': '😨',
+    'worry': '😟',
+    'nervousness': '😬',
+    'stress': '😓',
+    'surprise': '😲',
+    'amazement': '😮',
+    'awe': '🤩',
+    'wonder': '✨',
+    'shock': '😱',
+    'disgust': '🤢',
+    'revulsion': '🤮',
+    'aversion': '😖',
+    'contempt': '😏',
+    'calm': '😌',
+    'relaxed': '😌',
+    'peaceful': '🕊️',
+    'serene': '🌊',
+    'tranquil': '🌿',
+    'excitement': '⚡',
+    'enthusiasm': '🎉',
+    'eager': '✨',
+    'thrill': '🎢',
+    'anticipation': '🎯',
+    'love': '💝',
+    'affection': '💖',
+    'caring': '💗',
+    'tenderness': '💓',
+    'fondness': '💕',
+    'adoration': '💘',
+    'determination': '💪',
+    'motivation': '🔥',
+    'drive': '🚀',
+    'ambition': '⭐',
+    'passion': '❤️',
+    'inspiration': '💫',
+    'purpose': '🎯',
+    'focus': '🎯',
+    'dedication': '🎯',
+    'commitment': '🎯',
+    'perseverance': '💪',
+    'resilience': '💪',
+    'achievement': '🏆',
+    'success': '🏆',
+    'progress': '📈',
+    'growth': '🌱',
+    'improvement': '📈',
+    'development': '🌱',
+    'goals': '🎯',
+    'aspirations': '✨',
+    'dreams': '✨',
+    'vision': '👁️',
+    'mission': '🎯',
+    'empowerment': '💪',
+    'strength': '🦁',
+    'courage': '🦁',
+    'confidence': '💪',
+    'belief': '🙏',
+    'hope': '✨',
+    'optimism': '😊',
+    'positivity': '😊',
+    'energy': '⚡',
+    'vitality': '💫',
+    'vigor': '💪',
+    'neutral': '😐',
+    'indifferent': '😶',
+    'unemotional': '😑',
+    'heartbreak': '💔',
+    'heartbroken': '💔',
+    'broken heart': '💔',
+    'heart ache': '💔',
+    'emotional pain': '💔',
+    'nostalgia': '🎭',
+    'reminiscence': '🎭',
+    'memories': '🎭',
+    'recollection': '🎭',
+    'remembrance': '🎭',
+    'sentimental': '🎭',
+    'yearning': '🎭',
+    'longing': '🎭',
+    'homesick': '🎭',
+    'melancholy': '🎭',
+    'wistful': '🎭',
+    'reflective': '🎭',
+    'contemplative': '🎭',
+    'reminiscent': '🎭',
+    'retrospective': '🎭',
+    'old times': '🎭',
+    'good old days': '🎭',
+    'childhood memories': '🎭',
+    'past times': '🎭',
+    'throwback': '🎭',
+    'blast from the past': '🎭',
+    'memory lane': '🎭',
+    'flashback': '🎭',
+    'vintage': '🎭',
+    'classic': '🎭',
+    'traditional': '🎭',
+    'old school': '🎭',
+    'retro': '🎭'
+}
+
+# Model label -> category
+EMOTION_MAPPING = {
+    'joy': 'Happy 😊',
+    'happiness': 'Happy 😊',
+    'delight': 'Happy 😊',
+    'pleasure': 'Happy 😊',
+    'cheerfulness': 'Happy 😊',
+    'sadness': 'Sad 😢',
+    'grief': 'Sad 😢',
+    'sorrow': 'Sad 😢',
+    'disappointment': 'Sad 😢',
+    'loneliness': 'Sad 😢',
+    'heartbreak': 'Heartbroken 💔',
+    'heartbroken': 'Heartbroken 💔',
+    'broken heart': 'Heartbroken 💔',
+    'heart ache': 'Heartbroken 💔',
+    'emotional pain': 'Heartbroken 💔',
+    'anger': 'Angry 😠',
+    'annoyance': 'Angry 😠',
+    'irritation': 'Angry 😠',
+    'frustration': 'Angry 😠',
+    'rage': 'Angry 😠',
+    'fear': 'Fearful 😰',
+    'anxiety': 'Fearful 😰',
+    'worry': 'Fearful 😰',
+    'nervousness': 'Fearful 😰',
+    'stress': 'Fearful 😰',
+    'surprise': 'Surprised 😲',
+    'amazement': 'Surprised 😲',
+    'awe': 'Surprised 😲',
+    'wonder': 'Surprised 😲',
+    'shock': 'Surprised 😲',
+    'disgust': 'Disgusted 🤢',
+    'revulsion': 'Disgusted 🤢',
+    'aversion': 'Disgusted 🤢',
+    'contempt': 'Disgusted 🤢',
+    'calm': 'Calm 😌',
+    'relaxed': 'Calm 😌',
+    'peaceful': 'Calm 😌',
+    'serene': 'Calm 😌',
+    'tranquil': 'Calm 😌',
+    'excitement': 'Excited ⚡',
+    'enthusiasm': 'Excited ⚡',
+    'eager': 'Excited ⚡',
+    'thrill': 'Excited ⚡',
+    'anticipation': 'Excited ⚡',
+    'love': 'Loving 💝',
+    'affection': 'Loving 💝',
+    'caring': 'Loving 💝',
+    'tenderness': 'Loving 💝',
+    'fondness': 'Loving 💝',
+    'adoration': 'Loving 💝',
+    'determination': 'Motivated 💪',
+    'motivation': 'Motivated 💪',
+    'drive': 'Motivated 💪',
+    'ambition': 'Motivated 💪',
+    'passion': 'Motivated 💪',
+    'inspiration': 'Motivated 💪',
+    'purpose': 'Motivated 💪',
+    'focus': 'Motivated 💪',
+    'dedication': 'Motivated 💪',
+    'commitment': 'Motivated 💪',
+    'perseverance': 'Motivated 💪',
+    'resilience': 'Motivated 💪',
+    'achievement': 'Motivated 💪',
+    'success': 'Motivated 💪',
+    'progress': 'Motivated 💪',
+    'growth': 'Motivated 💪',
+    'improvement': 'Motivated 💪',
+    'development': 'Motivated 💪',
+    'goals': 'Motivated 💪',
+    'aspirations': 'Motivated 💪',
+    'dreams': 'Motivated 💪',
+    'vision': 'Motivated 💪',
+    'mission': 'Motivated 💪',
+    'empowerment': 'Motivated 💪',
+    'strength': 'Motivated 💪',
+    'courage': 'Motivated 💪',
+    'confidence': 'Motivated 💪',
+    'belief': 'Motivated 💪',
+    'hope': 'Motivated 💪',
+    'optimism': 'Motivated 💪',
+    'positivity': 'Motivated 💪',
+    'energy': 'Motivated 💪',
+    'vitality': 'Motivated 💪',
+    'vigor': 'Motivated 💪',
+    'neutral': 'Neutral 😐',
+    'indifferent': 'Neutral 😐',
+    'unemotional': 'Neutral 😐',
+    'nostalgia': 'Nostalgic 🎭',
+    'reminiscence': 'Nostalgic 🎭',
+    'memories': 'Nostalgic 🎭',
+    'recollection': 'Nostalgic 🎭',
+    'remembrance': 'Nostalgic 🎭',
+    'sentimental': 'Nostalgic 🎭',
+    'yearning': 'Nostalgic 🎭',
+    'longing': 'Nostalgic 🎭',
+    'homesick': 'Nostalgic 🎭',
+    'melancholy': 'Nostalgic 🎭',
+    'wistful': 'Nostalgic 🎭',
+    'reflective': 'Nostalgic 🎭',
+    'contemplative': 'Nostalgic 🎭',
+    'reminiscent': 'Nostalgic 🎭',
+    'retrospective': 'Nostalgic 🎭'
+}
+
+def map_emotion_to_category(emotion):
+    """Map the model's output emotions to our desired categories"""
+    return EMOTION_MAPPING.get(emotion, 'Neutral 😐')
+
+def group_emotions(emotions_with_scores):
+    """Group emotions into categories and calculate category scores"""
+    category_scores = {category: 0.0 for category in EMOTION_CATEGORIES.keys()}
+    category_emotions = {category: [] for category in EMOTION_CATEGORIES.keys()}
+    
+    # First pass: collect all emotions and their scores
+    for emotion in emotions_with_scores:
+        label = emotion['label']
+        score = emotion['score']
+        
+        # Map the emotion to our category
+        category = map_emotion_to_category(label)
+        
+        # Boost motivation-related emotions
+        if category == 'Motivated 💪':
+            score *= 1.5  # Increase the weight of motivation-related emotions
+        
+        # Add to category scores and emotions
+        category_scores[category] += score
+        category_emotions[category].append({
+            'emotion': label,
+            'emoji': EMOTION_EMOJIS.get(label, ''),
+            'score': round(score * 100, 2)
+        })
+    
+    # Second pass: normalize scores and filter low confidence emotions
+    min_confidence = 0.1  # Minimum confidence threshold
+    filtered_categories = {}
+    
+    for category, score in category_scores.items():
+        if score > min_confidence:
+            # Normalize the score
+            normalized_score = score / len(category_emotions[category]) if category_emotions[category] else score
+            filtered_categories[category] = normalized_score
+    
+    # Sort categories by score
+    sorted_categories = sorted(
+        [(category, score) for category, score in filtered_categories.items()],
+        key=lambda x: x[1],
+        reverse=True
+    )
+    
+    # Format the response
+    grouped_emotions = {
+        'primary_category': sorted_categories[0][0] if sorted_categories else 'Neutral 😐',
+        'categories': [
+            {
+                'name': category,
+                'score': round(score * 100, 2),
+                'emotions': sorted(category_emotions[category], key=lambda x: x['score'], reverse=True)
+            }
+            for category, score in sorted_categories
+        ]
+    }
+    
+    return grouped_emotions
+
+class EmotionGrouper:
+    """group_emotions for many texts at once, for one fixed order of model labels.
+
+    Each label is assigned to its category once, in a (labels x categories)
+    matrix holding the label's weight (1.5 for Motivated, 1.0 otherwise).
+    Category sums, means, the confidence threshold and the ranking are then
+    computed for an (N x labels) score array in a few array operations.
+    """
+
+    MIN_CONFIDENCE = 0.1
+
+    def __init__(self, labels):
+        self.labels = tuple(labels)
+        self.categories = list(EMOTION_CATEGORIES.keys())
+        category_index = {category: c for c, category in enumerate(self.categories)}
+
+        self.matrix = np.zeros((len(self.labels), len(self.categories)))
+        for j, label in enumerate(self.labels):
+            category = map_emotion_to_category(label)
+            self.matrix[j, category_index[category]] = 1.5 if category == 'Motivated 💪' else 1.0
+
+        self.label_weights = self.matrix.sum(axis=1)
+        self.counts = np.count_nonzero(self.matrix, axis=0)
+        self.category_labels = [np.flatnonzero(self.matrix[:, c]) for c in range(len(self.categories))]
+        self.emojis = [EMOTION_EMOJIS.get(label, '') for label in self.labels]
+
+    def category_scores(self, scores):
+        """Summed and mean (normalized) category scores for an (N x labels) array"""
+        sums = np.zeros((scores.shape[0], len(self.categories)))
+        # Accumulate label by label, in label order, so every sum is bit-for-bit
+        # the one group_emotions computes (a matmul may reorder the additions)
+        for j in range(len(self.labels)):
+            sums += scores[:, j, None] * self.matrix[j]
+        means = np.where(self.counts > 0, sums / np.maximum(self.counts, 1), sums)
+        return sums, means
+
+    def group(self, scores):
+        """group_emotions output for each row of an (N x labels) score array"""
+        scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+        sums, means = self.category_scores(scores)
+        keep = sums > self.MIN_CONFIDENCE
+        # Highest mean first; a stable sort keeps ties in category order, as sorted() does
+        ranking = np.argsort(-np.where(keep, means, -np.inf), axis=1, kind='stable')
+        kept_counts = keep.sum(axis=1)
+        category_percent = percent_scores(means).tolist()
+        label_percent = percent_scores(scores * self.label_weights)
+        # Within a category, emotions are ordered by their rounded score, ties in label order
+        label_orders = [
+            labels[np.argsort(-label_percent[:, labels], axis=1, kind='stable')].tolist()
+            for labels in self.category_labels
+        ]
+        label_percent = label_percent.tolist()
+
+        grouped = []
+        for i in range(scores.shape[0]):
+            percent = label_percent[i]
+            categories = [
+                {
+                    'name': self.categories[c],
+                    'score': category_percent[i][c],
+                    'emotions': [
+                        {'emotion': self.labels[j], 'emoji': self.emojis[j], 'score': percent[j]}
+                        for j in label_orders[c][i]
+                    ]
+                }
+                for c in ranking[i, :kept_counts[i]].tolist()
+            ]
+            grouped.append({
+                'primary_category': categories[0]['name'] if categories else 'Neutral 😐',
+                'categories': categories
+            })
+        return grouped
+
+def percent_scores(scores):
+    """round(score * 100, 2) for every element of an array, bit-for-bit.
+
+    rint(x * 100) / 100 is the correctly rounded result unless x * 100 lies
+    within floating-point error of a .5 boundary; those few fall back to round().
+    """
+    percent = scores * 100
+    scaled = percent * 100
+    rounded = np.rint(scaled) / 100
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ambiguous.any():
+        rounded[ambiguous] = [round(value, 2) for value in percent[ambiguous].tolist()]
+    return rounded
+
+@lru_cache(maxsize=8)
+def emotion_grouper(labels):
+    return EmotionGrouper(labels)
+
+def group_emotions_batch(results_list):
+    """Vectorized group_emotions over several texts' model results; identical output per text"""
+    if len(results_list) == 1:
+        # Array setup costs more than it saves for a single text
+        return [group_emotions(results_list[0])]
+    grouped = [None] * len(results_list)
+    # The pipeline returns every label in the same order, so this is normally one group
+    by_labels = defaultdict(list)
+    for i, results in enumerate(results_list):
+        by_labels[tuple(emotion['label'] for emotion in results)].append(i)
+
+    for labels, indices in by_labels.items():
+        scores = np.array(
+            [[emotion['score'] for emotion in results_list[i]] for i in indices],
+            dtype=np.float64
+        )
+        for i, result in zip(indices, emotion_grouper(labels).group(scores)):
+            grouped[i] = result
+    return grouped
+
+def build_mood_response(text, results, grouped_emotions=None):
+    """Combine the lexicon detectors with the model's per-label scores into the mood response.
+
+    grouped_emotions may be passed in when it was already computed for a batch.
+    """
+    # Score motivation, love, heartbreak and calm in a single pass over the text
+    with span('lexicon'):
+        lexicon_scores = score_lexicon(text)
+    motivation_score = lexicon_scores['motivation']
+    love_score = lexicon_scores['love']
+    heartbreak_score = lexicon_scores['heartbreak']
+    calm_score = lexicon_scores['calm']
+    payload_logger.debug("Lexicon scores: %s", lexicon_scores)
+
+    payload_logger.debug("Model emotion results: %s", results)
+
+    # Group emotions into categories
+    if grouped_emotions is None:
+        with span('grouping'):
+            grouped_emotions = group_emotions(results)
+
+    # If calm score is high enough, override the primary emotion
+    if calm_score > 0.2:  # Threshold for calm detection
+        grouped_emotions['primary_category'] = 'Calm 😌'
+        # Add calm to the categories if not present
+        if not any(cat['name'] == 'Calm 😌' for cat in grouped_emotions['categories']):
+            grouped_emotions['categories'].append({
+                'name': 'Calm 😌',
+                'score': round(calm_score * 100, 2),
+                'emotions': [{
+                    'emotion': 'calm',
+                    'emoji': '😌',
+                    'score': round(calm_score * 100, 2)
+                }]
+            })
+
+    # If motivation score is high enough, override the primary emotion
+    if motivation_score > 0.2:
+        grouped_emotions['primary_category'] = 'Motivated 💪'
+        # Add motivation to the categories if not present
+        if not any(cat['name'] == 'Motivated 💪' for cat in grouped_emotions['categories']):
+            grouped_emotions['categories'].append({
+                'name': 'Motivated 💪',
+                'score': round(motivation_score * 100, 2),
+                'emotions': [{
+                    'emotion': 'motivation',
+                    'emoji': '💪',
+                    'score': round(motivation_score * 100, 2)
+                }]
+            })
+
+    # If heartbreak score is high enough, override the primary emotion
+    if heartbreak_score > 0.2:
+        grouped_emotions['primary_category'] = 'Heartbroken 💔'
+        # Add heartbreak to the categories if not present
+        if not any(cat['name'] == 'Heartbroken 💔' for cat in grouped_emotions['categories']):
+            grouped_emotions['categories'].append({
+                'name': 'Heartbroken 💔',
+                'score': round(heartbreak_score * 100, 2),
+                'emotions': [{
+                    'emotion': 'heartbreak',
+                    'emoji': '💔',
+                    'score': round(heartbreak_score * 100, 2)
+                }]
+            })
+
+    # If love score is high enough, override the primary emotion
+    if love_score > 0.3:
+        grouped_emotions['primary_category'] = 'Loving 💝'
+        # Add love to the categories if not present
+        if not any(cat['name'] == 'Loving 💝' for cat in grouped_emotions['categories']):
+            grouped_emotions['categories'].append({
+                'name': 'Loving 💝',
+                'score': round(love_score * 100, 2),
+                'emotions': [{
+                    'emotion': 'love',
+                    'emoji': '💝',
+                    'score': round(love_score * 100, 2)
+                }]
+            })
+
+    # Get the primary emotion (highest score)
+    primary_emotion = max(results, key=lambda x: x['score'])
+
+    # Format the response with emojis
+    response = {
+        'primary_mood': grouped_emotions['primary_category'],
+        'confidence': round(primary_emotion['score'] * 100, 2),
+        'emotions': [
+            f"{map_emotion_to_category(emotion['label']).split(' ')[0]} {EMOTION_EMOJIS.get(emotion['label'], '')}"
+            for emotion in results
+            if emotion['score'] > 0.1
+        ],
+        'emotion_groups': grouped_emotions
+    }
+
+    # If calm was detected, add it to the emotions list
+    if calm_score > 0.2:
+        response['emotions'].append(f"calm 😌")
+
+    # If motivation was detected, add it to the emotions list
+    if motivation_score > 0.2:
+        response['emotions'].append(f"motivation 💪")
+
+    # If love was detected, add it to the emotions list
+    if love_score > 0.3:
+        response['emotions'].append(f"love 💝")
+
+    # If heartbreak was detected, add it to the emotions list
+    if heartbreak_score > 0.2:
+        response['emotions'].append(f"heartbreak 💔")
+
+    payload_logger.debug("Analysis response: %s", response)
+    return response
@@ -0,0 +1,245 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import ExportJob, User
+from pdf_export import journal_export_entries, journal_export_query, render_journal_pdf, export_subtitle
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """Directory of finished export PDFs keyed by content, evicted by total size.
+
+    Reads refresh a file's mtime, so eviction removes the least recently used
+    artifacts first once the store grows past max_bytes. Artifacts are handed
+    out as open files, which stay readable if they are evicted meanwhile.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def open(self, key):
+        """The artifact for key opened for reading, or None if it is not stored"""
+        path = self.path_for(key)
+        try:
+            artifact = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted after opening; the open file is still complete
+            pass
+        return artifact
+
+    def put(self, key, render):
+        """Render into a temporary file, atomically publish it under key and return it opened"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.pdf.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                render(output)
+            # Opened before publishing, so eviction by a concurrent put cannot take it away
+            artifact = open(tmp_path, 'rb')
+            os.replace(tmp_path, self.path_for(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict(keep=key)
+        return artifact
+
+    def evict(self, keep=None):
+        """Remove least recently used artifacts until the store fits in max_bytes"""
+        with self._lock:
+            artifacts = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in artifacts)
+            keep_path = self.path_for(keep) if keep else None
+            for _, size, path in sorted(artifacts):
+                if total <= self.max_bytes:
+                    break
+                if path == keep_path:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info("Evicted export artifact %s", os.path.basename(path))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        sizes = [entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.pdf')]
+        return {'artifacts': len(sizes), 'bytes': sum(sizes), 'max_bytes': self.max_bytes}
+
+
+def export_artifact_key(user_id, start_at=None, end_at=None):
+    """Key identifying an export's content: user, filters and the state of the journal.
+
+    The latest entry's created_at changes whenever an entry is written; the
+    count also catches imports of older entries that do not move the latest,
+    and the user's journal_modified_at changes when existing entries are
+    re-scored in place.
+    """
+    entries = journal_export_entries(user_id, start_at, end_at)
+    latest = entries.only('created_at').as_pymongo().first()
+    count = entries.count()
+    user = User.objects(id=user_id).only('journal_modified_at').as_pymongo().first() or {}
+    modified_at = user.get('journal_modified_at')
+    parts = [
+        str(user_id),
+        start_at.isoformat() if start_at else '',
+        end_at.isoformat() if end_at else '',
+        latest['created_at'].isoformat() if latest else '',
+        str(count),
+        modified_at.isoformat() if modified_at else ''
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def export_params(start_at=None, end_at=None):
+    """The filters of an export as stored on its job"""
+    return {
+        'start': start_at.isoformat() if start_at else None,
+        'end': end_at.isoformat() if end_at else None
+    }
+
+
+class ExportQueueFullError(Exception):
+    """Raised when the export worker pool already has queue_size jobs waiting"""
+
+
+class ExportJobManager:
+    """Runs PDF exports on a local worker pool and tracks them as ExportJob documents.
+
+    At most max_workers jobs render at a time and queue_size more wait for a
+    worker; submitting beyond that raises ExportQueueFullError. Jobs are only
+    tracked by the process that queued them, so a job still queued or running
+    after job_timeout (its worker was recycled, say) is marked failed when it
+    is next looked at.
+    """
+
+    def __init__(self, store, max_workers=2, batch_size=200, job_timeout=600, queue_size=20):
+        self.store = store
+        self.batch_size = batch_size
+        self.job_timeout = job_timeout
+        self.max_pending = max_workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export-worker')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def render(self, user_id, start_at, end_at, key):
+        """Render the export into the artifact store and return it opened; runs on the worker pool"""
+        def render_to(output):
+            entries = journal_export_query(user_id, start_at, end_at, batch_size=self.batch_size)
+            render_journal_pdf(entries, output, subtitle=export_subtitle(start_at, end_at))
+        return self.store.put(key, render_to)
+
+    def open_export(self, user_id, start_at=None, end_at=None):
+        """(cached PDF opened for reading, None), or (None, job) rendering it in the background"""
+        key = export_artifact_key(user_id, start_at, end_at)
+        artifact = self.store.open(key)
+        if artifact is not None:
+            return artifact, None
+        return None, self._queue(user_id, start_at, end_at, key)
+
+    def _cached_size(self, key):
+        artifact = self.store.open(key)
+        if artifact is None:
+            return None
+        with artifact:
+            return os.fstat(artifact.fileno()).st_size
+
+    def submit(self, user_id, start_at=None, end_at=None):
+        """Create (or reuse) an export job; cached artifacts complete immediately"""
+        key = export_artifact_key(user_id, start_at, end_at)
+        size = self._cached_size(key)
+        if size is not None:
+            job = ExportJob(user_id=user_id, artifact_key=key, params=export_params(start_at, end_at),
+                            status=ExportJob.DONE, cached=True, file_size=size, finished_at=datetime.utcnow())
+            job.save()
+            return job
+        return self._queue(user_id, start_at, end_at, key)
+
+    def _queue(self, user_id, start_at, end_at, key):
+        # The same export is already being generated
+        in_flight = ExportJob.objects(
+            user_id=user_id,
+            artifact_key=key,
+            status__in=[ExportJob.QUEUED, ExportJob.RUNNING],
+            created_at__gt=datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        ).first()
+        if in_flight:
+            return in_flight
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ExportQueueFullError(f'{self._pending} exports are already queued or running')
+            self._pending += 1
+        try:
+            job = ExportJob(user_id=user_id, artifact_key=key, params=export_params(start_at, end_at))
+            job.save()
+            self._executor.submit(self._run, job.id, user_id, start_at, end_at, key)
+        except Exception:
+            self._release()
+            raise
+        return job
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, job_id, user_id, start_at, end_at, key):
+        try:
+            # A job that waited past job_timeout has already been marked failed
+            started = ExportJob.objects(id=job_id, status=ExportJob.QUEUED).update_one(
+                set__status=ExportJob.RUNNING, set__started_at=datetime.utcnow())
+            if not started:
+                return
+            with self.render(user_id, start_at, end_at, key) as artifact:
+                file_size = os.fstat(artifact.fileno()).st_size
+            ExportJob.objects(id=job_id).update_one(
+                set__status=ExportJob.DONE,
+                set__file_size=file_size,
+                set__finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            logger.exception("Export job %s failed", job_id)
+            ExportJob.objects(id=job_id).update_one(
+                set__status=ExportJob.FAILED,
+                set__error=str(e),
+                set__finished_at=datetime.utcnow()
+            )
+        finally:
+            self._release()
+
+    def expire_stale(self, job):
+        """Mark a job still queued or running after job_timeout as failed and return it"""
+        if job.status not in (ExportJob.QUEUED, ExportJob.RUNNING):
+            return job
+        deadline = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        if job.created_at and job.created_at < deadline:
+            ExportJob.objects(id=job.id, status__in=[ExportJob.QUEUED, ExportJob.RUNNING]).update_one(
+                set__status=ExportJob.FAILED,
+                set__error='Export job timed out; submit it again',
+                set__finished_at=datetime.utcnow()
+            )
+            job.reload()
+        return job
+
+    def open_artifact(self, job):
+        """A finished job's PDF opened for reading, or None if it has been evicted"""
+        return self.store.open(job.artifact_key)
@@ -0,0 +1,70 @@
+"""Production server settings, read by gunicorn from the backend directory.
+
+Usage:
+    gunicorn app:app
+
+The app, and with PRELOAD_MODEL the emotion model, is loaded once in the
+master process before the workers are forked, so the model weights are shared
+copy-on-write instead of loaded once per worker. With INFERENCE_MODE=pool the
+master starts the host's inference service instead, which all workers share.
+Worker and thread counts come from Config.
+"""
+import gc
+import os
+
+from config import Config
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+timeout = Config.WEB_TIMEOUT
+preload_app = True
+
+
+def worker_torch_threads():
+    """Intra-op threads per worker, so that all workers together use each core once"""
+    if Config.TORCH_THREADS:
+        return Config.TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, Config.WEB_WORKERS))
+
+
+def when_ready(server):
+    # Runs in the master after preload_app imported the app, before any fork
+    if Config.INFERENCE_MODE == 'pool':
+        start_inference_service(server)
+        return
+    if not Config.PRELOAD_MODEL:
+        return
+    from app import emotion_model
+
+    # Loading only; running inference here would start torch's thread pool in
+    # the master, which the forked workers cannot use
+    emotion_model.load()
+    # Keep the cyclic GC in the workers from writing to (and so copying) the
+    # pages of every object loaded so far
+    gc.freeze()
+    server.log.info("Emotion model %s loaded in the master; forking %s workers", emotion_model.version, workers)
+
+
+def start_inference_service(server):
+    """One inference service per host, owned by the master and stopped when it exits"""
+    from app import emotion_model
+
+    # Workers only connect; they never start a service of their own
+    emotion_model.autostart = False
+    if not Config.INFERENCE_SERVICE_START:
+        server.log.info("Using the inference service at %s", Config.INFERENCE_SERVICE_ADDRESS)
+        return
+    emotion_model.start_service()
+    server.log.info("Started the inference service at %s with %s inference processes for %s workers",
+                    Config.INFERENCE_SERVICE_ADDRESS, Config.INFERENCE_PROCESSES, workers)
+
+
+def post_fork(server, worker):
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(worker_torch_threads())
+    server.log.info("Worker %s using %s torch threads", worker.pid, torch.get_num_threads())
@@ -0,0 +1,92 @@
+import logging
+
+from bson import ObjectId
+from models import User, JournalEntry, MusicFeedback, MoodCacheEntry, MoodRollup, ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Every document whose indexes are managed here
+MANAGED_DOCUMENTS = [User, JournalEntry, MusicFeedback, MoodCacheEntry, MoodRollup, ExportJob]
+
+# Single-field indexes superseded by the (user_id, -created_at, -_id) compound indexes
+OBSOLETE_INDEXES = {
+    JournalEntry: ['user_id_1', 'created_at_1'],
+    MusicFeedback: ['user_id_1', 'created_at_1']
+}
+
+
+def ensure_indexes(drop_obsolete=True):
+    """Create every declared index and drop superseded ones; safe to run repeatedly"""
+    report = {}
+    for document in MANAGED_DOCUMENTS:
+        collection = document._get_collection()
+        document.ensure_indexes()
+
+        dropped = []
+        if drop_obsolete:
+            existing = collection.index_information()
+            for name in OBSOLETE_INDEXES.get(document, []):
+                if name in existing:
+                    collection.drop_index(name)
+                    dropped.append(name)
+
+        report[collection.name] = {
+            'indexes': sorted(collection.index_information()),
+            'dropped': dropped
+        }
+        logger.info("Indexes for %s: %s", collection.name, report[collection.name]['indexes'])
+    return report
+
+
+def hot_queries(user_id):
+    """The per-user, time-ordered queries served by the journal, mood-history and feedback routes"""
+    return {
+        'journal': JournalEntry.objects(user_id=user_id).order_by('-created_at', '-id'),
+        'mood_history': JournalEntry.objects(user_id=user_id).order_by('-created_at').only('created_at'),
+        'music_feedback': MusicFeedback.objects(user_id=user_id).order_by('-created_at')
+    }
+
+
+def _plan_stages(plan):
+    """Yield every stage of a winning plan, outermost first"""
+    while plan:
+        yield plan
+        if 'inputStage' in plan:
+            plan = plan['inputStage']
+        elif plan.get('inputStages'):
+            for child in plan['inputStages']:
+                yield from _plan_stages(child)
+            return
+        else:
+            return
+
+
+def explain_hot_queries(user_id=None):
+    """Summarize the winning plan of each hot query"""
+    user_id = user_id or ObjectId()
+    plans = {}
+    for name, queryset in hot_queries(user_id).items():
+        explanation = queryset.explain()
+        winning_plan = explanation.get('queryPlanner', {}).get('winningPlan', {})
+        # Slot-based execution (MongoDB 5+) nests the classic plan under queryPlan
+        winning_plan = winning_plan.get('queryPlan', winning_plan)
+        stages = list(_plan_stages(winning_plan))
+        stage_names = [stage.get('stage') for stage in stages]
+        plans[name] = {
+            'stages': stage_names,
+            'indexes': [stage.get('indexName') for stage in stages if stage.get('stage') == 'IXSCAN'],
+            'in_memory_sort': any(stage in ('SORT', 'SORT_KEY_GENERATOR') for stage in stage_names),
+            'covered': 'FETCH' not in stage_names and 'IXSCAN' in stage_names
+        }
+    return plans
+
+
+def verify_hot_queries(user_id=None):
+    """Return a list of problems; empty when every hot query uses an index without a SORT stage"""
+    problems = []
+    for name, plan in explain_hot_queries(user_id).items():
+        if not plan['indexes']:
+            problems.append(f"{name}: no index used (stages: {' -> '.join(plan['stages'])})")
+        elif plan['in_memory_sort']:
+            problems.append(f"{name}: in-memory SORT stage (stages: {' -> '.join(plan['stages'])})")
+    return problems
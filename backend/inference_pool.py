@@ -0,0 +1,338 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from batching import BatchTimeoutError, check_texts
+from mood_analyzer import EmotionModel, ModelNotReadyError
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when the inference pool already has its maximum of requests in flight"""
+
+
+# Inference process state, set up once by _worker_main
+_worker_model = None
+
+
+def _worker_main(index, model_options, threads, max_batch_size, requests, results):
+    """Load one model in this process and answer requests until a None sentinel"""
+    global _worker_model
+    try:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+        # Requests are batched here, by draining the queue, so the model's
+        # own batcher runs every call immediately
+        _worker_model = EmotionModel(**model_options, max_batch_size=max_batch_size, window_ms=0, timeout=3600)
+        _worker_model.load()
+    except Exception as e:
+        results.put(('failed', index, str(e)))
+        return
+    results.put(('ready', index, _worker_model.load_seconds))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        batch = [request]
+        texts = len(request[1])
+        # Join other waiting requests into one forward pass
+        while texts < max_batch_size:
+            try:
+                request = requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                requests.put(None)
+                break
+            batch.append(request)
+            texts += len(request[1])
+
+        live = []
+        for request_id, request_texts, deadline in batch:
+            if time.time() > deadline:
+                # The caller has given up; don't spend model time on it
+                results.put(('expired', request_id, None))
+            else:
+                live.append((request_id, request_texts))
+        if not live:
+            continue
+        try:
+            scores = _worker_model.score_many([text for _, request_texts in live for text in request_texts])
+        except Exception as e:
+            if len(live) == 1:
+                results.put(('error', live[0][0], str(e)))
+                continue
+            # Re-run the requests one at a time so only the failing one gets the error
+            for request_id, request_texts in live:
+                try:
+                    results.put(('result', request_id, _worker_model.score_many(request_texts)))
+                except Exception as e:
+                    results.put(('error', request_id, str(e)))
+            continue
+        start = 0
+        for request_id, request_texts in live:
+            results.put(('result', request_id, scores[start:start + len(request_texts)]))
+            start += len(request_texts)
+
+
+class _PendingInference:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferencePool:
+    """Emotion model inference in a pool of local worker processes, one model each.
+
+    A drop-in for EmotionModel: analyze/analyze_many send texts over a
+    multiprocessing queue and wait for the scores, so a slow inference never
+    holds the GIL of the caller. At most queue_size requests are in flight;
+    beyond that InferenceQueueFullError is raised at once, and a request not
+    answered within timeout raises BatchTimeoutError. The processes are
+    started on first use, in the process that uses them; the web app reaches
+    one pool per host through inference_service.py.
+    """
+
+    NOT_STARTED = EmotionModel.NOT_STARTED
+    LOADING = EmotionModel.LOADING
+    READY = EmotionModel.READY
+    FAILED = EmotionModel.FAILED
+
+    def __init__(self, model_options, processes=2, threads=None, max_batch_size=16, queue_size=64, timeout=30.0):
+        self.model_options = dict(model_options)
+        self.processes = max(1, int(processes))
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.processes)
+        self.max_batch_size = max_batch_size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        # Never loaded; describes the model the workers run
+        self._model = EmotionModel(**self.model_options)
+
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self.state = self.NOT_STARTED
+        self._ready = threading.Event()
+        self._workers = {}
+        self._worker_state = {}
+        self._pending = {}
+        self._ids = itertools.count()
+        self._dispatcher = None
+        self._stats = {'requests': 0, 'rejected': 0, 'timed_out': 0, 'expired': 0, 'restarts': 0, 'max_in_flight': 0}
+
+    @property
+    def model_name(self):
+        return self._model.model_name
+
+    @property
+    def backend(self):
+        return self._model.backend
+
+    @property
+    def version(self):
+        return self._model.version
+
+    @property
+    def embeddings(self):
+        return self._model.embeddings
+
+    @property
+    def embedding_version(self):
+        return self._model.embedding_version
+
+    def start_loading(self):
+        """Start the worker processes and return; safe to call repeatedly"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Queues and the dispatcher thread belong to the process that created them
+                self._pid = os.getpid()
+                self._reset()
+            if self.state != self.NOT_STARTED:
+                return
+            self.state = self.LOADING
+            # spawn: forking a process that already imported torch can deadlock its thread pool
+            self._context = multiprocessing.get_context('spawn')
+            self._requests = self._context.Queue()
+            self._results = self._context.Queue()
+            for index in range(self.processes):
+                self._spawn(index)
+            self._dispatcher = threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.model_options, self.threads, self.max_batch_size, self._requests, self._results),
+            name=f'inference-{index}',
+            daemon=True
+        )
+        process.start()
+        self._workers[index] = process
+        self._worker_state[index] = self.LOADING
+
+    def load(self):
+        """Start the worker processes and wait until one of them is ready"""
+        self.start_loading()
+        self._ready.wait()
+        if self.state != self.READY:
+            raise ModelNotReadyError(f'Emotion model failed to load: {self.error}', self.state)
+
+    def wait_until_ready(self, timeout=None):
+        self.start_loading()
+        self._ready.wait(timeout)
+        return self.state == self.READY
+
+    def is_ready(self):
+        return self.state == self.READY
+
+    def _dispatch(self):
+        last_check = time.monotonic()
+        while True:
+            if time.monotonic() - last_check >= 1.0:
+                self._restart_dead_workers()
+                last_check = time.monotonic()
+            try:
+                kind, key, value = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            if kind == 'ready':
+                self._worker_state[key] = self.READY
+                self.load_seconds = value
+                self.state = self.READY
+                self._ready.set()
+            elif kind == 'failed':
+                logger.error("Inference process %s failed to load the model: %s", key, value)
+                self._worker_state[key] = self.FAILED
+                self.error = value
+                if all(state == self.FAILED for state in self._worker_state.values()):
+                    self.state = self.FAILED
+                    self._ready.set()
+            else:
+                with self._lock:
+                    pending = self._pending.pop(key, None)
+                    if kind == 'expired':
+                        self._stats['expired'] += 1
+                if pending is None:
+                    continue
+                if kind == 'result':
+                    pending.result = value
+                else:
+                    pending.error = RuntimeError(value or 'Inference request expired')
+                pending.event.set()
+
+    def _restart_dead_workers(self):
+        for index, process in list(self._workers.items()):
+            if process.is_alive() or self._worker_state[index] == self.FAILED:
+                continue
+            if self._worker_state[index] == self.LOADING:
+                # Died while loading, e.g. killed for running out of memory
+                self._results.put(('failed', index, f'Inference process exited with code {process.exitcode}'))
+                self._worker_state[index] = self.FAILED
+                continue
+            # Requests the process was working on are answered by their timeout
+            logger.error("Inference process %s exited with code %s; restarting", index, process.exitcode)
+            with self._lock:
+                self._stats['restarts'] += 1
+            self._spawn(index)
+
+    def _require_ready(self, wait_timeout):
+        if not self.wait_until_ready(wait_timeout):
+            if self.state == self.FAILED:
+                raise ModelNotReadyError(f'Emotion model failed to load: {self.error}', self.state)
+            raise ModelNotReadyError('Emotion model is warming up', self.state)
+
+    def analyze(self, text, wait_timeout=0):
+        """Return the per-label scores for text, waiting up to wait_timeout for the model"""
+        return self.analyze_many([text], wait_timeout)[0]
+
+    def analyze_many(self, texts, wait_timeout=0):
+        """Return the per-label scores for each text, scored by one worker process"""
+        results = self.score_many(texts, wait_timeout)
+        return [result['scores'] for result in results] if self.embeddings else results
+
+    def analyze_many_with_embeddings(self, texts, wait_timeout=0):
+        """Return (per-label scores, normalized float32 embedding) for each text"""
+        if not self.embeddings:
+            raise ValueError('The emotion model was not loaded with embeddings')
+        return [(result['scores'], result['embedding']) for result in self.score_many(texts, wait_timeout)]
+
+    def score_many(self, texts, wait_timeout=0):
+        """EmotionModel.score_many in a worker process"""
+        check_texts(texts)
+        self._require_ready(wait_timeout)
+        if not texts:
+            return []
+        pending = _PendingInference()
+        with self._lock:
+            if len(self._pending) >= self.queue_size:
+                self._stats['rejected'] += 1
+                raise InferenceQueueFullError(f'{len(self._pending)} inference requests already in flight')
+            request_id = next(self._ids)
+            self._pending[request_id] = pending
+            self._stats['requests'] += 1
+            self._stats['max_in_flight'] = max(self._stats['max_in_flight'], len(self._pending))
+
+        # Large batches (imports) get the usual timeout per model batch
+        timeout = self.timeout * max(1, -(-len(texts) // self.max_batch_size))
+        self._requests.put((request_id, list(texts), time.time() + timeout))
+        if not pending.event.wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._stats['timed_out'] += 1
+            raise BatchTimeoutError('Timed out waiting for emotion analysis')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def queue_depth(self):
+        """Requests sent to the pool and not answered yet"""
+        with self._lock:
+            return len(self._pending)
+
+    def inference_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._pending)
+        stats['config'] = {
+            'mode': 'pool',
+            'processes': self.processes,
+            'threads_per_process': self.threads,
+            'max_batch_size': self.max_batch_size,
+            'queue_size': self.queue_size,
+            'timeout': self.timeout
+        }
+        return stats
+
+    def status(self):
+        status = self._model.status()
+        status.update({
+            'state': self.state,
+            'ready': self.state == self.READY,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+            'processes': {
+                str(index): {'pid': process.pid, 'alive': process.is_alive(), 'state': self._worker_state[index]}
+                for index, process in list(self._workers.items())
+            }
+        })
+        # Window counters are kept in the worker processes
+        for key in ('windowed_texts', 'windows', 'capped_texts'):
+            status['long_text'].pop(key, None)
+        return status
@@ -0,0 +1,332 @@
+"""One inference pool per host, shared by every web process.
+
+The service owns the InferencePool (INFERENCE_PROCESSES model copies and the
+bounded request queue) and answers InferenceClient calls over a local socket,
+so adding gunicorn workers adds web concurrency without adding model copies.
+gunicorn starts it from the master (see gunicorn.conf.py); to run it under a
+process supervisor instead, set INFERENCE_SERVICE_START=false and start:
+
+Usage:
+    python inference_service.py
+"""
+import atexit
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from batching import BatchTimeoutError, check_texts
+from inference_pool import InferencePool, InferenceQueueFullError
+from mood_analyzer import EmotionModel, ModelNotReadyError
+
+logger = logging.getLogger(__name__)
+
+SERVICE_SCRIPT = os.path.abspath(__file__)
+
+# Pool methods InferenceClient may call, besides 'state'
+SERVICE_METHODS = ('score_many', 'wait_until_ready', 'queue_depth', 'inference_stats', 'status')
+
+# Exceptions that are raised again in the client with their own type
+SERVICE_ERRORS = {
+    'ModelNotReadyError': ModelNotReadyError,
+    'BatchTimeoutError': BatchTimeoutError,
+    'InferenceQueueFullError': InferenceQueueFullError,
+    'TypeError': TypeError,
+    'ValueError': ValueError
+}
+
+
+def parse_address(address):
+    """'host:port' as a TCP address, anything else as a Unix socket path"""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+def service_authkey(address, authkey, fallback):
+    """The service's authkey as bytes; a TCP address needs one of its own.
+
+    Connections exchange pickles, so anyone who knows the key can run code in
+    the service. A Unix socket is only reachable by local users allowed to
+    write to it, and may fall back to SECRET_KEY; a TCP port may be reachable
+    from other hosts, so it is refused without a key set for the service.
+    """
+    if authkey:
+        return authkey.encode('utf-8')
+    if isinstance(address, tuple):
+        raise ValueError('INFERENCE_SERVICE_AUTHKEY must be set when INFERENCE_SERVICE_ADDRESS is a TCP address')
+    return fallback.encode('utf-8')
+
+
+def _serve_connection(pool, conn):
+    """Answer one client connection's calls, one at a time, until it closes"""
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if method == 'state':
+                    reply = ('ok', pool.state)
+                elif method in SERVICE_METHODS:
+                    reply = ('ok', getattr(pool, method)(*args))
+                else:
+                    raise ValueError(f'Unknown inference service method {method!r}')
+            except Exception as e:
+                reply = ('error', type(e).__name__, str(e), getattr(e, 'state', None))
+            try:
+                conn.send(reply)
+            except (OSError, ValueError):
+                return
+
+
+def serve(pool, address, authkey):
+    """Load the pool's models and answer InferenceClient connections until the process exits"""
+    if isinstance(address, str) and os.path.exists(address):
+        try:
+            Client(address, authkey=authkey).close()
+        except OSError:
+            # Left behind by a service that did not exit cleanly
+            os.remove(address)
+        else:
+            raise SystemExit(f'An inference service is already listening at {address}')
+    listener = Listener(address, authkey=authkey)
+    pool.start_loading()
+    logger.info("Inference service listening at %s with %s inference processes", address, pool.processes)
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            # A client with the wrong authkey, or one that hung up during the handshake
+            logger.warning("Rejected inference service connection: %s", e)
+            continue
+        threading.Thread(target=_serve_connection, args=(pool, conn), name='inference-connection', daemon=True).start()
+
+
+class InferenceClient:
+    """Drop-in for EmotionModel that runs inference in the host's inference service.
+
+    Each call is sent over a pooled connection to the service, which queues it
+    on its InferencePool; the queue bound and the batching are the service's,
+    shared by all web processes. With autostart, start_loading() starts the
+    service as a child of this process if it is not running yet. While the
+    service is unreachable, analysis raises ModelNotReadyError.
+    """
+
+    NOT_STARTED = EmotionModel.NOT_STARTED
+    LOADING = EmotionModel.LOADING
+    READY = EmotionModel.READY
+    FAILED = EmotionModel.FAILED
+
+    def __init__(self, model_options, address, authkey, timeout=30.0, status_timeout=2.0, max_batch_size=16,
+                 autostart=True):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        # State and status calls are answered without waiting for the model
+        self.status_timeout = status_timeout
+        self.max_batch_size = max_batch_size
+        self.autostart = autostart
+        # Never loaded; describes the model the service runs
+        self._model = EmotionModel(**model_options)
+        self._service = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._idle = []
+        self._checked_pid = None
+
+    @property
+    def model_name(self):
+        return self._model.model_name
+
+    @property
+    def backend(self):
+        return self._model.backend
+
+    @property
+    def version(self):
+        return self._model.version
+
+    @property
+    def embeddings(self):
+        return self._model.embeddings
+
+    @property
+    def embedding_version(self):
+        return self._model.embedding_version
+
+    def start_service(self):
+        """Run the inference service as a child of this process until this process exits"""
+        with self._lock:
+            if self._service is not None and self._service.poll() is None:
+                return
+            self._service = subprocess.Popen([sys.executable, SERVICE_SCRIPT], cwd=os.path.dirname(SERVICE_SCRIPT))
+            service, owner = self._service, os.getpid()
+
+        def stop():
+            # Forked children inherit this handler; only the owner stops the service
+            if os.getpid() == owner and service.poll() is None:
+                service.terminate()
+        atexit.register(stop)
+
+    def _reachable(self):
+        try:
+            Client(self.address, authkey=self.authkey).close()
+            return True
+        except OSError:
+            return False
+
+    def start_loading(self):
+        """Start the inference service if autostart is set and it is not running; checked once per process"""
+        if self._checked_pid == os.getpid():
+            return
+        self._checked_pid = os.getpid()
+        if self.autostart and not self._reachable():
+            self.start_service()
+
+    def _connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connections inherited over fork are shared with the parent
+                self._pid = os.getpid()
+                self._idle = []
+            if self._idle:
+                return self._idle.pop()
+        return Client(self.address, authkey=self.authkey)
+
+    def _call(self, method, *args, timeout=None):
+        try:
+            conn = self._connection()
+        except OSError as e:
+            raise ModelNotReadyError(f'Inference service is unavailable: {e}', self.NOT_STARTED)
+        try:
+            conn.send((method, args))
+            if not conn.poll(timeout):
+                # The reply may still arrive, so this connection cannot be reused
+                conn.close()
+                raise BatchTimeoutError('Timed out waiting for emotion analysis')
+            reply = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise ModelNotReadyError(f'Inference service is unavailable: {e}', self.NOT_STARTED)
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.append(conn)
+        if reply[0] == 'ok':
+            return reply[1]
+        _, name, message, state = reply
+        if name == 'ModelNotReadyError':
+            raise ModelNotReadyError(message, state)
+        raise SERVICE_ERRORS.get(name, RuntimeError)(message)
+
+    @property
+    def state(self):
+        try:
+            return self._call('state', timeout=self.status_timeout)
+        except (ModelNotReadyError, BatchTimeoutError):
+            return self.NOT_STARTED
+
+    def load(self):
+        """Wait until the service has loaded the model"""
+        self.start_loading()
+        if not self.wait_until_ready():
+            raise ModelNotReadyError('Emotion model failed to load', self.state)
+
+    def wait_until_ready(self, timeout=None):
+        self.start_loading()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                return self._call('wait_until_ready', remaining, timeout=None if remaining is None else remaining + 1)
+            except ModelNotReadyError:
+                # The service is still starting
+                if remaining is not None and remaining <= 0:
+                    return False
+                time.sleep(0.1 if remaining is None else min(0.1, remaining))
+            except BatchTimeoutError:
+                return False
+
+    def is_ready(self):
+        return self.state == self.READY
+
+    def analyze(self, text, wait_timeout=0):
+        """Return the per-label scores for text, waiting up to wait_timeout for the model"""
+        return self.analyze_many([text], wait_timeout)[0]
+
+    def analyze_many(self, texts, wait_timeout=0):
+        """Return the per-label scores for each text, scored by the inference service"""
+        results = self.score_many(texts, wait_timeout)
+        return [result['scores'] for result in results] if self.embeddings else results
+
+    def analyze_many_with_embeddings(self, texts, wait_timeout=0):
+        """Return (per-label scores, normalized float32 embedding) for each text"""
+        if not self.embeddings:
+            raise ValueError('The emotion model was not loaded with embeddings')
+        return [(result['scores'], result['embedding']) for result in self.score_many(texts, wait_timeout)]
+
+    def score_many(self, texts, wait_timeout=0):
+        """EmotionModel.score_many in the inference service"""
+        check_texts(texts)
+        if not texts:
+            return []
+        # The service answers within its own timeout per model batch; allow for the transfer on top
+        timeout = wait_timeout + self.timeout * max(1, -(-len(texts) // self.max_batch_size)) + 5
+        return self._call('score_many', list(texts), wait_timeout, timeout=timeout)
+
+    def queue_depth(self):
+        """Requests queued in the inference service, from all web processes"""
+        try:
+            return self._call('queue_depth', timeout=self.status_timeout)
+        except (ModelNotReadyError, BatchTimeoutError):
+            return 0
+
+    def inference_stats(self):
+        try:
+            stats = self._call('inference_stats', timeout=self.status_timeout)
+        except (ModelNotReadyError, BatchTimeoutError) as e:
+            stats = {'error': str(e), 'config': {'mode': 'pool'}}
+        stats['config']['service'] = str(self.address)
+        return stats
+
+    def status(self):
+        try:
+            return self._call('status', timeout=self.status_timeout)
+        except (ModelNotReadyError, BatchTimeoutError) as e:
+            status = self._model.status()
+            status.update({'state': self.NOT_STARTED, 'ready': False, 'error': str(e)})
+            return status
+
+
+def main():
+    from config import Config
+    from logging_setup import configure_logging
+    from model_setup import emotion_model_options
+
+    configure_logging(level=Config.LOG_LEVEL, fmt=Config.LOG_FORMAT, queue_size=Config.LOG_QUEUE_SIZE)
+    # SIGTERM exits through atexit, which stops the inference processes too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    address = parse_address(Config.INFERENCE_SERVICE_ADDRESS)
+    try:
+        authkey = service_authkey(address, Config.INFERENCE_SERVICE_AUTHKEY, Config.SECRET_KEY)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    pool = InferencePool(
+        emotion_model_options(),
+        processes=Config.INFERENCE_PROCESSES,
+        threads=Config.INFERENCE_THREADS or None,
+        max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+        queue_size=Config.INFERENCE_QUEUE_SIZE,
+        timeout=Config.INFERENCE_TIMEOUT
+    )
+    serve(pool, address, authkey)
+
+
+if __name__ == '__main__':
+    main()
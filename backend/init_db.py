@@ -1,22 +1,43 @@
-from app import app
-from models import db
+import argparse
 
-def init_database():
-    """Initialize MongoDB database and collections."""
+from models import create_db_app
+from indexes import ensure_indexes, verify_hot_queries
+from analytics import rebuild_rollups
+
+def init_database(rebuild_mood_rollups=False):
+    """Initialize MongoDB database, collections and indexes."""
     try:
-        # Initialize MongoDB connection
-        db.init_app(app)
-        print("Successfully connected to MongoDB!")
-        
-        # Create indexes
-        with app.app_context():
-            # Create unique indexes for User collection
-            db.User.ensure_index('username', unique=True)
-            db.User.ensure_index('email', unique=True)
+        with create_db_app().app_context():
+            # Create the declared indexes (unique username/email, per-user
+            # time-ordered compound indexes, cache TTL) and drop superseded ones
+            report = ensure_indexes()
+            print("Successfully connected to MongoDB!")
+            for collection, result in report.items():
+                print(f"{collection}: {', '.join(result['indexes'])}")
+                if result['dropped']:
+                    print(f"  dropped obsolete indexes: {', '.join(result['dropped'])}")
             print("Database indexes created successfully!")
+
+            # Check that the hot per-user queries are planned without an in-memory sort
+            problems = verify_hot_queries()
+            if problems:
+                print("Query plan problems:")
+                for problem in problems:
+                    print(f"  {problem}")
+            else:
+                print("Journal, mood-history and feedback queries use their indexes without a SORT stage")
+
+            # Backfill the mood analytics rollups from existing journal entries
+            if rebuild_mood_rollups:
+                count = rebuild_rollups()
+                print(f"Rebuilt mood rollups from {count} journal entries")
             
     except Exception as e:
         print(f"Error initializing database: {str(e)}")
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Initialize the MoodTunes database')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='recompute the mood analytics rollups from the journal')
+    args = parser.parse_args()
+    init_database(rebuild_mood_rollups=args.rebuild_rollups)
@@ -0,0 +1,176 @@
+import json
+import logging
+
+from dateutil import parser
+from mongoengine.errors import ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+from models import JournalEntry, mongo_now
+
+logger = logging.getLogger(__name__)
+
+
+class ImportAnalysisError(Exception):
+    """Raised by the analysis callback when a whole batch could not be analyzed.
+
+    Any other exception from the callback is reported the same way, as an
+    error for each record of the chunk, after being logged.
+    """
+
+
+def iter_ndjson_records(lines):
+    """Yield one record (or the ValueError explaining why it is invalid) per non-blank line"""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'Invalid JSON: {str(e)}')
+
+
+def build_entry(record, user_ref):
+    """Validate one import record and build its JournalEntry; raises ValueError"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('Each record must be an object')
+
+    content = str(record.get('content') or '').strip()
+    if not content:
+        raise ValueError('Content cannot be empty')
+
+    created_at = record.get('created_at')
+    if created_at:
+        try:
+            created_at = parser.isoparse(str(created_at))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid created_at: {created_at}')
+        # Stored like every other entry: naive local time
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone().replace(tzinfo=None)
+    else:
+        created_at = mongo_now()
+
+    entry = JournalEntry(content=content, user_id=user_ref, created_at=created_at)
+    if record.get('mood'):
+        entry.set_mood(record['mood'])
+    return entry
+
+
+def import_journal_entries(records, user_ref, analyze_fn=None, chunk_size=500,
+                           max_records=None, write_concern=None, on_insert=None, embed_fn=None):
+    """Validate, optionally analyze, and insert journal entries in chunks.
+
+    records is any iterable of dicts (a parsed JSON array or NDJSON lines).
+    When analyze_fn is given, entries without a mood are analyzed in one call
+    per chunk: analyze_fn(list_of_texts) -> list_of_mood_responses. Each chunk
+    is written with an unordered insert_many, so one bad record never aborts
+    the others. on_insert, if given, receives each chunk's inserted documents.
+    embed_fn, if given, may set the embeddings of a chunk's entries before they
+    are written; if it fails they are written without.
+    Returns counts and per-record errors keyed by record index. If a chunk's
+    write fails as a whole (network error, timeout, write concern error), its
+    records are reported as errors, the chunk is returned as failed_chunk and
+    no further records are read; the chunks before it stay imported.
+    """
+    collection = JournalEntry._get_collection()
+    if write_concern:
+        collection = collection.with_options(write_concern=WriteConcern(**write_concern))
+
+    summary = {'received': 0, 'imported': 0, 'analyzed': 0, 'failed': 0, 'errors': []}
+
+    def fail(index, message):
+        summary['failed'] += 1
+        summary['errors'].append({'index': index, 'error': message})
+
+    def flush(chunk):
+        # chunk: list of (record index, entry); returns False if the import must stop
+        first_index, last_index = chunk[0][0], chunk[-1][0]
+        if analyze_fn is not None:
+            pending = [(index, entry) for index, entry in chunk if not entry.mood_data]
+            if pending:
+                try:
+                    analyses = analyze_fn([entry.content for _, entry in pending])
+                    if len(analyses) != len(pending):
+                        raise ImportAnalysisError(f'Expected {len(pending)} analyses, got {len(analyses)}')
+                except Exception as e:
+                    if not isinstance(e, ImportAnalysisError):
+                        logger.exception("Mood analysis failed for an import chunk")
+                    failed = {index for index, _ in pending}
+                    for index in sorted(failed):
+                        fail(index, f'Mood analysis failed: {str(e)}')
+                    chunk = [(index, entry) for index, entry in chunk if index not in failed]
+                    analyses = []
+                rejected = set()
+                for (index, entry), analysis in zip(pending, analyses):
+                    try:
+                        entry.set_mood(analysis)
+                        summary['analyzed'] += 1
+                    except ValueError as e:
+                        rejected.add(index)
+                        fail(index, f'Invalid mood analysis: {str(e)}')
+                if rejected:
+                    chunk = [(index, entry) for index, entry in chunk if index not in rejected]
+
+        if embed_fn is not None:
+            try:
+                embed_fn([entry for _, entry in chunk])
+            except Exception:
+                logger.exception("Embedding failed for an import chunk")
+
+        valid = []
+        for index, entry in chunk:
+            try:
+                entry.validate()
+                valid.append((index, entry))
+            except ValidationError as e:
+                fail(index, str(e))
+        if not valid:
+            return True
+
+        documents = [entry.to_mongo() for _, entry in valid]
+        failed_positions = set()
+        try:
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                failed_positions.add(write_error['index'])
+                fail(valid[write_error['index']][0], write_error.get('errmsg', 'Write failed'))
+        except PyMongoError as e:
+            # Some of the chunk may have been written; which part is unknown
+            logger.exception("Writing import records %s-%s failed", first_index, last_index)
+            for index, _ in valid:
+                fail(index, f'Write failed: {str(e)}')
+            summary['failed_chunk'] = {'start': first_index, 'end': last_index, 'error': str(e)}
+            return False
+
+        summary['imported'] += len(valid) - len(failed_positions)
+        if on_insert is not None:
+            on_insert([doc for position, doc in enumerate(documents) if position not in failed_positions])
+        return True
+
+    chunk = []
+    for index, record in enumerate(records):
+        if max_records is not None and index >= max_records:
+            fail(index, f'Import is limited to {max_records} records per request')
+            break
+        summary['received'] += 1
+        try:
+            chunk.append((index, build_entry(record, user_ref)))
+        except ValueError as e:
+            fail(index, str(e))
+        if len(chunk) >= chunk_size:
+            if not flush(chunk):
+                break
+            chunk = []
+    if chunk and 'failed_chunk' not in summary:
+        flush(chunk)
+
+    summary['errors'].sort(key=lambda error: error['index'])
+    logger.info("Imported %s of %s journal entries", summary['imported'], summary['received'])
+    return summary
@@ -0,0 +1,120 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+# Response field -> JournalEntry field for the GET /api/journal `fields` projection
+JOURNAL_RESPONSE_FIELDS = {
+    'id': 'id',
+    'content': 'content',
+    'created_at': 'created_at',
+    'mood': 'mood_data'
+}
+
+
+class JournalRequestError(ValueError):
+    """A rejected POST /api/journal request, with its status and validation stage"""
+
+    def __init__(self, message, status, validation_stage, **details):
+        super().__init__(message)
+        self.status = status
+        self.validation_stage = validation_stage
+        self.details = details
+
+    def to_dict(self):
+        return {
+            'success': False,
+            'error': str(self),
+            'validation_stage': self.validation_stage,
+            **self.details
+        }
+
+
+def journal_content(data):
+    """The stripped content of a journal entry request body; raises JournalRequestError"""
+    if not data:
+        raise JournalRequestError('Empty request data', 400, 'data_validation')
+    if 'content' not in data:
+        raise JournalRequestError('Content is required', 422, 'content_validation', received_fields=list(data.keys()))
+    content = str(data.get('content', '')).strip()
+    if not content:
+        raise JournalRequestError('Content cannot be empty', 422, 'content_validation')
+    return content
+
+
+def encode_journal_cursor(doc):
+    """Opaque cursor pointing just after doc in (-created_at, -_id) order"""
+    payload = json.dumps({'t': doc['created_at'].isoformat(), 'id': str(doc['_id'])})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_journal_cursor(cursor):
+    """Decode a cursor into (created_at, ObjectId); raises ValueError if malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_page_size(value, default_page_size, max_page_size):
+    """A raw ?limit= value as a page size capped at max_page_size; raises ValueError.
+
+    Missing means default_page_size; anything but a positive integer is
+    rejected rather than silently replaced by the default.
+    """
+    if value is None:
+        return default_page_size
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be a positive integer')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, max_page_size)
+
+
+def parse_journal_query(args, default_page_size, max_page_size):
+    """Validate GET /api/journal query arguments into (fields, limit, cursor).
+
+    limit is None when the request is not paginated; cursor is None or a
+    decoded (created_at, ObjectId) pair. Raises ValueError.
+    """
+    fields = list(JOURNAL_RESPONSE_FIELDS)
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown_fields = [field for field in fields if field not in JOURNAL_RESPONSE_FIELDS]
+        if unknown_fields:
+            raise ValueError(f'Unknown fields: {", ".join(unknown_fields)}')
+
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is not None or cursor is not None:
+        limit = parse_page_size(limit, default_page_size, max_page_size)
+    return fields, limit, decode_journal_cursor(cursor) if cursor else None
+
+
+def serialize_journal_doc(doc, fields):
+    """Build the API representation of a raw journal document"""
+    entry_data = {}
+    if 'id' in fields:
+        entry_data['id'] = str(doc['_id'])
+    if 'content' in fields:
+        entry_data['content'] = doc.get('content')
+    if 'created_at' in fields:
+        entry_data['created_at'] = doc['created_at'].isoformat()
+    if 'mood' in fields:
+        entry_data['mood'] = doc.get('mood_data') or None
+    return entry_data
+
+
+def serialize_feedback_doc(doc):
+    """Build the API representation of a raw music feedback document"""
+    return {
+        'id': str(doc['_id']),
+        'playlist_id': doc.get('playlist_id'),
+        'mood_score': doc.get('mood_score'),
+        'feedback_text': doc.get('feedback_text'),
+        'created_at': doc['created_at'].isoformat()
+    }
@@ -0,0 +1,148 @@
+import base64
+import json
+import re
+
+from bson import ObjectId
+
+from journal_requests import parse_page_size
+from pdf_export import parse_date_range
+
+MAX_SEARCH_QUERY_LENGTH = 256
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def encode_search_cursor(doc):
+    """Opaque cursor pointing just after doc in (-score, -_id) order"""
+    payload = json.dumps({'s': doc['score'], 'id': str(doc['_id'])})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_search_cursor(cursor):
+    """Decode a search cursor into (score, ObjectId); raises ValueError if malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(payload['s']), ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_search_query(args, default_page_size, max_page_size):
+    """Validate GET /api/journal/search query arguments into a search dict; raises ValueError"""
+    text = (args.get('q') or '').strip()
+    if not text:
+        raise ValueError('q is required')
+    if len(text) > MAX_SEARCH_QUERY_LENGTH:
+        raise ValueError(f'q must be at most {MAX_SEARCH_QUERY_LENGTH} characters')
+
+    limit = parse_page_size(args.get('limit'), default_page_size, max_page_size)
+    start_at, end_at = parse_date_range(args.get('start'), args.get('end'))
+    cursor = args.get('cursor')
+    return {
+        'text': text,
+        'moods': _split_list(args.get('mood')),
+        'emotions': _split_list(args.get('emotions')),
+        'start_at': start_at,
+        'end_at': end_at,
+        'limit': limit,
+        'cursor': decode_search_cursor(cursor) if cursor else None
+    }
+
+
+def search_pipeline(user_id, search):
+    """Aggregation pipeline for one page of a user's journal search, best matches first.
+
+    The $text match is served by the (user_id, content text) index. Only the
+    fields of a hit are projected, and the $sort/$limit pair is coalesced into
+    a top-k sort, so at most limit + 1 documents are kept and returned.
+    """
+    match = {'user_id': ObjectId(user_id), '$text': {'$search': search['text']}}
+    if search['moods']:
+        match['mood_data.primary_mood'] = {'$in': search['moods']}
+    if search['emotions']:
+        match['mood_data.emotions'] = {'$all': search['emotions']}
+    created_at = {}
+    if search['start_at'] is not None:
+        created_at['$gte'] = search['start_at']
+    if search['end_at'] is not None:
+        created_at['$lt'] = search['end_at']
+    if created_at:
+        match['created_at'] = created_at
+
+    pipeline = [
+        {'$match': match},
+        {'$project': {
+            'content': True,
+            'created_at': True,
+            'mood_data': True,
+            'score': {'$meta': 'textScore'}
+        }}
+    ]
+    if search['cursor']:
+        cursor_score, cursor_id = search['cursor']
+        pipeline.append({'$match': {'$or': [
+            {'score': {'$lt': cursor_score}},
+            {'score': cursor_score, '_id': {'$lt': cursor_id}}
+        ]}})
+    # Fetch one extra hit to know whether another page exists
+    pipeline += [
+        {'$sort': {'score': -1, '_id': -1}},
+        {'$limit': search['limit'] + 1}
+    ]
+    return pipeline
+
+
+def search_terms(text):
+    """Words and quoted phrases of a $text search string, without negated terms"""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            terms.append(phrase.strip())
+        elif not word.startswith('-'):
+            terms.append(word.strip('"'))
+    return [term for term in terms if term]
+
+
+def snippet(content, terms, width=160):
+    """About width characters of content around the first occurrence of a search term.
+
+    Terms are matched case-insensitively by their leading characters, which
+    also finds most of the inflections the stemmed text index matched.
+    """
+    content = ' '.join(content.split())
+    if len(content) <= width:
+        return content
+
+    prefixes = [term if len(term) <= 4 else term[:max(4, len(term) - 3)] for term in terms]
+    pattern = '|'.join(re.escape(prefix) for prefix in prefixes if prefix)
+    found = re.search(rf'\b(?:{pattern})', content, re.IGNORECASE) if pattern else None
+    start = max(0, found.start() - width // 4) if found else 0
+    start = min(start, len(content) - width)
+    if start > 0:
+        # Start at a word boundary
+        space = content.find(' ', start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    end = min(len(content), start + width)
+    if end < len(content):
+        space = content.rfind(' ', start, end)
+        end = space if space > start + width // 2 else end
+    return f"{'…' if start > 0 else ''}{content[start:end]}{'…' if end < len(content) else ''}"
+
+
+def search_results(docs, search, snippet_width=160):
+    """(hits, next_cursor) from the documents returned by search_pipeline"""
+    next_cursor = None
+    if len(docs) > search['limit']:
+        docs = docs[:search['limit']]
+        next_cursor = encode_search_cursor(docs[-1])
+    terms = search_terms(search['text'])
+    hits = [{
+        'id': str(doc['_id']),
+        'created_at': doc['created_at'].isoformat(),
+        'mood': doc.get('mood_data') or None,
+        'score': round(doc['score'], 4),
+        'snippet': snippet(doc.get('content') or '', terms, snippet_width)
+    } for doc in docs]
+    return hits, next_cursor
@@ -0,0 +1,211 @@
+import re
+
+# Weighted keyword rules for the direct mood detectors. Each rule is a
+# word-bounded alternation; its score contribution is the number of
+# non-overlapping matches times the weight, exactly as re.findall counts them.
+MOTIVATION_PATTERNS = [
+    # Direct motivation words (weight: 0.4)
+    (r'\b(motivated|motivation|inspire|inspired|inspiration|determined|determination)\b', 0.4),
+    (r'\b(driven|ambitious|passionate|focused|dedicated|committed)\b', 0.4),
+
+    # Action-oriented phrases (weight: 0.3)
+    (r'\b(going to|plan to|aim to|striving to|working to|trying to)\b', 0.3),
+    (r'\b(achieve|accomplish|reach|attain|succeed|succeeding)\b', 0.3),
+
+    # Goal-related terms (weight: 0.3)
+    (r'\b(goal|target|objective|mission|purpose|vision)\b', 0.3),
+    (r'\b(dream|aspiration|ambition|drive|push|progress)\b', 0.3),
+
+    # Growth and improvement (weight: 0.2)
+    (r'\b(improve|grow|develop|progress|advance|better)\b', 0.2),
+    (r'\b(learning|growing|developing|improving|advancing)\b', 0.2),
+
+    # Positive mindset (weight: 0.2)
+    (r'\b(never give up|keep going|push through|stay strong)\b', 0.2),
+    (r'\b(believe|confidence|strength|courage|power)\b', 0.2)
+]
+
+LOVE_PATTERNS = [
+    # Relationship words
+    (r'\b(relationship|love|romance|dating|partner|boyfriend|girlfriend|spouse|husband|wife)\b', 0.2),
+    (r'\b(couple|marriage|wedding|engagement|proposal|anniversary)\b', 0.2),
+    (r'\b(crush|infatuation|attraction|chemistry|connection|bond)\b', 0.2),
+
+    # Love feelings
+    (r'\b(love|adore|cherish|care|date|affection|fondness|tenderness)\b', 0.2),
+    (r'\b(passion|desire|longing|yearning|devotion|commitment)\b', 0.2),
+    (r'\b(heart|soul|feelings|emotions|sentiment|attachment)\b', 0.2),
+
+    # Relationship actions
+    (r'\b(together|dating|seeing|meeting|talking|chatting|connecting)\b', 0.2),
+    (r'\b(share|care|support|trust|understand|respect|appreciate)\b', 0.2),
+    (r'\b(kiss|hug|hold|touch|embrace|caress|comfort)\b', 0.2),
+
+    # Relationship states
+    (r'\b(single|taken|committed|exclusive|serious|casual|complicated)\b', 0.2),
+    (r'\b(breakup|divorce|separation|reconciliation|reunion)\b', 0.2),
+
+    # Love expressions
+    (r'\b(miss you|love you|care about|think about|dream about)\b', 0.2),
+    (r'\b(special|important|meaningful|precious|valuable)\b', 0.2),
+    (r'\b(forever|always|never|forever|eternal|endless)\b', 0.2)
+]
+
+HEARTBREAK_PATTERNS = [
+    # Direct heartbreak words (weight: 0.4)
+    (r'\b(heartbreak|heartbroken|heartbreaking|broken heart|heart ache|emotional pain)\b', 0.4),
+    (r'\b(heart hurts|heart aching|heart pain|heart sore)\b', 0.4),
+
+    # Breakup related (weight: 0.3)
+    (r'\b(breakup|break up|broke up|breaking up|broken up)\b', 0.3),
+    (r'\b(separated|divorced|split|parted|ended)\b', 0.3),
+
+    # Emotional pain (weight: 0.2)
+    (r'\b(hurt|pain|ache|suffer|cry|tears|weep)\b', 0.2),
+    (r'\b(miss|longing|yearning|empty|void|alone)\b', 0.2),
+
+    # Rejection (weight: 0.3)
+    (r'\b(rejected|dumped|left|abandoned|betrayed)\b', 0.3),
+    (r'\b(unwanted|unloved|unappreciated|taken for granted)\b', 0.3),
+
+    # Healing (weight: 0.2)
+    (r'\b(moving on|getting over|healing|recovering|letting go)\b', 0.2),
+    (r'\b(accept|forgive|forget|move forward|start over)\b', 0.2)
+]
+
+CALM_PATTERNS = [
+    # Direct calm words (weight: 0.4)
+    (r'\b(calm|relaxed|peaceful|serene|tranquil|zen)\b', 0.4),
+    (r'\b(peace|quiet|still|gentle|soft|mellow)\b', 0.4),
+
+    # Relaxation activities (weight: 0.3)
+    (r'\b(meditate|meditation|yoga|breathing|breath|mindful)\b', 0.3),
+    (r'\b(rest|resting|relax|relaxing|unwind|unwinding)\b', 0.3),
+
+    # Nature-related calm (weight: 0.3)
+    (r'\b(nature|forest|ocean|waves|breeze|wind)\b', 0.3),
+    (r'\b(sunset|sunrise|stars|moon|night|dawn)\b', 0.3),
+
+    # Physical relaxation (weight: 0.2)
+    (r'\b(sleep|sleeping|nap|napping|rest|resting)\b', 0.2),
+    (r'\b(comfort|comfortable|cozy|warm|soft|gentle)\b', 0.2),
+
+    # Mental state (weight: 0.3)
+    (r'\b(clear|clear mind|focused|centered|balanced)\b', 0.3),
+    (r'\b(relief|relieved|ease|eased|soothe|soothed)\b', 0.3),
+
+    # Time-related calm (weight: 0.2)
+    (r'\b(morning|evening|night|dawn|dusk|twilight)\b', 0.2),
+    (r'\b(weekend|holiday|vacation|break|pause|moment)\b', 0.2)
+]
+
+# category -> (rules, whether a non-zero score is boosted by 1.5x)
+LEXICON_CATEGORIES = {
+    'motivation': (MOTIVATION_PATTERNS, True),
+    'love': (LOVE_PATTERNS, False),
+    'heartbreak': (HEARTBREAK_PATTERNS, True),
+    'calm': (CALM_PATTERNS, True)
+}
+
+_RULE_RE = re.compile(r'^\\b\((.*)\)\\b$')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _parse_alternatives(pattern):
+    """Split a ``\\b(a|b c)\\b`` rule into its alternatives as word tuples"""
+    match = _RULE_RE.match(pattern)
+    if not match:
+        raise ValueError(f'Unsupported lexicon pattern: {pattern}')
+    alternatives = []
+    for alternative in match.group(1).split('|'):
+        words = tuple(alternative.split(' '))
+        if not all(_TOKEN_RE.fullmatch(word) for word in words):
+            raise ValueError(f'Unsupported lexicon alternative: {alternative!r}')
+        alternatives.append(words)
+    return alternatives
+
+
+class LexiconEngine:
+    """Score every lexicon category in a single pass over the text.
+
+    The text is lowercased and tokenized once. Because every rule is a
+    word-bounded alternation of words separated by single spaces, a regex
+    match can only start on a token, so each token is looked up once in an
+    index of the rules whose alternatives start with that word. Per-rule
+    resume positions reproduce re.findall's non-overlapping counting and
+    alternatives are tried in their original order, so the scores are the
+    same as running every pattern separately.
+    """
+
+    def __init__(self, categories=LEXICON_CATEGORIES):
+        self._categories = []
+        self._rule_weights = []
+        self._index = {}
+        for name, (rules, boost) in categories.items():
+            rule_ids = []
+            for pattern, weight in rules:
+                rule_id = len(self._rule_weights)
+                self._rule_weights.append(weight)
+                rule_ids.append(rule_id)
+
+                by_first_word = {}
+                for words in _parse_alternatives(pattern):
+                    by_first_word.setdefault(words[0], []).append(words)
+                for first_word, alternatives in by_first_word.items():
+                    self._index.setdefault(first_word, []).append((rule_id, tuple(alternatives)))
+            self._categories.append((name, rule_ids, boost))
+
+    def score(self, text):
+        """Return the weighted score of every category for text"""
+        text_lower = text.lower()
+        tokens = [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text_lower)]
+        token_count = len(tokens)
+        counts = [0] * len(self._rule_weights)
+        resume = [0] * len(self._rule_weights)
+
+        for i, (word, _, _) in enumerate(tokens):
+            candidates = self._index.get(word)
+            if candidates is None:
+                continue
+            for rule_id, alternatives in candidates:
+                if i < resume[rule_id]:
+                    continue
+                for words in alternatives:
+                    length = len(words)
+                    if length > 1 and not self._phrase_matches(tokens, token_count, text_lower, i, words):
+                        continue
+                    counts[rule_id] += 1
+                    resume[rule_id] = i + length
+                    break
+
+        scores = {}
+        for name, rule_ids, boost in self._categories:
+            score = 0
+            for rule_id in rule_ids:
+                if counts[rule_id]:
+                    score += counts[rule_id] * self._rule_weights[rule_id]
+            if boost and score > 0:
+                score *= 1.5
+            scores[name] = score
+        return scores
+
+    @staticmethod
+    def _phrase_matches(tokens, token_count, text_lower, i, words):
+        if i + len(words) > token_count:
+            return False
+        previous_end = tokens[i][2]
+        for offset in range(1, len(words)):
+            word, start, end = tokens[i + offset]
+            # Phrase words are separated by exactly one space in every rule
+            if word != words[offset] or start != previous_end + 1 or text_lower[previous_end] != ' ':
+                return False
+            previous_end = end
+        return True
+
+
+lexicon_engine = LexiconEngine()
+
+
+def score_lexicon(text):
+    """Score motivation, love, heartbreak and calm for text in one pass"""
+    return lexicon_engine.score(text)
@@ -0,0 +1,172 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+# Verbose request/response bodies go to this logger; configure_logging samples it
+payload_logger = logging.getLogger('moodtunes.payload')
+
+# Whether the current request's payloads are logged, decided once per request
+# by sample_payloads(); None outside of requests
+_payload_sampled = contextvars.ContextVar('payload_sampled', default=None)
+_payload_sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through the records of sampled requests; runs in the caller before anything is formatted.
+
+    Records logged outside of a request are sampled one by one at rate.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        sampled = _payload_sampled.get()
+        if sampled is None:
+            return self.rate >= 1 or random.random() < self.rate
+        return sampled
+
+
+def sample_payloads():
+    """Decide whether all payloads of the current request are logged; call once per request"""
+    rate = _payload_sample_rate
+    _payload_sampled.set(rate > 0 and (rate >= 1 or random.random() < rate))
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records without formatting them and never block the caller.
+
+    The stock QueueHandler formats every message in the logging thread so the
+    record can be pickled; records here stay in-process, so the message and its
+    arguments are only formatted by the listener thread. Arguments must not be
+    mutated after they are logged. When the queue is full the record is dropped
+    and counted instead of stalling the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Tracebacks must be captured before the frames go away
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging:
+    """Root logging through a bounded queue drained by a background listener thread"""
+
+    def __init__(self, handler, queue_size=10000):
+        self.handler = handler
+        self.queue_size = queue_size
+        self.queue_handler = None
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            log_queue = queue.Queue(self.queue_size)
+            if self.queue_handler is None:
+                self.queue_handler = DeferredQueueHandler(log_queue)
+            else:
+                self.queue_handler.queue = log_queue
+            self.listener = logging.handlers.QueueListener(log_queue, self.handler, respect_handler_level=True)
+            self.listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def after_fork(self):
+        # The listener thread does not survive fork, and the inherited queue's
+        # lock may have been held by another thread at fork time
+        self.listener = None
+        self._lock = threading.Lock()
+        self.start()
+
+    def stats(self):
+        return {
+            'queued': self.queue_handler.queue.qsize() if self.queue_handler else 0,
+            'dropped': self.queue_handler.dropped if self.queue_handler else 0,
+            'queue_size': self.queue_size
+        }
+
+
+_async_logging = None
+
+
+def configure_logging(level='INFO', fmt='text', queue_size=10000, payload_sample_rate=0, stream=None):
+    """Route all logging through a background thread; safe to call repeatedly.
+
+    payload_logger records are logged at DEBUG, so they are only written when
+    level is DEBUG, and then only for a payload_sample_rate fraction of
+    requests (see sample_payloads).
+    """
+    global _async_logging, _payload_sample_rate
+    if _async_logging is not None:
+        return _async_logging
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    _async_logging = AsyncLogging(handler, queue_size=queue_size)
+    _async_logging.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_async_logging.queue_handler)
+    root.setLevel(level)
+
+    # Inherits the root level, so LOG_LEVEL=INFO keeps payloads out of the logs
+    payload_logger.setLevel(logging.NOTSET if payload_sample_rate > 0 else logging.CRITICAL + 1)
+    payload_logger.addFilter(SamplingFilter(payload_sample_rate))
+    _payload_sample_rate = payload_sample_rate
+
+    atexit.register(_async_logging.stop)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_async_logging.after_fork)
+    return _async_logging
+
+
+def logging_stats():
+    return _async_logging.stats() if _async_logging is not None else None
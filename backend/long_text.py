@@ -0,0 +1,88 @@
+import re
+
+import numpy as np
+
+# Sentence ends (followed by whitespace) and line breaks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|\s*\n\s*')
+
+POOLING_METHODS = ('max', 'mean', 'length')
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def token_counts(tokenizer, texts):
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']]
+
+
+def evenly_spaced(count, limit):
+    """limit indices spread evenly over range(count), always keeping the first and last.
+
+    Used to cap the windows of very long entries while still covering all of it.
+    """
+    if limit <= 1:
+        return [0]
+    return sorted({round(k * (count - 1) / (limit - 1)) for k in range(limit)})
+
+
+def build_windows(text, tokenizer, window_tokens):
+    """Split text into sentence-aligned windows of at most window_tokens tokens.
+
+    Sentences are packed greedily; a sentence longer than a window is split
+    between words. Counts are per sentence, so a window can be a few tokens
+    off after joining; the pipeline still truncates as a safety net.
+    Returns [(window_text, token_count), ...].
+    """
+    sentences = split_sentences(text)
+    units = []
+    for sentence, count in zip(sentences, token_counts(tokenizer, sentences)):
+        if count <= window_tokens:
+            units.append((sentence, count))
+        else:
+            words = sentence.split()
+            units.extend(zip(words, token_counts(tokenizer, words)))
+
+    windows = []
+    current, current_tokens = [], 0
+    for unit, count in units:
+        if current and current_tokens + count > window_tokens:
+            windows.append((' '.join(current), current_tokens))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += count
+    if current:
+        windows.append((' '.join(current), current_tokens))
+
+    return windows or [(text, 0)]
+
+
+def pool_window_scores(window_results, weights, pooling='length'):
+    """Combine the per-label scores of an entry's windows into one result.
+
+    max keeps each label's strongest window, mean averages the windows, and
+    length averages them weighted by their token counts.
+    """
+    if len(window_results) == 1:
+        return window_results[0]
+    labels = [result['label'] for result in window_results[0]]
+    scores = np.array([[result['score'] for result in window] for window in window_results])
+    if pooling == 'max':
+        pooled = scores.max(axis=0)
+    elif pooling == 'mean':
+        pooled = scores.mean(axis=0)
+    elif pooling == 'length':
+        pooled = np.average(scores, axis=0, weights=np.maximum(np.asarray(weights, dtype=np.float64), 1))
+    else:
+        raise ValueError(f"Unknown pooling '{pooling}', expected one of: {', '.join(POOLING_METHODS)}")
+    return [{'label': label, 'score': float(score)} for label, score in zip(labels, pooled)]
+
+
+def pool_window_embeddings(embeddings, weights):
+    """Token-weighted mean of an entry's window embeddings, L2-normalized"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    pooled = np.average(embeddings, axis=0, weights=np.maximum(np.asarray(weights, dtype=np.float64), 1))
+    norm = np.linalg.norm(pooled)
+    return (pooled / norm if norm else pooled).astype(np.float32)
@@ -0,0 +1,208 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from a callback when metrics are rendered"""
+
+    def __init__(self, name, documentation, callback, metric_type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.type = metric_type
+
+    def samples(self):
+        yield f'{self.name} {_format_value(self.callback())}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self.register(CallbackMetric(name, documentation, callback))
+
+    def callback_counter(self, name, documentation, callback):
+        """A counter maintained elsewhere, e.g. in a component's stats()"""
+        return self.register(CallbackMetric(name, documentation, callback, metric_type='counter'))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # A failing gauge callback must not break the whole scrape
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics live in the memory of the process that serves /metrics; with several
+# worker processes each one reports its own series
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    'moodtunes_http_request_duration_seconds',
+    'Time to produce an HTTP response, by route and status',
+    ('method', 'route', 'status')
+)
+ANALYSIS_SPAN_DURATION = registry.histogram(
+    'moodtunes_analysis_span_duration_seconds',
+    'Time spent in each stage of mood analysis',
+    ('span',),
+    buckets=FAST_BUCKETS
+)
+MONGO_COMMAND_DURATION = registry.histogram(
+    'moodtunes_mongo_command_duration_seconds',
+    'MongoDB command round-trip time, by command and outcome',
+    ('command', 'outcome'),
+    buckets=FAST_BUCKETS
+)
+
+
+def span(name):
+    """Time a stage of mood analysis: ``with span('inference'): ...``"""
+    return ANALYSIS_SPAN_DURATION.time(name)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts and times every command the driver sends, using the driver's own durations"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, 'success')
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, 'failure')
+
+
+_listener_installed = False
+
+
+def install_mongo_listener():
+    """Register the command listener; only clients created afterwards report to it"""
+    global _listener_installed
+    if not _listener_installed:
+        monitoring.register(MongoCommandListener())
+        _listener_installed = True
+
+
+def init_app(app):
+    """Record the duration of every request, labelled with its route pattern"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request_duration(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            # The route pattern, not the URL, keeps the number of series bounded;
+            # streamed bodies are timed until the response object is returned
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_DURATION.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+        return response
@@ -0,0 +1,52 @@
+"""The emotion model as configured, shared by app.py and the offline scripts.
+
+rescore_entries.py and inference_service.py build the same model, and key
+their results on the same versions, without importing the Flask app.
+"""
+from config import Config
+
+# Bump whenever the lexicon detectors or the grouping rules change, so cached
+# mood responses computed under the old rules are no longer served
+MOOD_RULESET_VERSION = '1'
+
+
+def emotion_model_options():
+    """EmotionModel keyword arguments for the configured model and long-text handling"""
+    return {
+        'model_name': Config.EMOTION_MODEL_NAME,
+        'backend': Config.INFERENCE_BACKEND,
+        'backend_options': {'onnx_model_dir': Config.ONNX_MODEL_DIR},
+        'long_text_mode': Config.LONG_TEXT_MODE,
+        'window_tokens': Config.LONG_TEXT_WINDOW_TOKENS or None,
+        'max_windows': Config.LONG_TEXT_MAX_WINDOWS,
+        'pooling': Config.LONG_TEXT_POOLING,
+        'embeddings': Config.EMBEDDINGS_ENABLED
+    }
+
+
+def create_emotion_model():
+    """The web app's emotion model for INFERENCE_MODE, not loaded yet"""
+    from inference_service import InferenceClient, parse_address, service_authkey
+    from mood_analyzer import EmotionModel
+
+    if Config.INFERENCE_MODE == 'pool':
+        # The inference processes belong to the host's inference service, shared
+        # by all web processes (see inference_service.py)
+        address = parse_address(Config.INFERENCE_SERVICE_ADDRESS)
+        return InferenceClient(
+            emotion_model_options(),
+            address,
+            service_authkey(address, Config.INFERENCE_SERVICE_AUTHKEY, Config.SECRET_KEY),
+            timeout=Config.INFERENCE_TIMEOUT,
+            status_timeout=Config.INFERENCE_SERVICE_STATUS_TIMEOUT,
+            max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+            autostart=Config.INFERENCE_SERVICE_START
+        )
+    if Config.INFERENCE_MODE == 'inline':
+        return EmotionModel(
+            **emotion_model_options(),
+            max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+            window_ms=Config.INFERENCE_BATCH_WINDOW_MS,
+            timeout=Config.INFERENCE_TIMEOUT
+        )
+    raise ValueError(f"Unknown INFERENCE_MODE '{Config.INFERENCE_MODE}', expected 'inline' or 'pool'")
@@ -1,32 +1,76 @@
 from flask_mongoengine import MongoEngine
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import password_hasher
 import json
 
 db = MongoEngine()
 
+def create_db_app():
+    """A Flask app holding only the MongoDB connection, for scripts that use these models without app.py"""
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    return app
+
+def mongo_now():
+    """Current local time truncated to MongoDB's millisecond precision"""
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond - now.microsecond % 1000)
+
 class User(db.Document):
     username = db.StringField(max_length=80, unique=True, required=True)
     email = db.StringField(max_length=120, unique=True, required=True)
     password_hash = db.StringField(max_length=256, required=True)
     created_at = db.DateTimeField(default=datetime.utcnow)
+    # Set when existing journal entries are modified in place (e.g. re-scored);
+    # part of the export cache key
+    journal_modified_at = db.DateTimeField()
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check_password(self.password_hash, password)
+
+    def upgrade_password_hash(self, password):
+        """After a successful login, rehash in the background if the hash settings changed"""
+        if not password_hasher.needs_rehash(self.password_hash):
+            return
+        old_hash = self.password_hash
+
+        def save(new_hash):
+            # Only replace the hash the password was checked against
+            User.objects(id=self.id, password_hash=old_hash).update_one(set__password_hash=new_hash)
+
+        password_hasher.rehash_later(password, save)
 
 class JournalEntry(db.Document):
     content = db.StringField(required=True)
     created_at = db.DateTimeField(default=datetime.now)
     user_id = db.ReferenceField('User', required=True)
     mood_data = db.DictField()
+    # Normalized float16 sentence embedding (see embedding_index.py) and the
+    # model version that produced it
+    embedding = db.BinaryField()
+    embedding_version = db.StringField()
     meta = {
         'collection': 'journal_entries',
+        # Indexes are built explicitly by indexes.ensure_indexes()
+        'auto_create_index': False,
         'indexes': [
-            'user_id',
-            'created_at'
+            # Serves every per-user, newest-first read without a SORT stage;
+            # _id breaks created_at ties for cursor pagination
+            {'fields': ['user_id', '-created_at', '-id'], 'name': 'user_id_created_at'},
+            # Full-text search; the user_id prefix keeps each search within one
+            # user's entries, so $text queries must match user_id exactly
+            {
+                'fields': ['user_id', '$content'],
+                'name': 'user_id_content_text',
+                'default_language': 'english'
+            }
         ]
     }
     
@@ -82,6 +126,11 @@ class JournalEntry(db.Document):
         """Get mood data"""
         return self.mood_data if self.mood_data else None
 
+    def set_embedding(self, data, version):
+        """Set the stored embedding bytes and the embedding version they belong to"""
+        self.embedding = data
+        self.embedding_version = version
+
 class MusicFeedback(db.Document):
     user_id = db.ReferenceField('User', required=True)
     playlist_id = db.StringField(required=True)
@@ -90,8 +139,75 @@ class MusicFeedback(db.Document):
     created_at = db.DateTimeField(default=datetime.now)
     meta = {
         'collection': 'music_feedback',
+        'auto_create_index': False,
         'indexes': [
-            'user_id',
-            'created_at'
+            {'fields': ['user_id', '-created_at', '-id'], 'name': 'user_id_created_at'}
         ]
-    }
\ No newline at end of file
+    }
+
+class MoodCacheEntry(db.Document):
+    key = db.StringField(required=True, unique=True)
+    response = db.DictField(required=True)
+    expires_at = db.DateTimeField(required=True)
+    meta = {
+        'collection': 'mood_cache',
+        # Indexes are built explicitly by indexes.ensure_indexes()
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+class MoodRollup(db.Document):
+    user_id = db.ReferenceField('User', required=True)
+    granularity = db.StringField(required=True, choices=('day', 'week', 'month'))
+    bucket = db.DateTimeField(required=True)
+    entries = db.IntField(default=0)
+    mood_entries = db.IntField(default=0)
+    confidence_sum = db.FloatField(default=0)
+    moods = db.DictField()
+    emotions = db.DictField()
+    updated_at = db.DateTimeField()
+    meta = {
+        'collection': 'mood_rollups',
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['user_id', 'granularity', 'bucket'], 'unique': True, 'name': 'user_id_granularity_bucket'}
+        ]
+    }
+
+class ExportJob(db.Document):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+    user_id = db.ReferenceField('User', required=True)
+    artifact_key = db.StringField(required=True)
+    params = db.DictField()
+    status = db.StringField(required=True, choices=(QUEUED, RUNNING, DONE, FAILED), default=QUEUED)
+    cached = db.BooleanField(default=False)
+    file_size = db.IntField()
+    error = db.StringField()
+    created_at = db.DateTimeField(default=datetime.utcnow)
+    started_at = db.DateTimeField()
+    finished_at = db.DateTimeField()
+    meta = {
+        'collection': 'export_jobs',
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['user_id', 'artifact_key', '-created_at'], 'name': 'user_id_artifact_key'},
+            # Job records are only needed while the client polls for them
+            {'fields': ['created_at'], 'expireAfterSeconds': 86400, 'name': 'created_at_ttl'}
+        ]
+    }
+
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': str(self.id),
+            'status': self.status,
+            'cached': self.cached,
+            'params': self.params,
+            'size': self.file_size,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
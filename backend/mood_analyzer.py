@@ -0,0 +1,340 @@
+import copy
+import logging
+import os
+import threading
+import time
+
+from batching import MicroBatcher, check_texts
+from long_text import POOLING_METHODS, build_windows, evenly_spaced, pool_window_embeddings, pool_window_scores
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReadyError(Exception):
+    """Raised when the emotion model is still loading or failed to load"""
+
+    def __init__(self, message, state):
+        super().__init__(message)
+        self.state = state
+
+
+def _load_pytorch(model_name, options):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    return model, tokenizer
+
+
+def _load_pytorch_int8(model_name, options):
+    import torch
+
+    model, tokenizer = _load_pytorch(model_name, options)
+    # Dynamic quantization: Linear weights are stored as INT8, activations are
+    # quantized on the fly, so no calibration data is needed
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer
+
+
+def _load_onnx(model_name, options):
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError:
+        raise RuntimeError(
+            "The onnx inference backend requires optimum with ONNX Runtime: "
+            "pip install 'optimum[onnxruntime]'"
+        )
+    from transformers import AutoTokenizer
+
+    export_dir = options.get('onnx_model_dir')
+    if export_dir and os.path.isdir(export_dir) and os.listdir(export_dir):
+        model = ORTModelForSequenceClassification.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        # Export the PyTorch checkpoint to ONNX once and reuse it on later starts
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if export_dir:
+            model.save_pretrained(export_dir)
+            tokenizer.save_pretrained(export_dir)
+    return model, tokenizer
+
+
+# Selectable through Config.INFERENCE_BACKEND
+INFERENCE_BACKENDS = {
+    'pytorch': _load_pytorch,
+    'pytorch-int8': _load_pytorch_int8,
+    'onnx': _load_onnx
+}
+
+# Backends whose models can return their hidden states
+EMBEDDING_BACKENDS = ('pytorch', 'pytorch-int8')
+
+
+def _embedding_pipeline_class():
+    """Text classification pipeline that also returns a sentence embedding per text.
+
+    The embedding is the attention-masked mean of the last hidden layer, taken
+    from the same forward pass as the scores. Defined on first use so that
+    importing this module does not import transformers.
+    """
+    from transformers import TextClassificationPipeline
+
+    class EmbeddingTextClassificationPipeline(TextClassificationPipeline):
+        def _forward(self, model_inputs):
+            outputs = self.model(**model_inputs, output_hidden_states=True)
+            hidden = outputs.hidden_states[-1]
+            mask = model_inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            embedding = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            return {'logits': outputs.logits, 'embedding': embedding}
+
+        def postprocess(self, model_outputs, **kwargs):
+            return {
+                'scores': super().postprocess(model_outputs, **kwargs),
+                'embedding': model_outputs['embedding'][0].float().numpy()
+            }
+
+    return EmbeddingTextClassificationPipeline
+
+
+class EmotionModel:
+    """Emotion classifier that loads in a background thread.
+
+    Importing this module (and app.py) does not touch transformers or the model
+    weights; call ``start_loading`` to begin loading in the background, or
+    ``load`` to block until the model is ready. Inference requests go through
+    a MicroBatcher once the pipeline is available.
+
+    With long_text_mode='windows', texts longer than one model window are
+    split into sentence-aligned windows (at most max_windows), all windows of
+    a text are sent to the model together, and their scores are pooled.
+    With 'truncate' the model only sees the first window.
+
+    With embeddings=True every forward pass also yields a pooled sentence
+    embedding of each text (see analyze_many_with_embeddings); analyze and
+    analyze_many return the scores alone either way.
+    """
+
+    NOT_STARTED = 'not_started'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    LONG_TEXT_MODES = ('truncate', 'windows')
+
+    def __init__(self, model_name, backend='pytorch', backend_options=None,
+                 max_batch_size=16, window_ms=10.0, timeout=30.0,
+                 long_text_mode='truncate', window_tokens=None, max_windows=8, pooling='length',
+                 embeddings=False):
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of: {', '.join(INFERENCE_BACKENDS)}")
+        if long_text_mode not in self.LONG_TEXT_MODES:
+            raise ValueError(f"Unknown long text mode '{long_text_mode}', expected one of: {', '.join(self.LONG_TEXT_MODES)}")
+        if pooling not in POOLING_METHODS:
+            raise ValueError(f"Unknown pooling '{pooling}', expected one of: {', '.join(POOLING_METHODS)}")
+        if embeddings and backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Embeddings need one of the {', '.join(EMBEDDING_BACKENDS)} inference backends, not '{backend}'")
+        self.model_name = model_name
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.state = self.NOT_STARTED
+        self.error = None
+        self.load_seconds = None
+        self.pipeline = None
+        self.long_text_mode = long_text_mode
+        self.window_tokens = window_tokens
+        self._window_tokens_option = window_tokens
+        self.max_windows = max_windows
+        self.pooling = pooling
+        self.embeddings = embeddings
+        self.long_text_stats = {'windowed_texts': 0, 'windows': 0, 'capped_texts': 0}
+        # The pipeline's tokenizer is used by the batcher thread; request threads
+        # split texts with their own copy, one at a time
+        self._window_tokenizer = None
+        self._window_lock = threading.Lock()
+        self.batcher = MicroBatcher(
+            self._infer,
+            max_batch_size=max_batch_size,
+            window_ms=window_ms,
+            timeout=timeout
+        )
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start_loading(self):
+        """Begin loading the model in a daemon thread; safe to call repeatedly"""
+        with self._lock:
+            if self.state != self.NOT_STARTED:
+                return
+            self.state = self.LOADING
+            self._thread = threading.Thread(target=self._load, name='emotion-model-loader', daemon=True)
+            self._thread.start()
+
+    def load(self):
+        """Load the model in the calling thread and wait until it is ready"""
+        with self._lock:
+            if self.state == self.NOT_STARTED:
+                self.state = self.LOADING
+                load_here = True
+            else:
+                load_here = False
+        if load_here:
+            self._load()
+        self._ready.wait()
+        if self.state != self.READY:
+            raise ModelNotReadyError(f'Emotion model failed to load: {self.error}', self.state)
+
+    def _load(self):
+        started = time.perf_counter()
+        logger.info("Initializing emotion analyzer (%s, %s backend)...", self.model_name, self.backend)
+        try:
+            # Imported here so that non-ML code paths never pay for transformers
+            from transformers import pipeline
+
+            # Initialize tokenizer and model separately for better error handling
+            model, tokenizer = INFERENCE_BACKENDS[self.backend](self.model_name, self.backend_options)
+
+            self.pipeline = pipeline(
+                "text-classification",
+                model=model,
+                tokenizer=tokenizer,
+                return_all_scores=True,
+                device=-1,  # Use CPU by default
+                **({'pipeline_class': _embedding_pipeline_class()} if self.embeddings else {})
+            )
+            if self.long_text_mode == 'windows':
+                self._window_tokenizer = copy.deepcopy(tokenizer)
+                if not self.window_tokens:
+                    # RoBERTa: 512 positions minus <s> and </s>
+                    self.window_tokens = min(tokenizer.model_max_length, 512) - tokenizer.num_special_tokens_to_add()
+            self.load_seconds = round(time.perf_counter() - started, 2)
+            self.state = self.READY
+            logger.info("Emotion analyzer initialized successfully in %ss", self.load_seconds)
+        except Exception as e:
+            self.error = str(e)
+            self.state = self.FAILED
+            logger.error("Error initializing emotion analyzer: %s", e)
+        finally:
+            self._ready.set()
+
+    def wait_until_ready(self, timeout=None):
+        """Start loading if needed and wait up to timeout seconds for the model"""
+        self.start_loading()
+        self._ready.wait(timeout)
+        return self.state == self.READY
+
+    @property
+    def version(self):
+        """Identifies the scores this model produces, e.g. for cache keys"""
+        version = f"{self.model_name}@{self.backend}"
+        if self.long_text_mode == 'windows':
+            version += f"+windows:{self._window_tokens_option or 'auto'}:{self.max_windows}:{self.pooling}"
+        return version
+
+    @property
+    def embedding_version(self):
+        """Identifies the embedding space; vectors of different versions are not comparable"""
+        return f"{self.version}+embedding:mean" if self.embeddings else None
+
+    def is_ready(self):
+        return self.state == self.READY
+
+    def _infer(self, texts):
+        # Concurrent requests are collected and run through the model as one padded batch
+        return self.pipeline(texts, batch_size=len(texts), truncation=True)
+
+    def _require_ready(self, wait_timeout):
+        if not self.wait_until_ready(wait_timeout):
+            if self.state == self.FAILED:
+                raise ModelNotReadyError(f'Emotion model failed to load: {self.error}', self.state)
+            raise ModelNotReadyError('Emotion model is warming up', self.state)
+
+    def windows(self, text):
+        """Sentence-aligned [(window_text, token_count)] for text; one window when it fits"""
+        # Byte-level BPE never produces more tokens than UTF-8 bytes
+        if self.long_text_mode != 'windows' or len(text.encode('utf-8')) <= self.window_tokens:
+            return [(text, 0)]
+        with self._window_lock:
+            windows = build_windows(text, self._window_tokenizer, self.window_tokens)
+            if len(windows) > 1:
+                self.long_text_stats['windowed_texts'] += 1
+                if self.max_windows and len(windows) > self.max_windows:
+                    self.long_text_stats['capped_texts'] += 1
+                    # Bound the cost of very long entries
+                    windows = [windows[i] for i in evenly_spaced(len(windows), self.max_windows)]
+                self.long_text_stats['windows'] += len(windows)
+        return windows
+
+    def _score(self, texts):
+        # Allow the usual per-request timeout for every batch the texts are split into
+        batches = -(-len(texts) // self.batcher.max_batch_size)
+        return self.batcher.analyze_many(texts, timeout=self.batcher.timeout * max(1, batches))
+
+    def analyze(self, text, wait_timeout=0):
+        """Return the per-label scores for text, waiting up to wait_timeout for the model"""
+        return self.analyze_many([text], wait_timeout)[0]
+
+    def analyze_many(self, texts, wait_timeout=0):
+        """Return the per-label scores for each text, queued to the model together"""
+        results = self.score_many(texts, wait_timeout)
+        return [result['scores'] for result in results] if self.embeddings else results
+
+    def analyze_many_with_embeddings(self, texts, wait_timeout=0):
+        """Return (per-label scores, normalized float32 embedding) for each text"""
+        if not self.embeddings:
+            raise ValueError('The emotion model was not loaded with embeddings')
+        return [(result['scores'], result['embedding']) for result in self.score_many(texts, wait_timeout)]
+
+    def _pool(self, window_results, weights):
+        if not self.embeddings:
+            return pool_window_scores(window_results, weights, self.pooling)
+        return {
+            'scores': pool_window_scores([result['scores'] for result in window_results], weights, self.pooling),
+            'embedding': pool_window_embeddings([result['embedding'] for result in window_results], weights)
+        }
+
+    def score_many(self, texts, wait_timeout=0):
+        """Model output per text: label scores, or {'scores', 'embedding'} with embeddings enabled"""
+        check_texts(texts)
+        self._require_ready(wait_timeout)
+        if self.long_text_mode != 'windows':
+            return [self._pool([result], [1]) for result in self._score(texts)]
+
+        # Every window of every text goes to the batcher at once, then each
+        # text's window scores are pooled back into one result
+        spans = []
+        window_texts = []
+        weights = []
+        for text in texts:
+            windows = self.windows(text)
+            spans.append((len(window_texts), len(window_texts) + len(windows)))
+            window_texts.extend(window for window, _ in windows)
+            weights.extend(tokens for _, tokens in windows)
+        results = self._score(window_texts)
+        return [self._pool(results[start:end], weights[start:end]) for start, end in spans]
+
+    def queue_depth(self):
+        return self.batcher.queue_depth()
+
+    def inference_stats(self):
+        return self.batcher.stats()
+
+    def status(self):
+        return {
+            'model': self.model_name,
+            'backend': self.backend,
+            'state': self.state,
+            'ready': self.state == self.READY,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+            'embeddings': self.embeddings,
+            'long_text': {
+                'mode': self.long_text_mode,
+                'window_tokens': self.window_tokens,
+                'max_windows': self.max_windows,
+                'pooling': self.pooling,
+                **self.long_text_stats
+            }
+        }
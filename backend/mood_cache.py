@@ -0,0 +1,133 @@
+import copy
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from models import MoodCacheEntry
+
+
+def normalize_text(text):
+    """Normalize text so trivially different submissions share a cache entry; only used for keys"""
+    if not isinstance(text, str):
+        raise TypeError(f'Text must be a string, got {type(text).__name__}')
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.split())
+
+
+def make_cache_key(normalized_text, model_version, ruleset_version):
+    """Content-addressed key for a normalized text under a model/ruleset version"""
+    digest = hashlib.sha256()
+    for part in (model_version, ruleset_version, normalized_text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class MongoCacheBackend:
+    """Shared cache backend so every gunicorn worker can reuse the same results"""
+
+    def get(self, key):
+        entry = MoodCacheEntry.objects(key=key, expires_at__gt=datetime.utcnow()).only('response').first()
+        return entry.response if entry else None
+
+    def set(self, key, value, ttl):
+        MoodCacheEntry.objects(key=key).update_one(
+            upsert=True,
+            set__response=value,
+            set__expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        )
+
+
+CACHE_BACKENDS = {
+    'mongo': MongoCacheBackend
+}
+
+
+class MoodResultCache:
+    """Bounded in-process LRU with TTL, optionally backed by a shared store.
+
+    Lookups hit the local LRU first, then the shared backend; shared hits are
+    copied into the local LRU. Values are deep-copied on the way in and out so
+    callers can safely modify the returned response.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, backend=None):
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backend_errors = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception:
+                value = None
+                with self._lock:
+                    self.backend_errors += 1
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        value = copy.deepcopy(value)
+        self._store_local(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, self.ttl)
+            except Exception:
+                with self._lock:
+                    self.backend_errors += 1
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'backend': type(self.backend).__name__ if self.backend is not None else None,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'backend_errors': self.backend_errors,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,152 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+HASH_METHODS = ('pbkdf2', 'bcrypt')
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when the hashing pool is full or does not answer in time"""
+
+
+def _is_bcrypt(password_hash):
+    return password_hash.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+class PasswordHasher:
+    """Password hashing with a configurable method and cost, run on a bounded thread pool.
+
+    pbkdf2 hashes use werkzeug's format ("pbkdf2:sha256:<iterations>$salt$hash"),
+    so hashes stored before this existed still verify; bcrypt hashes use the
+    standard "$2b$<rounds>$..." format. Both hashlib's PBKDF2 and bcrypt release
+    the GIL, so hashing on the pool leaves the request threads free while at
+    most `workers` cores are spent on it. At most queue_size hashes wait for a
+    worker; beyond that, or after timeout seconds, PasswordHasherBusyError is
+    raised instead of piling up requests.
+    """
+
+    def __init__(self, method='pbkdf2', pbkdf2_iterations=260000, bcrypt_rounds=12,
+                 workers=2, queue_size=64, timeout=10.0):
+        if method not in HASH_METHODS:
+            raise ValueError(f"Unknown password hash method '{method}', expected one of: {', '.join(HASH_METHODS)}")
+        self.method = method
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.bcrypt_rounds = bcrypt_rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self._stats_lock = threading.Lock()
+        self._stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0, 'timed_out': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def hash(self, password):
+        """Hash password with the configured method, in the calling thread"""
+        if self.method == 'bcrypt':
+            import bcrypt
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.bcrypt_rounds)).decode('ascii')
+        return generate_password_hash(password, method=f'pbkdf2:sha256:{self.pbkdf2_iterations}', salt_length=16)
+
+    def verify(self, password_hash, password):
+        """Check password against a stored hash of any supported method, in the calling thread"""
+        if not password_hash:
+            return False
+        if _is_bcrypt(password_hash):
+            import bcrypt
+            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+        return check_password_hash(password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether password_hash was made with another method or cost than the configured one"""
+        if _is_bcrypt(password_hash):
+            return self.method != 'bcrypt' or int(password_hash.split('$')[2]) != self.bcrypt_rounds
+        if self.method != 'pbkdf2':
+            return True
+        # "pbkdf2:sha256:260000$salt$hash"; older hashes may omit the iterations
+        params = password_hash.split('$', 1)[0].split(':')
+        return len(params) != 3 or params[1] != 'sha256' or params[2] != str(self.pbkdf2_iterations)
+
+    def submit(self, fn, *args):
+        """Queue fn on the pool; raises PasswordHasherBusyError when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PasswordHasherBusyError('Too many password hashes queued')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        future = self.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            self._count('timed_out')
+            raise PasswordHasherBusyError('Timed out waiting for the password hasher')
+
+    def hash_password(self, password):
+        """hash() on the pool"""
+        password_hash = self._run(self.hash, password)
+        self._count('hashed')
+        return password_hash
+
+    def check_password(self, password_hash, password):
+        """verify() on the pool"""
+        matches = self._run(self.verify, password_hash, password)
+        self._count('verified')
+        return matches
+
+    def rehash_later(self, password, save):
+        """Hash password with the current settings on the pool and pass the hash to save.
+
+        Used after a successful login; skipped when the pool is busy, since the
+        next login tries again.
+        """
+        def rehash():
+            save(self.hash(password))
+            self._count('rehashed')
+
+        def log_failure(future):
+            if future.exception() is not None:
+                logger.error("Password rehash failed: %s", future.exception())
+
+        try:
+            self.submit(rehash).add_done_callback(log_failure)
+        except PasswordHasherBusyError:
+            pass
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['config'] = {
+            'method': self.method,
+            'pbkdf2_iterations': self.pbkdf2_iterations,
+            'bcrypt_rounds': self.bcrypt_rounds,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'timeout': self.timeout
+        }
+        return stats
+
+
+password_hasher = PasswordHasher(
+    method=Config.PASSWORD_HASH_METHOD,
+    pbkdf2_iterations=Config.PASSWORD_PBKDF2_ITERATIONS,
+    bcrypt_rounds=Config.PASSWORD_BCRYPT_ROUNDS,
+    workers=Config.PASSWORD_HASH_WORKERS,
+    queue_size=Config.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=Config.PASSWORD_HASH_TIMEOUT
+)
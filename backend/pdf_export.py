@@ -0,0 +1,298 @@
+import itertools
+import os
+import re
+import tempfile
+from array import array
+from contextlib import ExitStack
+from datetime import timedelta
+from xml.sax.saxutils import escape
+
+from dateutil import parser
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+from models import JournalEntry
+
+# Journal fields needed to render an entry
+EXPORT_FIELDS = ('content', 'created_at', 'mood_data')
+
+
+def parse_date_range(start=None, end=None):
+    """Parse optional ISO start/end filters; a date-only end includes that whole day"""
+    try:
+        start_at = parser.isoparse(start) if start else None
+        end_at = parser.isoparse(end) if end else None
+    except ValueError as e:
+        raise ValueError(f'Invalid date filter: {str(e)}')
+    if end_at is not None and len(end) == 10:
+        end_at += timedelta(days=1)
+    for value in (start_at, end_at):
+        if value is not None and value.tzinfo is not None:
+            raise ValueError('Date filters must not include a timezone')
+    if start_at and end_at and start_at >= end_at:
+        raise ValueError('start must be before end')
+    return start_at, end_at
+
+
+def journal_export_entries(user_id, start_at=None, end_at=None):
+    """Journal entries covered by an export, newest first"""
+    filters = {'user_id': user_id}
+    if start_at is not None:
+        filters['created_at__gte'] = start_at
+    if end_at is not None:
+        filters['created_at__lt'] = end_at
+    return JournalEntry.objects(**filters).order_by('-created_at')
+
+
+def journal_export_query(user_id, start_at=None, end_at=None, batch_size=200):
+    """Raw journal documents for the export, newest first, fetched from Mongo in batches"""
+    return (
+        journal_export_entries(user_id, start_at, end_at)
+        .only(*EXPORT_FIELDS)
+        .batch_size(batch_size)
+        .as_pymongo()
+    )
+
+
+def journal_pdf_styles():
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=colors.purple
+        ),
+        'date': ParagraphStyle(
+            'CustomDate',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.gray
+        ),
+        'content': ParagraphStyle(
+            'CustomContent',
+            parent=styles['Normal'],
+            fontSize=12,
+            spaceAfter=20
+        ),
+        'mood': ParagraphStyle(
+            'CustomMood',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.purple,
+            spaceAfter=10
+        )
+    }
+
+
+def iter_journal_flowables(docs, styles, subtitle=None):
+    """Yield the report's flowables one entry at a time"""
+    yield Paragraph("Mood Journal Report", styles['title'])
+    if subtitle:
+        yield Paragraph(escape(subtitle), styles['date'])
+    yield Spacer(1, 20)
+    yield from iter_entry_flowables(docs, styles)
+
+
+def iter_entry_flowables(docs, styles):
+    """Yield the flowables of each journal entry, without the report title"""
+    for doc in docs:
+        # Add date
+        date_str = doc['created_at'].strftime("%B %d, %Y at %I:%M %p")
+        yield Paragraph(date_str, styles['date'])
+        yield Spacer(1, 10)
+
+        # Add content; escaped so text like "<3" is not parsed as markup
+        yield Paragraph(escape(doc.get('content', '')), styles['content'])
+
+        # Add mood information if available
+        mood_data = doc.get('mood_data')
+        if mood_data:
+            mood_text = f"Mood: {mood_data['primary_mood']} (Confidence: {mood_data['confidence']}%)"
+            yield Paragraph(escape(mood_text), styles['mood'])
+
+            if mood_data.get('emotions'):
+                emotions_text = "Detected Emotions: " + ", ".join(mood_data['emotions'])
+                yield Paragraph(escape(emotions_text), styles['mood'])
+
+        yield Spacer(1, 30)
+
+
+class FlowableStream(list):
+    """A list of flowables that refills itself from an iterator.
+
+    reportlab's build loop only ever looks at the front of the flowable list,
+    checking ``len()`` before each flowable. Refilling a small lookahead window
+    there means only a handful of entries are materialized at any time instead
+    of the whole journal.
+    """
+
+    def __init__(self, flowables, lookahead=16):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return super().__len__()
+
+
+def _render_part(flowables, output):
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    doc.build(FlowableStream(flowables))
+
+
+def render_journal_pdf(docs, output, subtitle=None, chunk_size=100):
+    """Render journal documents into output (a path or binary file object).
+
+    reportlab keeps every page of a document in memory until it is saved, so
+    the documents are rendered chunk_size at a time into separate temporary
+    PDFs, which are then concatenated into output one object at a time.
+    Memory stays flat however long the journal (or Mongo cursor) is; each
+    chunk starts on a new page.
+    """
+    styles = journal_pdf_styles()
+    docs = iter(docs)
+    with ExitStack() as stack:
+        parts = []
+        first = list(itertools.islice(docs, chunk_size))
+        part = stack.enter_context(tempfile.TemporaryFile(suffix='.pdf'))
+        _render_part(iter_journal_flowables(first, styles, subtitle), part)
+        parts.append(part)
+        while True:
+            chunk = list(itertools.islice(docs, chunk_size))
+            if not chunk:
+                break
+            part = stack.enter_context(tempfile.TemporaryFile(suffix='.pdf'))
+            _render_part(iter_entry_flowables(chunk, styles), part)
+            parts.append(part)
+
+        if isinstance(output, str):
+            output = stack.enter_context(open(output, 'wb'))
+        concatenate_pdfs(parts, output)
+
+
+# Object references, object headers and the trailer entries of reportlab's output
+PDF_REF = re.compile(rb'(\d+) 0 R')
+PDF_OBJ = re.compile(rb'(\d+) 0 obj')
+PDF_TRAILER_REF = re.compile(rb'/(Root|Info) (\d+) 0 R')
+PDF_PAGES_REF = re.compile(rb'/Pages (\d+) 0 R')
+PDF_PARENT_REF = re.compile(rb'/Parent \d+ 0 R')
+PDF_PAGE = re.compile(rb'/Type /Page(?![A-Za-z])')
+
+
+def _pdf_objects(part):
+    """Read a reportlab PDF's cross-reference table: ({object number: (start, end)}, xref and trailer)"""
+    part.seek(0, os.SEEK_END)
+    size = part.tell()
+    part.seek(max(0, size - 1024))
+    tail = part.read()
+    xref_at = int(tail[tail.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    part.seek(xref_at)
+    xref = part.read(size - xref_at)
+    lines = xref.split(b'\n')
+    count = int(lines[1].split()[1])
+    offsets = {}
+    for number, line in enumerate(lines[2:2 + count]):
+        offset, _, kind = line.split()[:3]
+        if kind == b'n':
+            offsets[number] = int(offset)
+    # Objects are written back to back, so each one ends where the next begins
+    ordered = sorted(offsets.items(), key=lambda item: item[1])
+    ends = [start for _, start in ordered[1:]] + [xref_at]
+    spans = {number: (start, end) for (number, start), end in zip(ordered, ends)}
+    return spans, xref
+
+
+def _read_span(part, span):
+    part.seek(span[0])
+    return part.read(span[1] - span[0])
+
+
+def concatenate_pdfs(parts, output):
+    """Concatenate reportlab PDFs (binary files) into one document written to output.
+
+    Objects are copied one at a time with their numbers shifted past the
+    previous parts'; each part's catalog and page tree are replaced by one
+    covering every page, and the first part's document info is kept.
+    """
+    # Objects 1 and 2 are the new catalog and page tree, written last. Offsets
+    # are indexed by object number, -1 for numbers left free by skipped objects
+    offsets = array('q', [-1, -1, -1])
+    kids = array('q')
+    next_number = 3
+    info_number = None
+    position = 0
+
+    def write(data):
+        nonlocal position
+        output.write(data)
+        position += len(data)
+
+    write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    for part in parts:
+        spans, xref = _pdf_objects(part)
+        refs = {name: int(number) for name, number in PDF_TRAILER_REF.findall(xref)}
+        root = _read_span(part, spans[refs[b'Root']])
+        skip = {refs[b'Root'], int(PDF_PAGES_REF.search(root).group(1))}
+        if info_number is not None:
+            skip.add(refs[b'Info'])
+        base = next_number - 1
+        for number in sorted(spans):
+            if number in skip:
+                continue
+            data = _read_span(part, spans[number])
+            # References only occur in the dictionary, never in the stream data
+            split = data.find(b'stream\n')
+            head, body = (data, b'') if split < 0 else (data[:split], data[split:])
+            head = PDF_REF.sub(lambda m: b'%d 0 R' % (int(m.group(1)) + base), head)
+            head = PDF_OBJ.sub(b'%d 0 obj' % (number + base), head, count=1)
+            if PDF_PAGE.search(head):
+                head = PDF_PARENT_REF.sub(b'/Parent 2 0 R', head)
+                kids.append(number + base)
+            if number == refs[b'Info']:
+                info_number = number + base
+            offsets.extend([-1] * (number + base + 1 - len(offsets)))
+            offsets[number + base] = position
+            write(head + body)
+        next_number = max(spans) + base + 1
+
+    offsets[1] = position
+    write(b'1 0 obj\n<<\n/PageMode /UseNone /Pages 2 0 R /Type /Catalog\n>>\nendobj\n')
+    offsets[2] = position
+    write(
+        b'2 0 obj\n<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>\nendobj\n'
+        % (len(kids), b' '.join(b'%d 0 R' % kid for kid in kids))
+    )
+    xref_at = position
+    write(b'xref\n0 %d\n0000000000 65535 f \n' % next_number)
+    for number in range(1, next_number):
+        if number < len(offsets) and offsets[number] >= 0:
+            write(b'%010d 00000 n \n' % offsets[number])
+        else:
+            write(b'0000000000 65535 f \n')
+    write(
+        b'trailer\n<<\n/Info %d 0 R\n/Root 1 0 R\n/Size %d\n>>\nstartxref\n%d\n%%%%EOF\n'
+        % (info_number, next_number, xref_at)
+    )
+
+
+def export_subtitle(start_at=None, end_at=None):
+    # Depends only on the filters, so a cached PDF stays correct on later days
+    start_text = start_at.strftime("%B %d, %Y") if start_at else None
+    end_text = (end_at - timedelta(microseconds=1)).strftime("%B %d, %Y") if end_at else None
+    if start_text and end_text:
+        return f"Entries from {start_text} to {end_text}"
+    if start_text:
+        return f"Entries since {start_text}"
+    if end_text:
+        return f"Entries up to {end_text}"
+    return None
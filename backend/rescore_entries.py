@@ -0,0 +1,286 @@
+"""Re-score the mood of existing journal entries with the current model and lexicon rules.
+
+Entries are streamed from MongoDB in _id order and scored in chunks on a pool
+of worker processes, each holding its own copy of the emotion model. Results
+are written back with one bulk update per chunk, and the last written _id is
+checkpointed, so an interrupted run continues where it stopped.
+
+With EMBEDDINGS_ENABLED the entries' embeddings are rewritten as well;
+--embeddings-only only fills in embeddings that are missing or from another
+model version, leaving the stored moods as they are.
+
+Usage:
+    python rescore_entries.py [--user USER_ID] [--only-missing | --embeddings-only]
+                              [--workers 2] [--chunk-size 256] [--batch-size 32] [--restart]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rescore_checkpoint.json')
+
+# Worker process state, set up once by _init_worker
+_worker_model = None
+
+
+def _init_worker(batch_size, threads):
+    """Load the emotion model once per worker process"""
+    global _worker_model
+    import torch
+    from model_setup import emotion_model_options
+    from mood_analyzer import EmotionModel
+
+    torch.set_num_threads(threads)
+    _worker_model = EmotionModel(
+        **emotion_model_options(),
+        max_batch_size=batch_size,
+        window_ms=0,
+        # A whole chunk is queued at once; offline runs wait as long as it takes
+        timeout=3600
+    )
+    _worker_model.load()
+
+
+def score_chunk(chunk):
+    """Score [(entry_id, content), ...] in a worker.
+
+    Returns [(entry_id, {field: value} to set or None, error)]; the fields are
+    mood_data, and with embeddings enabled embedding and embedding_version.
+    Entries without text are skipped. If the model fails on the chunk, its
+    entries are retried one at a time so only the failing ones are lost.
+    """
+    scored = {}
+    texts = []
+    for entry_id, content in chunk:
+        if isinstance(content, str) and content.strip():
+            texts.append((entry_id, content))
+        else:
+            scored[entry_id] = (entry_id, None, 'Content is empty')
+    try:
+        results = _score_texts(texts)
+    except Exception:
+        results = []
+        for item in texts:
+            try:
+                results += _score_texts([item])
+            except Exception as e:
+                results.append((item[0], None, f'Mood analysis failed: {e}'))
+    for result in results:
+        scored[result[0]] = result
+    return [scored[entry_id] for entry_id, _ in chunk]
+
+
+def _score_texts(chunk):
+    from embedding_index import encode_embedding
+    from emotions import build_mood_response, group_emotions_batch
+    from models import JournalEntry
+
+    if not chunk:
+        return []
+    # The stored text as the API analyzes it, so re-scored moods match new entries
+    texts = [content for _, content in chunk]
+    if _worker_model.embeddings:
+        results, embeddings = zip(*_worker_model.analyze_many_with_embeddings(texts))
+    else:
+        results, embeddings = _worker_model.analyze_many(texts), [None] * len(texts)
+    grouped = group_emotions_batch(list(results))
+
+    scored = []
+    for (entry_id, _), text, result, grouped_emotions, embedding in zip(chunk, texts, results, grouped, embeddings):
+        entry = JournalEntry()
+        try:
+            entry.set_mood(build_mood_response(text, result, grouped_emotions))
+            fields = {'mood_data': entry.mood_data}
+            if embedding is not None:
+                fields['embedding'] = encode_embedding(embedding)
+                fields['embedding_version'] = _worker_model.embedding_version
+            scored.append((entry_id, fields, None))
+        except ValueError as e:
+            scored.append((entry_id, None, str(e)))
+    return scored
+
+
+def load_checkpoint(path, scope):
+    """The checkpoint for this run's scope, or None"""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('scope') != scope:
+        raise SystemExit(f"Checkpoint {path} belongs to a different run ({checkpoint.get('scope')}); "
+                         f"use --restart or --checkpoint")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def iter_chunks(entries, chunk_size):
+    chunk = []
+    for doc in entries:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rescore(args):
+    from datetime import datetime
+
+    from bson import ObjectId
+    from pymongo import UpdateOne
+
+    from analytics import record_rescored_entries
+    from model_setup import MOOD_RULESET_VERSION, emotion_model_options
+    from models import JournalEntry, User, create_db_app
+    from mood_analyzer import EmotionModel
+
+    # Never loaded here; describes the model the workers load
+    emotion_model = EmotionModel(**emotion_model_options())
+
+    if args.embeddings_only and not emotion_model.embeddings:
+        raise SystemExit("--embeddings-only needs EMBEDDINGS_ENABLED=true")
+
+    scope = {
+        'user': args.user,
+        'only_missing': args.only_missing,
+        'embeddings_only': args.embeddings_only,
+        'model': emotion_model.version,
+        'ruleset': MOOD_RULESET_VERSION
+    }
+    checkpoint = None if args.restart else load_checkpoint(args.checkpoint, scope)
+    if checkpoint is None:
+        checkpoint = {'scope': scope, 'last_id': None, 'updated': 0, 'failed': 0}
+    else:
+        print(f"Resuming after {checkpoint['last_id']} ({checkpoint['updated']} entries already updated)")
+
+    with create_db_app().app_context():
+        filters = {}
+        if args.user:
+            filters['user_id'] = ObjectId(args.user)
+        if args.only_missing:
+            filters['__raw__'] = {'$or': [{'mood_data': {'$exists': False}}, {'mood_data': {}}]}
+        if args.embeddings_only:
+            filters['embedding_version__ne'] = emotion_model.embedding_version
+        if checkpoint['last_id']:
+            filters['id__gt'] = ObjectId(checkpoint['last_id'])
+
+        entries = (
+            JournalEntry.objects(**filters)
+            .order_by('id')
+            .only('id', 'content', 'user_id', 'created_at', 'mood_data')
+            .batch_size(args.chunk_size)
+            .as_pymongo()
+        )
+        collection = JournalEntry._get_collection()
+
+        started = time.perf_counter()
+        processed = 0
+        threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+        # spawn: forking a process that already imported torch can deadlock its thread pool
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(args.batch_size, threads)
+        ) as pool:
+            in_flight = deque()
+
+            def write_oldest():
+                # Chunks are written in submission order, so the checkpoint only moves forward
+                nonlocal processed
+                future, docs = in_flight.popleft()
+                try:
+                    scored = future.result()
+                except Exception as e:
+                    # Counted as failed so the checkpoint still moves past the chunk
+                    scored = [(doc['_id'], None, f'Scoring failed: {e}') for doc in docs]
+                if args.embeddings_only:
+                    # The stored moods stay as they are
+                    for _, fields, _ in scored:
+                        if fields is not None:
+                            fields.pop('mood_data')
+                updates = [
+                    UpdateOne({'_id': entry_id}, {'$set': fields})
+                    for entry_id, fields, _ in scored
+                    if fields is not None
+                ]
+                if updates:
+                    collection.bulk_write(updates, ordered=False)
+                    if not args.embeddings_only:
+                        old_docs = {doc['_id']: doc for doc in docs}
+                        rescored = [(old_docs[entry_id], fields) for entry_id, fields, _ in scored if fields is not None]
+                        # Invalidates the owners' cached PDF exports
+                        user_ids = list({doc['user_id'] for doc, _ in rescored})
+                        User.objects(id__in=user_ids).update(set__journal_modified_at=datetime.utcnow())
+                        # Mood analytics are derived from mood_data
+                        if not args.skip_rollups:
+                            record_rescored_entries(
+                                [doc for doc, _ in rescored],
+                                [dict(doc, mood_data=fields['mood_data']) for doc, fields in rescored]
+                            )
+                for entry_id, _, error in scored:
+                    if error:
+                        print(f"  {entry_id}: {error}")
+                processed += len(scored)
+                checkpoint['updated'] += len(updates)
+                checkpoint['failed'] += len(scored) - len(updates)
+                checkpoint['last_id'] = str(scored[-1][0])
+                save_checkpoint(args.checkpoint, checkpoint)
+
+                elapsed = time.perf_counter() - started
+                print(f"{processed} entries in {elapsed:.1f}s ({processed / elapsed:.1f} entries/s)", flush=True)
+
+            for docs in iter_chunks(entries, args.chunk_size):
+                # Workers only get the text; the rest stays here for the rollup deltas
+                chunk = [(doc['_id'], doc.get('content')) for doc in docs]
+                in_flight.append((pool.submit(score_chunk, chunk), docs))
+                # Keep every worker busy without reading the whole collection ahead
+                if len(in_flight) >= args.workers * 2:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0.0
+        print(f"Re-scored {processed} entries in {elapsed:.1f}s ({rate:.1f} entries/s); "
+              f"{checkpoint['updated']} updated, {checkpoint['failed']} failed in total")
+
+    # The run is complete; the next one starts from the beginning
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user', help='only re-score this user\'s entries')
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--only-missing', action='store_true', help='only score entries without mood data')
+    selection.add_argument('--embeddings-only', action='store_true',
+                           help='only store embeddings of entries without a current one; keep their moods')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes, one model each')
+    parser.add_argument('--threads', type=int, help='torch threads per worker (default: cores / workers)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='entries per worker task and bulk update')
+    parser.add_argument('--batch-size', type=int, default=32, help='texts per model forward pass')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--skip-rollups', action='store_true',
+                        help='do not update mood rollups (rebuild them later with init_db.py --rebuild-rollups)')
+    rescore(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionRejected, TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    buckets = TokenBuckets(rate=2.0, burst=3)
+    assert [buckets.take('user') for _ in range(3)] == [0, 0, 0]
+    assert buckets.take('user') == pytest.approx(0.5)
+    clock.now += 0.5
+    assert buckets.take('user') == 0
+
+
+def test_buckets_are_per_key(clock):
+    buckets = TokenBuckets(rate=1.0, burst=1)
+    assert buckets.take('a') == 0
+    assert buckets.take('b') == 0
+    assert buckets.take('a') > 0
+
+
+def test_bucket_never_exceeds_burst(clock):
+    buckets = TokenBuckets(rate=1.0, burst=2)
+    buckets.take('user')
+    clock.now += 3600
+    assert [buckets.take('user') for _ in range(3)][-1] > 0
+
+
+def test_forgotten_keys_start_full(clock):
+    buckets = TokenBuckets(rate=0.001, burst=1, max_keys=2)
+    buckets.take('a')
+    buckets.take('b')
+    buckets.take('c')
+    assert len(buckets) == 2
+    assert buckets.take('a') == 0
+
+
+def test_empty_bucket_is_rejected_with_429(clock):
+    controller = AdmissionController(user_rate=1.0, user_burst=1)
+    with controller.admit(user_id='user'):
+        pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit(user_id='user'):
+            pass
+    assert rejected.value.status == 429
+    assert rejected.value.reason == 'rate_limited'
+    assert rejected.value.retry_after == 1
+
+
+def test_reserved_slots_only_serve_users(clock):
+    controller = AdmissionController(user_burst=10, ip_burst=10, max_in_flight=2, reserved_for_users=1)
+    with controller.admit(ip='10.0.0.1'):
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit(ip='10.0.0.2'):
+                pass
+        assert rejected.value.status == 503
+        with controller.admit(user_id='user'):
+            assert controller.in_flight() == 2
+    assert controller.in_flight() == 0
+
+
+def test_capacity_rejection_gives_the_token_back(clock):
+    controller = AdmissionController(user_rate=0.001, user_burst=1, max_in_flight=1, reserved_for_users=0)
+    with controller.admit(user_id='first'):
+        with pytest.raises(AdmissionRejected):
+            with controller.admit(user_id='second'):
+                pass
+    with controller.admit(user_id='second'):
+        pass
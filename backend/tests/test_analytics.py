@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from analytics import rollup_documents, rollup_operations, summarize_rollup
+
+USER = ObjectId()
+
+
+def entry(day, mood=None, confidence=50, emotions=('joy',)):
+    doc = {'user_id': USER, 'created_at': datetime(2024, 1, day, 9)}
+    if mood:
+        doc['mood_data'] = {'primary_mood': mood, 'confidence': confidence, 'emotions': list(emotions)}
+    return doc
+
+
+def day_operation(operations, day):
+    return next(
+        op._doc for op in operations
+        if op._filter['granularity'] == 'day' and op._filter['bucket'] == datetime(2024, 1, day)
+    )
+
+
+def test_new_entries_increment_every_granularity():
+    operations = rollup_operations([entry(1, 'Joy'), entry(2)])
+    assert {op._filter['granularity'] for op in operations} == {'day', 'week', 'month'}
+    assert day_operation(operations, 1)['$inc'] == {
+        'entries': 1, 'mood_entries': 1, 'confidence_sum': 50.0, 'moods.Joy': 1, 'emotions.joy': 1
+    }
+    assert day_operation(operations, 2)['$inc'] == {'entries': 1}
+
+
+def test_rescored_entries_move_between_moods_without_changing_counts():
+    old = entry(1, 'Sadness', confidence=40, emotions=('grief',))
+    new = entry(1, 'Joy', confidence=70)
+    inc = day_operation(rollup_operations([new], removed_docs=[old]), 1)['$inc']
+    assert inc == {'confidence_sum': 30.0, 'moods.Joy': 1, 'moods.Sadness': -1, 'emotions.joy': 1, 'emotions.grief': -1}
+
+
+def test_unchanged_moods_write_nothing():
+    assert rollup_operations([entry(1, 'Joy')], removed_docs=[entry(1, 'Joy')]) == []
+
+
+def test_rebuilt_documents_match_the_increments():
+    rollups = rollup_documents([entry(1, 'Joy'), entry(1, 'Joy', confidence=70), entry(1)])
+    day = next(rollup for rollup in rollups if rollup['granularity'] == 'day')
+    assert (day['entries'], day['mood_entries'], day['confidence_sum']) == (3, 2, 120.0)
+    assert day['moods'] == {'Joy': 2}
+    assert day['emotions'] == {'joy': 2}
+
+
+def test_summary_skips_moods_moved_away():
+    summary = summarize_rollup({
+        'bucket': datetime(2024, 1, 1), 'entries': 2, 'mood_entries': 2, 'confidence_sum': 100.0,
+        'moods': {'Joy': 2, 'Sadness': 0}, 'emotions': {'joy': 2, 'grief': 0}
+    })
+    assert summary['moods'] == {'Joy': 2}
+    assert summary['emotions'] == {'joy': 2}
+    assert summary['primary_mood'] == 'Joy'
+    assert summary['average_confidence'] == 50.0
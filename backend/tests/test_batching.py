@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def uppercase_batch(texts):
+    if any(text == 'bad' for text in texts):
+        raise ValueError('cannot score bad')
+    return [text.upper() for text in texts]
+
+
+def test_concurrent_requests_share_a_batch():
+    batches = []
+
+    def infer(texts):
+        batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+    batcher = MicroBatcher(infer, max_batch_size=8, window_ms=50)
+    results = {}
+
+    def request(text):
+        results[text] = batcher.analyze(text, timeout=5)
+
+    threads = [threading.Thread(target=request, args=(f'text {i}',)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {f'text {i}': f'TEXT {i}' for i in range(6)}
+    assert len(batches) < 6
+    assert all(len(batch) <= 8 for batch in batches)
+
+
+def test_results_keep_request_order():
+    batcher = MicroBatcher(uppercase_batch, max_batch_size=4, window_ms=0)
+    texts = [f'entry {i}' for i in range(10)]
+    assert batcher.analyze_many(texts, timeout=5) == [text.upper() for text in texts]
+
+
+def test_failing_text_is_isolated_from_its_batch():
+    batcher = MicroBatcher(uppercase_batch, max_batch_size=8, window_ms=50)
+    results, errors = {}, {}
+
+    def request(text):
+        try:
+            results[text] = batcher.analyze(text, timeout=5)
+        except ValueError as e:
+            errors[text] = str(e)
+
+    threads = [threading.Thread(target=request, args=(text,)) for text in ('good', 'bad', 'fine')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {'good': 'GOOD', 'fine': 'FINE'}
+    assert errors == {'bad': 'cannot score bad'}
+
+
+def test_failed_batch_is_counted_as_isolated():
+    batcher = MicroBatcher(uppercase_batch, max_batch_size=8, window_ms=0)
+    with pytest.raises(ValueError):
+        batcher.analyze_many(['good', 'bad'], timeout=5)
+    assert batcher.stats()['isolated_batches'] == 1
+
+
+def test_non_string_text_is_rejected_before_queueing():
+    calls = []
+    batcher = MicroBatcher(lambda texts: calls.append(texts) or texts, window_ms=0)
+    with pytest.raises(TypeError):
+        batcher.analyze_many(['fine', None])
+    assert calls == []
+    assert batcher.queue_depth() == 0
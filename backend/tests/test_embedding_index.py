@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+
+from embedding_index import EmbeddingQueue, decode_embedding, encode_embedding
+
+
+def test_embeddings_are_stored_normalized():
+    vector = decode_embedding(encode_embedding([3.0, 4.0])).astype(np.float32)
+    assert np.allclose(vector, [0.6, 0.8], atol=1e-3)
+
+
+def test_queued_embeddings_run_in_the_background():
+    done = threading.Event()
+    seen = []
+
+    def embed(entry_id, user_id):
+        seen.append((entry_id, user_id))
+        done.set()
+
+    queue = EmbeddingQueue(embed)
+    assert queue.submit('entry', 'user')
+    assert done.wait(5)
+    assert seen == [('entry', 'user')]
+
+
+def test_full_queue_refuses_entries():
+    gate = threading.Event()
+    queue = EmbeddingQueue(lambda entry_id: gate.wait(5), max_pending=2)
+    try:
+        assert queue.submit(1)
+        assert queue.submit(2)
+        assert not queue.submit(3)
+        assert queue.stats()['dropped'] == 1
+    finally:
+        gate.set()
+
+
+def test_failures_free_their_slot():
+    failed = threading.Event()
+
+    def embed():
+        failed.set()
+        raise RuntimeError('model unavailable')
+
+    queue = EmbeddingQueue(embed, max_pending=1)
+    assert queue.submit()
+    assert failed.wait(5)
+    queue._executor.shutdown(wait=True)
+    assert queue.stats()['pending'] == 0
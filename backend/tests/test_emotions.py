@@ -0,0 +1,17 @@
+import random
+
+import bench_group_emotions
+from emotions import group_emotions, group_emotions_batch
+
+
+def test_batched_grouping_matches_per_text_grouping():
+    bench_group_emotions.check_parity(random.Random(3), count=500)
+
+
+def test_empty_batch_groups_to_nothing():
+    assert group_emotions_batch([]) == []
+
+
+def test_batch_of_one_matches_single_text():
+    results = bench_group_emotions.make_results(random.Random(4))
+    assert group_emotions_batch([results]) == [group_emotions(results)]
@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import export_jobs
+from export_jobs import ArtifactStore, ExportJobManager, ExportQueueFullError
+from models import ExportJob
+
+
+class FakeJob:
+    """In-memory stand-in for ExportJob with the queries ExportJobManager makes"""
+    QUEUED, RUNNING, DONE, FAILED = ExportJob.QUEUED, ExportJob.RUNNING, ExportJob.DONE, ExportJob.FAILED
+    saved = {}
+
+    def __init__(self, status=QUEUED, created_at=None, error=None, **fields):
+        self.id = ObjectId()
+        self.status = status
+        self.created_at = created_at or datetime.utcnow()
+        self.error = error
+        self.__dict__.update(fields)
+
+    def save(self):
+        FakeJob.saved[self.id] = self
+
+    def reload(self):
+        self.__dict__.update(FakeJob.saved[self.id].__dict__)
+
+    @classmethod
+    def objects(cls, id=None, status=None, status__in=None, **filters):
+        return FakeQuery([
+            job for job in cls.saved.values()
+            if (id is None or job.id == id)
+            and (status is None or job.status == status)
+            and (status__in is None or job.status in status__in)
+            and all(getattr(job, name, None) == value for name, value in filters.items() if '__' not in name)
+        ])
+
+
+class FakeQuery:
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def first(self):
+        return self.jobs[0] if self.jobs else None
+
+    def update_one(self, **updates):
+        if not self.jobs:
+            return 0
+        for name, value in updates.items():
+            setattr(self.jobs[0], name[len('set__'):], value)
+        return 1
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    FakeJob.saved = {}
+    monkeypatch.setattr(export_jobs, 'ExportJob', FakeJob)
+    monkeypatch.setattr(export_jobs, 'export_artifact_key', lambda user_id, start_at=None, end_at=None: str(user_id))
+    manager = ExportJobManager(ArtifactStore(str(tmp_path), 1024 * 1024), max_workers=1, queue_size=1, job_timeout=60)
+    gate = threading.Event()
+
+    def render(user_id, start_at, end_at, key):
+        gate.wait(5)
+        return manager.store.put(key, lambda output: output.write(b'%PDF-test'))
+
+    manager.render = render
+    manager.gate = gate
+    yield manager
+    gate.set()
+    manager._executor.shutdown(wait=True)
+
+
+def test_uncached_export_is_queued_not_rendered(manager):
+    artifact, job = manager.open_export(ObjectId())
+    assert artifact is None
+    assert job.status in (FakeJob.QUEUED, FakeJob.RUNNING)
+
+
+def test_cached_export_is_served_without_a_job(manager):
+    user_id = ObjectId()
+    manager.store.put(str(user_id), lambda output: output.write(b'%PDF-cached')).close()
+    artifact, job = manager.open_export(user_id)
+    with artifact:
+        assert artifact.read() == b'%PDF-cached'
+    assert job is None
+
+
+def test_full_queue_rejects_new_exports(manager):
+    manager.submit(ObjectId())
+    manager.submit(ObjectId())
+    with pytest.raises(ExportQueueFullError):
+        manager.submit(ObjectId())
+
+
+def test_same_export_reuses_the_queued_job(manager):
+    user_id = ObjectId()
+    assert manager.submit(user_id).id == manager.submit(user_id).id
+    assert manager._pending == 1
+
+
+def test_finished_jobs_free_their_slot(manager):
+    job = manager.submit(ObjectId())
+    manager.gate.set()
+    manager._executor.shutdown(wait=True)
+    assert FakeJob.saved[job.id].status == FakeJob.DONE
+    assert manager._pending == 0
+
+
+def test_stale_jobs_are_marked_failed(manager):
+    job = FakeJob(status=FakeJob.RUNNING, created_at=datetime.utcnow() - timedelta(seconds=61))
+    job.save()
+    assert manager.expire_stale(job).status == FakeJob.FAILED
+    fresh = FakeJob(status=FakeJob.QUEUED)
+    fresh.save()
+    assert manager.expire_stale(fresh).status == FakeJob.QUEUED
+
+
+def test_evicted_artifacts_stay_readable_while_open(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=0)
+    artifact = store.put('a', lambda output: output.write(b'%PDF-a'))
+    store.put('b', lambda output: output.write(b'%PDF-b')).close()
+    assert store.open('a') is None
+    with artifact:
+        assert artifact.read() == b'%PDF-a'
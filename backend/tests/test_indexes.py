@@ -0,0 +1,35 @@
+import pytest
+
+import indexes
+from models import MoodCacheEntry
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.created = []
+
+    def create_index(self, fields, background=False, **options):
+        self.created.append((fields, options))
+        return '_'.join(f'{field}_{direction}' for field, direction in fields)
+
+    def index_information(self):
+        return {}
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    collections = {}
+    for document in indexes.MANAGED_DOCUMENTS:
+        collection = FakeCollection(document._meta['collection'])
+        collections[document] = collection
+        monkeypatch.setattr(document, '_get_collection', classmethod(lambda cls, c=collection: c))
+    return collections
+
+
+def test_mood_cache_indexes_are_only_built_by_ensure_indexes(collections):
+    assert MoodCacheEntry._meta['auto_create_index'] is False
+    indexes.ensure_indexes()
+    created = collections[MoodCacheEntry].created
+    assert ([('expires_at', 1)], {'expireAfterSeconds': 0}) in created
+    assert ([('key', 1)], {'unique': True, 'sparse': False}) in created
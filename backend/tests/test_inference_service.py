@@ -0,0 +1,36 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import pytest
+
+from inference_service import InferenceClient, parse_address, service_authkey
+
+
+def test_host_and_port_is_a_tcp_address():
+    assert parse_address('127.0.0.1:7070') == ('127.0.0.1', 7070)
+    assert parse_address('/tmp/moodtunes-inference.sock') == '/tmp/moodtunes-inference.sock'
+
+
+def test_tcp_address_needs_its_own_authkey():
+    with pytest.raises(ValueError):
+        service_authkey(('0.0.0.0', 7070), None, 'dev-secret-key')
+    assert service_authkey(('0.0.0.0', 7070), 'long random key', 'dev-secret-key') == b'long random key'
+
+
+def test_unix_socket_falls_back_to_the_secret_key():
+    assert service_authkey('/tmp/inference.sock', None, 'dev-secret-key') == b'dev-secret-key'
+
+
+def test_state_gives_up_after_the_status_timeout(tmp_path):
+    address = str(tmp_path / 'inference.sock')
+    listener = Listener(address, authkey=b'key')
+    connections = []
+    # A service that accepts calls but never answers, like one stuck behind a busy model
+    threading.Thread(target=lambda: connections.append(listener.accept()), daemon=True).start()
+    client = InferenceClient({'model_name': 'test-model'}, address, b'key', timeout=30, status_timeout=0.2,
+                             autostart=False)
+    started = time.monotonic()
+    assert client.state == InferenceClient.NOT_STARTED
+    assert time.monotonic() - started < 5
+    listener.close()
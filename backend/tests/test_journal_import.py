@@ -0,0 +1,134 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError, WriteConcernError
+
+from journal_import import ImportAnalysisError, import_journal_entries, iter_ndjson_records
+from models import JournalEntry
+
+MOOD = {'primary_mood': 'Joy', 'confidence': 80, 'emotions': ['joy']}
+
+
+class FakeCollection:
+    def __init__(self, failing_positions=(), failing_calls=None):
+        self.inserted = []
+        self.failing_positions = set(failing_positions)
+        # {call number: exception raised by that insert_many}
+        self.failing_calls = failing_calls or {}
+        self.calls = 0
+
+    def with_options(self, **options):
+        return self
+
+    def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.calls in self.failing_calls:
+            raise self.failing_calls[self.calls]
+        write_errors = [
+            {'index': position, 'errmsg': 'duplicate key'}
+            for position in range(len(documents)) if position in self.failing_positions
+        ]
+        self.inserted.extend(doc for position, doc in enumerate(documents) if position not in self.failing_positions)
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors})
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(JournalEntry, '_get_collection', classmethod(lambda cls: collection))
+    return collection
+
+
+def analyze(texts):
+    return [dict(MOOD) for _ in texts]
+
+
+def test_summary_counts_imported_and_invalid_records(collection):
+    records = [{'content': 'first'}, {'content': '  '}, 'not an object', {'content': 'last', 'mood': MOOD}]
+    summary = import_journal_entries(records, ObjectId(), chunk_size=2)
+    assert summary == {
+        'received': 4,
+        'imported': 2,
+        'analyzed': 0,
+        'failed': 2,
+        'errors': [
+            {'index': 1, 'error': 'Content cannot be empty'},
+            {'index': 2, 'error': 'Each record must be an object'}
+        ]
+    }
+    assert [doc['content'] for doc in collection.inserted] == ['first', 'last']
+
+
+def test_only_records_without_a_mood_are_analyzed(collection):
+    texts = []
+
+    def analyze_fn(batch):
+        texts.extend(batch)
+        return analyze(batch)
+
+    records = [{'content': 'analyze me'}, {'content': 'has a mood', 'mood': MOOD}]
+    summary = import_journal_entries(records, ObjectId(), analyze_fn=analyze_fn)
+    assert texts == ['analyze me']
+    assert summary['analyzed'] == 1
+    assert summary['imported'] == 2
+
+
+@pytest.mark.parametrize('error', [ImportAnalysisError('model unavailable'), RuntimeError('model unavailable')])
+def test_failed_analysis_only_fails_its_chunk(collection, error):
+    calls = []
+
+    def analyze_fn(batch):
+        calls.append(batch)
+        if len(calls) == 2:
+            raise error
+        return analyze(batch)
+
+    records = [{'content': f'entry {i}'} for i in range(5)]
+    summary = import_journal_entries(records, ObjectId(), analyze_fn=analyze_fn, chunk_size=2)
+    assert summary['imported'] == 3
+    assert summary['failed'] == 2
+    assert summary['errors'] == [
+        {'index': 2, 'error': 'Mood analysis failed: model unavailable'},
+        {'index': 3, 'error': 'Mood analysis failed: model unavailable'}
+    ]
+
+
+def test_write_errors_are_reported_per_record(monkeypatch):
+    collection = FakeCollection(failing_positions={1})
+    monkeypatch.setattr(JournalEntry, '_get_collection', classmethod(lambda cls: collection))
+    summary = import_journal_entries([{'content': 'a'}, {'content': 'b'}, {'content': 'c'}], ObjectId())
+    assert summary['imported'] == 2
+    assert summary['errors'] == [{'index': 1, 'error': 'duplicate key'}]
+
+
+@pytest.mark.parametrize('error', [AutoReconnect('connection closed'), WriteConcernError('waiting for replication timed out', 64, {})])
+def test_failed_chunk_write_stops_the_import(monkeypatch, error):
+    collection = FakeCollection(failing_calls={2: error})
+    monkeypatch.setattr(JournalEntry, '_get_collection', classmethod(lambda cls: collection))
+    inserted = []
+    records = [{'content': f'entry {i}'} for i in range(7)]
+    summary = import_journal_entries(records, ObjectId(), chunk_size=2, on_insert=inserted.extend)
+    assert summary['received'] == 4
+    assert summary['imported'] == 2
+    assert summary['failed'] == 2
+    assert summary['errors'] == [
+        {'index': 2, 'error': f'Write failed: {error}'},
+        {'index': 3, 'error': f'Write failed: {error}'}
+    ]
+    assert summary['failed_chunk'] == {'start': 2, 'end': 3, 'error': str(error)}
+    assert [doc['content'] for doc in inserted] == ['entry 0', 'entry 1']
+    assert collection.calls == 2
+
+
+def test_records_beyond_the_limit_are_refused(collection):
+    summary = import_journal_entries([{'content': str(i)} for i in range(5)], ObjectId(), max_records=3)
+    assert summary['imported'] == 3
+    assert summary['errors'] == [{'index': 3, 'error': 'Import is limited to 3 records per request'}]
+
+
+def test_invalid_ndjson_lines_become_record_errors(collection):
+    records = iter_ndjson_records([b'{"content": "ok"}\n', b'\n', b'{broken\n'])
+    summary = import_journal_entries(records, ObjectId())
+    assert summary['imported'] == 1
+    assert summary['errors'][0]['index'] == 1
+    assert summary['errors'][0]['error'].startswith('Invalid JSON')
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from journal_requests import (
+    JOURNAL_RESPONSE_FIELDS, decode_journal_cursor, encode_journal_cursor, parse_journal_query
+)
+
+
+def test_unpaginated_without_limit_or_cursor():
+    fields, limit, cursor = parse_journal_query(MultiDict(), 20, 100)
+    assert fields == list(JOURNAL_RESPONSE_FIELDS)
+    assert limit is None
+    assert cursor is None
+
+
+def test_cursor_alone_uses_the_default_page_size():
+    doc = {'created_at': datetime(2024, 5, 1, 12, 30), '_id': ObjectId()}
+    _, limit, cursor = parse_journal_query(MultiDict({'cursor': encode_journal_cursor(doc)}), 20, 100)
+    assert limit == 20
+    assert cursor == (doc['created_at'], doc['_id'])
+
+
+def test_limit_is_capped():
+    assert parse_journal_query(MultiDict({'limit': '500'}), 20, 100)[1] == 100
+
+
+@pytest.mark.parametrize('limit', ['0', '-3', 'abc', '1e3', ''])
+def test_invalid_limit_is_rejected(limit):
+    with pytest.raises(ValueError):
+        parse_journal_query(MultiDict({'limit': limit}), 20, 100)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValueError):
+        parse_journal_query(MultiDict({'fields': 'id,secret'}), 20, 100)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_journal_cursor('bm90IGpzb24=')
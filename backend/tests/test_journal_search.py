@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+
+from journal_search import decode_search_cursor, encode_search_cursor, parse_search_query, search_results
+
+
+def test_cursor_round_trip():
+    doc_id = ObjectId()
+    cursor = encode_search_cursor({'score': 1.25, '_id': doc_id})
+    assert decode_search_cursor(cursor) == (1.25, doc_id)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_search_cursor({'score': 0.333333333, '_id': ObjectId()})
+    assert all(char.isalnum() or char in '-_=' for char in cursor)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'eyJzIjogMX0=', 'eyJzIjogMSwgImlkIjogIngifQ=='])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_search_cursor(cursor)
+
+
+def test_query_decodes_the_cursor():
+    doc_id = ObjectId()
+    args = MultiDict({'q': 'river', 'cursor': encode_search_cursor({'score': 2.0, '_id': doc_id})})
+    assert parse_search_query(args, 20, 100)['cursor'] == (2.0, doc_id)
+
+
+def test_next_cursor_points_after_the_last_hit():
+    docs = [
+        {'_id': ObjectId(), 'score': 3.0 - i, 'created_at': datetime(2024, 1, 1), 'content': 'x'}
+        for i in range(3)
+    ]
+    search = parse_search_query(MultiDict({'q': 'x', 'limit': '2'}), 20, 100)
+    hits, next_cursor = search_results(docs, search)
+    assert len(hits) == 2
+    assert decode_search_cursor(next_cursor) == (2.0, docs[1]['_id'])
+
+    hits, next_cursor = search_results(docs[:2], search)
+    assert next_cursor is None
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', '2.5', ''])
+def test_invalid_limit_is_rejected(limit):
+    with pytest.raises(ValueError):
+        parse_search_query(MultiDict({'q': 'x', 'limit': limit}), 20, 100)
+
+
+def test_limit_defaults_and_is_capped():
+    assert parse_search_query(MultiDict({'q': 'x'}), 20, 100)['limit'] == 20
+    assert parse_search_query(MultiDict({'q': 'x', 'limit': '500'}), 20, 100)['limit'] == 100
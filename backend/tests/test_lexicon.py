@@ -0,0 +1,19 @@
+import random
+
+import bench_lexicon
+from lexicon import score_lexicon
+
+
+def test_lexicon_matches_the_per_pattern_detectors():
+    bench_lexicon.check_parity(random.Random(1), samples=500)
+
+
+def test_lexicon_parity_on_long_entries():
+    rng = random.Random(2)
+    for _ in range(10):
+        text = bench_lexicon.make_entry(5000, rng)
+        assert score_lexicon(text) == bench_lexicon.legacy_score(text)
+
+
+def test_lexicon_is_case_insensitive():
+    assert score_lexicon('I feel CALM and Peaceful') == score_lexicon('i feel calm and peaceful')
@@ -0,0 +1,73 @@
+import pytest
+
+import mood_cache
+from mood_cache import MoodResultCache, make_cache_key, normalize_text
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mood_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_normalized_whitespace_shares_a_key():
+    first = make_cache_key(normalize_text('Feeling  good\ntoday '), 'model-1', '1')
+    second = make_cache_key(normalize_text('Feeling good today'), 'model-1', '1')
+    assert first == second
+
+
+def test_key_changes_with_model_and_ruleset_version():
+    text = normalize_text('Feeling good today')
+    keys = {
+        make_cache_key(text, 'model-1', '1'),
+        make_cache_key(text, 'model-2', '1'),
+        make_cache_key(text, 'model-1', '2')
+    }
+    assert len(keys) == 3
+
+
+def test_key_parts_cannot_run_together():
+    assert make_cache_key('b', 'model-a', '1') != make_cache_key('ab', 'model-', '1')
+
+
+def test_normalize_rejects_non_string():
+    with pytest.raises(TypeError):
+        normalize_text(None)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = MoodResultCache(max_size=4, ttl=60)
+    cache.set('key', {'mood': 'Joy'})
+    clock.now += 59
+    assert cache.get('key') == {'mood': 'Joy'}
+    clock.now += 2
+    assert cache.get('key') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = MoodResultCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def test_returned_values_are_copies(clock):
+    cache = MoodResultCache()
+    cache.set('key', {'emotions': ['joy']})
+    cache.get('key')['emotions'].append('calm')
+    assert cache.get('key') == {'emotions': ['joy']}
@@ -0,0 +1,52 @@
+import re
+from io import BytesIO
+
+from bench_pdf_export import synthetic_entries
+from pdf_export import render_journal_pdf
+
+
+def page_count(pdf):
+    kids = re.search(rb'/Count (\d+) /Kids', pdf)
+    return int(kids.group(1))
+
+
+def xref_offsets(pdf):
+    start = int(pdf[pdf.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    lines = pdf[start:].split(b'\n')
+    return {
+        number: int(line.split()[0])
+        for number, line in enumerate(lines[2:2 + int(lines[1].split()[1])])
+        if line.endswith(b'n ')
+    }
+
+
+def render(docs, **options):
+    output = BytesIO()
+    render_journal_pdf(docs, output, **options)
+    return output.getvalue()
+
+
+def test_chunks_are_joined_into_one_document():
+    pdf = render(synthetic_entries(30), chunk_size=10)
+    assert pdf.startswith(b'%PDF-1.4')
+    assert pdf.rstrip().endswith(b'%%EOF')
+    assert page_count(pdf) >= 3
+    # Every page belongs to the single page tree
+    parents = set(re.findall(rb'/Parent (\d+) 0 R', pdf))
+    assert parents == {b'2'}
+
+
+def test_cross_reference_table_points_at_each_object():
+    pdf = render(synthetic_entries(30), chunk_size=10)
+    for number, offset in xref_offsets(pdf).items():
+        assert pdf[offset:].startswith(b'%d 0 obj' % number)
+
+
+def test_each_chunk_break_adds_at_most_one_page():
+    whole = page_count(render(synthetic_entries(40), chunk_size=1000))
+    chunked = page_count(render(synthetic_entries(40), chunk_size=20))
+    assert whole <= chunked <= whole + 1
+
+
+def test_empty_journal_renders_the_title_page():
+    assert page_count(render([])) == 1
@@ -236,14 +236,30 @@ const History = () => {
       // Show loading state
       setLoading(true);
 
-      const response = await axios.get(`${BACKEND_URL}/api/journal/export`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
+      const headers = { 'Authorization': `Bearer ${token}` };
+      let response = await axios.get(`${BACKEND_URL}/api/journal/export`, {
+        headers,
         responseType: 'blob'
       });
 
+      // 202: the PDF is being generated by a background job; poll until it is done
+      if (response.status === 202) {
+        const { job } = JSON.parse(await response.data.text());
+        let status = job.status;
+        while (status === 'queued' || status === 'running') {
+          await new Promise(resolve => setTimeout(resolve, 1000));
+          const poll = await axios.get(`${BACKEND_URL}/api/journal/export/jobs/${job.id}`, { headers });
+          status = poll.data.job.status;
+        }
+        if (status !== 'done') {
+          throw new Error(`Export job ${status}`);
+        }
+        response = await axios.get(`${BACKEND_URL}/api/journal/export/jobs/${job.id}/download`, {
+          headers,
+          responseType: 'blob'
+        });
+      }
+
       // Create a blob from the response data
       const blob = new Blob([response.data], { type: 'application/pdf' });
       const url = window.URL.createObjectURL(blob);